@@ -0,0 +1,173 @@
+"""
+dataset_loader.py file: DatasetLoader class
+
+The class responsibility is to give the causal stage access to the simulation dataset without loading it into memory.
+
+The merged_logs.csv columns used by the causal stage (step, moment, failure and flag of each machine) are converted once
+into one .npy file per column, with a narrow integer type, reading the CSV by chunks. The loader then opens them as
+memory-mapped arrays: a column is a zero-copy view of its file, the pages are read by the operating system when used.
+For the pandas code of the notebook, read_frame reads a dataset CSV with the same narrow integer types.
+
+The train/test split is a pair of row index arrays instead of two copies of the data, and the data is given to the
+WarmStructureLearner (or to any consumer) by chunks of rows, so the causal stage runs on datasets larger than the RAM.
+"""
+
+import os
+import numpy
+import pandas
+
+
+class DatasetLoader(object):
+    # Columns of the causal stage, with the names of the notebook (spaces replaced by underscores).
+    MACHINES = ('A', 'B', 'C')
+    DATA_COLUMNS = [name for machine in MACHINES
+                    for name in ('failure_Machine_' + machine, 'Machine_' + machine + '_flag')]
+    # Type of each column file (the step is int32 if the last step fits it).
+    DTYPES = dict([('step', numpy.int64), ('moment', numpy.int8)] + [(name, numpy.int8) for name in DATA_COLUMNS])
+
+    def __init__(self, cache_path):
+        self._cache_path = cache_path
+        self.columns = [name for name in self.DTYPES if os.path.exists(self._column_path(cache_path, name))]
+        # Memory-mapped column arrays, opened read-only.
+        self._arrays = {name: numpy.load(self._column_path(cache_path, name), mmap_mode='r') for name in self.columns}
+
+    @staticmethod
+    def _column_path(cache_path, name):
+        return os.path.join(cache_path, name + '.npy')
+
+    @staticmethod
+    def _last_step(csv_path):
+        # Step of the last row of the CSV (the rows are sorted by step), reading only the end of the file.
+        with open(csv_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 4096, 0))
+            lines = f.read().splitlines()
+        last = lines[-1].split(b',')[0].split(b'.')[0] if lines else b''
+        return int(last) if last.isdigit() else 0
+
+    # CONVERSION -------------------------------------------------------------------------------------------------------
+    @classmethod
+    def from_csv(cls, csv_path, cache_path, chunk_rows=1000000):
+        """
+        Convert the merged logs CSV into the column files of the cache folder (if not already done), and open them.
+        The CSV is read by chunks of "chunk_rows" rows, the peak memory does not depend on the dataset size.
+        """
+        if all(os.path.exists(cls._column_path(cache_path, name)) for name in cls.DTYPES):
+            return cls(cache_path)
+        os.makedirs(cache_path, exist_ok=True)
+
+        # Counting the rows first, to create the column files at their final size.
+        rows = -1
+        with open(csv_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 24), b''):
+                rows += block.count(b'\n')
+
+        dtypes = dict(cls.DTYPES)
+        if cls._last_step(csv_path) < 2 ** 31:
+            dtypes['step'] = numpy.int32
+        arrays = {name: numpy.lib.format.open_memmap(cls._column_path(cache_path, name) + '.tmp', mode='w+',
+                                                     dtype=dtype, shape=(rows,))
+                  for name, dtype in dtypes.items()}
+        csv_columns = ['step'] + [name.replace('_', ' ') for name in cls.DATA_COLUMNS]
+        start = 0
+        for chunk in pandas.read_csv(csv_path, usecols=csv_columns, chunksize=chunk_rows,
+                                     dtype=dict([('step', str)] + [(name, numpy.int8) for name in csv_columns[1:]])):
+            stop = start + len(chunk)
+            # The step column has the form "step.moment".
+            step_moment = chunk['step'].str.split('.', n=1, expand=True)
+            arrays['step'][start:stop] = step_moment[0].astype(dtypes['step'])
+            arrays['moment'][start:stop] = step_moment[1].fillna('0').astype(numpy.int8) \
+                if step_moment.shape[1] > 1 else 0
+            for name in cls.DATA_COLUMNS:
+                arrays[name][start:stop] = chunk[name.replace('_', ' ')].to_numpy()
+            start = stop
+
+        for array in arrays.values():
+            array.flush()
+        del arrays
+        for name in cls.DTYPES:
+            os.replace(cls._column_path(cache_path, name) + '.tmp', cls._column_path(cache_path, name))
+        return cls(cache_path)
+
+    @staticmethod
+    def read_frame(csv_path, chunk_rows=1000000, **kwargs):
+        """
+        Dataframe of a dataset CSV (merged logs or light logs) with the narrowest integer type of each column: int8 for
+        the failures and the flags, int16 or int32 for the levels, the times and the counters, int32 for an integer
+        step (the "step.moment" steps of the merged logs stay floats). The CSV is read by chunks of "chunk_rows" rows,
+        so the 64-bit columns of pandas are never built for the whole file. The other arguments are given to
+        pandas.read_csv (e.g. index_col).
+        """
+        header = pandas.read_csv(csv_path, nrows=0, **kwargs).columns
+        dtype = {name: numpy.int8 for name in header if name.startswith('failure') or name.endswith('flag')}
+        chunks = list()
+        for chunk in pandas.read_csv(csv_path, dtype=dtype, chunksize=chunk_rows, **kwargs):
+            for name in chunk.columns:
+                if name in dtype or not pandas.api.types.is_integer_dtype(chunk[name]):
+                    continue
+                # Integer steps (light logs) stay int32, to add durations to them without overflows.
+                if name == 'step':
+                    chunk[name] = chunk[name].astype(numpy.int32 if chunk[name].max() < 2 ** 31 else numpy.int64)
+                else:
+                    chunk[name] = pandas.to_numeric(chunk[name], downcast='integer')
+            chunks.append(chunk)
+        return pandas.concat(chunks) if chunks else pandas.DataFrame(columns=header)
+
+    # ACCESS -----------------------------------------------------------------------------------------------------------
+    def __len__(self):
+        return len(self._arrays[self.columns[0]]) if self.columns else 0
+
+    def __getitem__(self, name):
+        """Memory-mapped array of a column (zero-copy)."""
+        return self._arrays[name]
+
+    def split(self, train_size=0.9, test_size=0.1, random_state=7, shuffle=True):
+        """
+        Train and test row indexes, as the sklearn train_test_split with the same arguments (same random permutation).
+        Without "shuffle", the split is at a step: the two sets are slices, no index is stored.
+        """
+        n = len(self)
+        n_test = int(numpy.ceil(test_size * n))
+        n_train = int(numpy.floor(train_size * n))
+        if not shuffle:
+            return slice(0, n_train), slice(n_train, n_train + n_test)
+        index_type = numpy.int32 if n < 2 ** 31 else numpy.int64
+        permutation = numpy.random.RandomState(random_state).permutation(n).astype(index_type)
+        return permutation[n_test:n_test + n_train], permutation[:n_test]
+
+    def chunks(self, rows=None, columns=None, chunk_rows=1000000, dtype=float):
+        """
+        Yield the values of the rows (index array, slice or None for all the rows) as 2D arrays of "chunk_rows" rows,
+        one column per name in "columns" (default: the data columns). The index arrays are read in file order.
+        """
+        columns = columns or self.DATA_COLUMNS
+        if rows is None:
+            rows = slice(0, len(self))
+        if isinstance(rows, slice):
+            start, stop, _ = rows.indices(len(self))
+            for chunk_start in range(start, stop, chunk_rows):
+                chunk = slice(chunk_start, min(chunk_start + chunk_rows, stop))
+                yield numpy.column_stack([self._arrays[name][chunk] for name in columns]).astype(dtype, copy=False)
+            return
+
+        rows = numpy.sort(rows)
+        for chunk_start in range(0, len(rows), chunk_rows):
+            chunk = rows[chunk_start:chunk_start + chunk_rows]
+            yield numpy.column_stack([self._arrays[name][chunk] for name in columns]).astype(dtype, copy=False)
+
+    def frame(self, rows=None, columns=None):
+        """Dataframe of the rows and columns, e.g. for the causalnex functions. Only the selection is copied."""
+        columns = columns or self.DATA_COLUMNS
+        if rows is None:
+            rows = slice(0, len(self))
+        return pandas.DataFrame({name: numpy.asarray(self._arrays[name][rows]) for name in columns})
+
+    def update_learner(self, learner, rows=None, chunk_rows=1000000, forgetting=1.0):
+        """
+        Add the rows to a WarmStructureLearner chunk by chunk. The chunks already added (same rows and chunk size) are
+        skipped by the learner; the forgetting factor is applied once, with the first chunk actually added.
+        """
+        for chunk in self.chunks(rows, learner.columns, chunk_rows):
+            if learner.update(chunk, forgetting):
+                forgetting = 1.0
+        return learner
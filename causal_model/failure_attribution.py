@@ -0,0 +1,298 @@
+"""
+failure_attribution.py file: FailureAttribution class
+
+The class responsibility is to attribute online the expected products misses of the line to their likely upstream
+failures, with the causal network learned by the notebook: each time the "Machine_C_flag" goes high, the failures that
+can cause it (the failure nodes among the ancestors of the flag in the learned graph) are ranked.
+
+The network is a QueryService: loaded from the "query-tables.json" file of the notebook (structure and CPDs), or fitted
+on a dataset for the structure of "graph.dot" / "edges-weights.txt" (from_structure). The events are the machine events
+of the EventSource classes (manufacturing_model/event_source.py), plus the flag changes:
+
+    {"machine": "A", "event": "breakdown", "step": 1200}
+    {"machine": "C", "event": "flag", "value": 1, "step": 1260}
+
+"breakdown" and "repair" set the failure state of the machine, "flag" the state of its flag node, the other events only
+tell that the machine is observed. events_from_frame gives the events of the failure and flag changes of a dataset.
+
+Each event updates the state of the stream in constant time, nothing is recomputed over the history:
+    - the observed flags are the hard evidence of the network;
+    - the failures are soft (virtual) evidence, with the activity of each failure: 1 while the machine is broken, then
+      exp(-(steps since the repair) / memory_steps), since a repaired failure still starves the downstream machines
+      until the buffers recover; None (no evidence) for a machine not observed yet.
+
+When the target flag goes high, the joint posterior of the failures given the flags and the target is read from the
+QueryService (computed once per evidence state, then cached), weighted by the likelihood of the failures activities and
+normalized: 2^failures operations per attribution. The score of each failure is its posterior probability times its
+causal effect on the target, P(target | do(failure = 1)) - P(target | do(failure = 0)), and the scores are normalized
+into shares. The latency of each event is measured, see latency_stats().
+"""
+
+import collections
+import math
+import re
+import time
+import numpy
+from query_service import QueryService
+from weighted_estimation import WeightedEstimation
+
+
+# FAILURE ATTRIBUTION CLASS --------------------------------------------------------------------------------------------
+class FailureAttribution(object):
+    FAILURE_EVENTS = ('breakdown', 'repair')
+
+    def __init__(self, query_service, target='Machine_C_flag', target_state=1, causes=None, memory_steps=3600,
+                 history_size=1000, latency_window=10000):
+        self.query_service = query_service
+        self.target = target
+        self._target_state = target_state
+        self._memory_steps = memory_steps
+
+        # Failures ranked: the failure nodes among the ancestors of the target, unless given.
+        self.causes = list(causes) if causes is not None else \
+            [node for node in self._ancestors(target) if node.startswith('failure_')]
+        # Index of the broken state of each failure, None for a failure never observed in the data (e.g. a machine
+        # that never broke): the network gives it no probability and no effect.
+        self._active = {cause: query_service.node_states[cause].index(1) if 1 in query_service.node_states[cause]
+                        else None for cause in self.causes}
+        # Causal effect of each failure on the target.
+        self.effects = {cause: self._effect(cause) for cause in self.causes}
+
+        # Stream state: evidence of the observed nodes, broken state and last repair step of the failures.
+        self.now = 0
+        self._evidence = dict()
+        self._target_value = None
+        self._broken = {cause: None for cause in self.causes}
+        self._repaired_at = {cause: None for cause in self.causes}
+
+        # Rankings of the last target rises, and latencies of the last events.
+        self.rankings = collections.deque(maxlen=history_size)
+        self.events = 0
+        self._latencies = collections.deque(maxlen=latency_window)
+
+    # CONSTRUCTORS -----------------------------------------------------------------------------------------------------
+    @classmethod
+    def load(cls, tables_path, cache_size=4096, **kwargs):
+        """Attribution on the network of a "query-tables.json" file, see QueryService.save."""
+        return cls(QueryService.load(tables_path, cache_size=cache_size), **kwargs)
+
+    @classmethod
+    def from_structure(cls, structure_path, data, weights=None, prior=1.0, cache_size=4096, **kwargs):
+        """
+        Attribution on the learned structure of a "graph.dot" or "edges-weights.txt" file, with the CPDs fitted on the
+        data (node columns with the notebook names), as the BayesianEstimator with the K2 prior. The node states are the
+        values of the data.
+        """
+        edges = cls.read_edges(structure_path)
+        nodes = list(dict.fromkeys([node for edge in edges for node in edge[:2]]))
+        node_states = {node: sorted(data[node].unique().tolist()) for node in nodes}
+        parents = {node: [parent for parent, child, _ in edges if child == node] for node in nodes}
+        weights = numpy.ones(len(data)) if weights is None else weights
+        cpd_values = {node: WeightedEstimation.cpd_values(data, weights, node, parents[node], node_states, prior)
+                      for node in nodes}
+        return cls(QueryService(nodes, node_states, parents, cpd_values, cache_size=cache_size), **kwargs)
+
+    @staticmethod
+    def read_edges(structure_path):
+        """(parent, child, weight) edges of a "graph.dot" or "edges-weights.txt" file exported by the notebook."""
+        if structure_path.endswith('.dot'):
+            import networkx
+            graph = networkx.drawing.nx_pydot.read_dot(structure_path)
+            return [(u, v, float(str(data.get('weight', 0)).strip('"'))) for u, v, data in graph.edges(data=True)]
+        with open(structure_path, 'r') as f:
+            text = f.read()
+            f.close()
+        # Lines in the form "parent -> child: weight", as read by the WarmStructureLearner.
+        pattern = r'([A-Za-z_]\w*) -> ([A-Za-z_]\w*): ([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)'
+        return [(parent, child, float(weight)) for parent, child, weight in re.findall(pattern, text)]
+
+    def _ancestors(self, node):
+        ancestors, stack = list(), list(self.query_service.parents[node])
+        while stack:
+            parent = stack.pop()
+            if parent not in ancestors:
+                ancestors.append(parent)
+                stack.extend(self.query_service.parents[parent])
+        return [other for other in self.query_service.nodes if other in ancestors]
+
+    def _known(self, node, state):
+        return state in self.query_service.node_states[node]
+
+    def _effect(self, cause):
+        # No effect without both states of the failure, or a target state never observed.
+        if not self._known(cause, 0) or not self._known(cause, 1) or not self._known(self.target, self._target_state):
+            return 0.0
+        return self.query_service.probability(self.target, self._target_state, intervention={cause: 1}) - \
+            self.query_service.probability(self.target, self._target_state, intervention={cause: 0})
+
+    # EVENTS -----------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def failure_node(machine):
+        return 'failure_Machine_' + machine
+
+    @staticmethod
+    def flag_node(machine):
+        return 'Machine_' + machine + '_flag'
+
+    def update(self, event):
+        """
+        Update the stream state with an event. Returns the ranking if the event raised the target flag, else None.
+        """
+        step = event.get('step')
+        step = self.now if step is None else step
+        self.now = max(self.now, step)
+        failure = self.failure_node(event['machine'])
+        kind = event['event']
+
+        ranking = None
+        if kind in self.FAILURE_EVENTS:
+            self._set_failure(failure, kind == 'breakdown', step)
+        else:
+            # Any other event of a machine with an unknown failure state tells that it is not broken.
+            if not self._failure_known(failure):
+                self._set_failure(failure, False, step)
+            if kind == 'flag':
+                node = self.flag_node(event['machine'])
+                value = event['value']
+                if node == self.target:
+                    if value == self._target_state and self._target_value != self._target_state:
+                        ranking = self.rank(step)
+                        self.rankings.append(ranking)
+                    self._target_value = value
+                elif node in self.query_service.nodes:
+                    self._observe(node, value)
+
+        self.events += 1
+        if 'received' in event:
+            self._latencies.append(time.perf_counter() - event['received'])
+        return ranking
+
+    def run(self, events):
+        """Update the state with all the events (e.g. an EventSource). Returns the rankings of the target rises."""
+        return [ranking for ranking in (self.update(event) for event in events) if ranking is not None]
+
+    def _failure_known(self, failure):
+        if failure in self._broken:
+            return self._broken[failure] is not None
+        return failure in self._evidence or failure not in self.query_service.nodes
+
+    def _set_failure(self, failure, broken, step):
+        if failure in self._broken:
+            if self._broken[failure] and not broken:
+                self._repaired_at[failure] = step
+            self._broken[failure] = broken
+        elif failure in self.query_service.nodes:
+            # Failures that cannot cause the target are hard evidence.
+            self._observe(failure, int(broken))
+
+    def _observe(self, node, state):
+        # Hard evidence of a node, unobserved in a state the network does not know (never seen in the data).
+        if self._known(node, state):
+            self._evidence[node] = state
+        else:
+            self._evidence.pop(node, None)
+
+    # ATTRIBUTION ------------------------------------------------------------------------------------------------------
+    def activity(self, cause, step=None):
+        """Activity of a failure at the step: 1 if broken, decaying after the repair, None if not observed."""
+        step = self.now if step is None else step
+        if self._broken[cause] is None:
+            return None
+        if self._broken[cause]:
+            return 1.0
+        if self._repaired_at[cause] is None:
+            return 0.0
+        return math.exp(-max(step - self._repaired_at[cause], 0) / self._memory_steps)
+
+    def rank(self, step=None):
+        """
+        Ranking of the failures as causes of the target high, at the step (default: the last event), as a dict with
+        the step and the "causes" list, each one a dict with the cause, its posterior probability, causal effect,
+        activity and score share, by decreasing score. All the shares are 0 when no failure can explain the target. A
+        failure never observed in the data has posterior 0.
+        """
+        step = self.now if step is None else step
+        evidence = dict(self._evidence)
+        if self._known(self.target, self._target_state):
+            evidence[self.target] = self._target_state
+        joint = self.query_service.joint(self.causes, evidence)
+
+        # Soft evidence of the activities: likelihood 1 - activity of the inactive state, activity of the active one.
+        weighted = joint
+        activities = [self.activity(cause, step) for cause in self.causes]
+        for axis, (cause, activity) in enumerate(zip(self.causes, activities)):
+            if activity is None or self._active[cause] is None:
+                continue
+            states = self.query_service.node_states[cause]
+            likelihood = numpy.array([activity if state == 1 else 1.0 - activity for state in states])
+            shape = [1] * len(self.causes)
+            shape[axis] = len(states)
+            weighted = weighted * likelihood.reshape(shape)
+        total = weighted.sum()
+        # Activities impossible for the network: the flags evidence only.
+        posterior = weighted / total if total > 0 else joint
+
+        causes = list()
+        for axis, (cause, activity) in enumerate(zip(self.causes, activities)):
+            other_axes = tuple(a for a in range(len(self.causes)) if a != axis)
+            probability = float(posterior.sum(axis=other_axes)[self._active[cause]]) \
+                if self._active[cause] is not None else 0.0
+            causes.append({'cause': cause, 'posterior': probability, 'effect': self.effects[cause],
+                           'activity': activity, 'score': probability * max(self.effects[cause], 0.0)})
+        scores = sum(cause['score'] for cause in causes)
+        for cause in causes:
+            cause['score'] = cause['score'] / scores if scores > 0 else 0.0
+        causes.sort(key=lambda cause: cause['score'], reverse=True)
+        return {'step': step, 'causes': causes}
+
+    def latency_stats(self):
+        """Latency of the last events, in milliseconds."""
+        if not self._latencies:
+            return {'events': 0}
+        latencies = sorted(self._latencies)
+        return {'events': len(latencies),
+                'mean_ms': 1000 * sum(latencies) / len(latencies),
+                'p50_ms': 1000 * latencies[len(latencies) // 2],
+                'p99_ms': 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+                'max_ms': 1000 * latencies[-1]}
+
+    # DATASET EVENTS ---------------------------------------------------------------------------------------------------
+    @staticmethod
+    def events_from_frame(data, machines=('A', 'B', 'C'), step_column='step'):
+        """
+        Events of the failure and flag changes of a dataset (notebook or merged logs column names), in row order, the
+        failures before the flags of the same row. The first row gives the initial states (a "repair" event for a
+        working machine). The step is the "step_column" value (the integer part of the
+        "step.moment" steps), or the row number without it.
+        """
+        columns = list()
+        for machine in machines:
+            for name, kind in ((FailureAttribution.failure_node(machine), 'failure'),
+                               (FailureAttribution.flag_node(machine), 'flag')):
+                column = name if name in data.columns else name.replace('_', ' ')
+                if column in data.columns:
+                    columns.append((column, machine, kind))
+        if step_column in data.columns:
+            steps = numpy.floor(data[step_column].to_numpy(dtype=float)).astype(numpy.int64)
+        else:
+            steps = numpy.arange(len(data))
+
+        rows, orders, values = list(), list(), list()
+        for order, (column, _, kind) in enumerate(columns):
+            column_values = data[column].to_numpy()
+            # First row, then the rows where the value changes.
+            changes = numpy.concatenate([[0], numpy.flatnonzero(column_values[1:] != column_values[:-1]) + 1]) \
+                if len(column_values) else numpy.zeros(0, dtype=numpy.int64)
+            rows.append(changes)
+            orders.append(numpy.full(len(changes), order + (0 if kind == 'failure' else len(columns))))
+            values.append(column_values[changes])
+        if not rows:
+            return
+        rows, orders, values = numpy.concatenate(rows), numpy.concatenate(orders), numpy.concatenate(values)
+
+        for i in numpy.lexsort((orders, rows)):
+            column, machine, kind = columns[orders[i] % len(columns)]
+            if kind == 'failure':
+                yield {'machine': machine, 'event': 'breakdown' if values[i] else 'repair', 'step': int(steps[rows[i]])}
+            else:
+                yield {'machine': machine, 'event': 'flag', 'value': int(values[i]), 'step': int(steps[rows[i]])}
@@ -0,0 +1,245 @@
+"""
+query_service.py file: QueryService class
+
+The class responsibility is to answer what-if questions on the fitted Bayesian network quickly, e.g.
+"P(Machine C flag | failure A = 1, failure B = 0)" or "P(Machine C flag | do(failure A = 1))", as a digital twin
+dashboard does many times per second.
+
+The network is compiled once: the CPDs are turned into factor arrays over the joint state space and their product (the
+joint distribution) is kept in memory. Then:
+    - an observational query slices the joint distribution at the evidence and sums out the other nodes;
+    - an interventional query replaces the CPD factors of the intervened nodes (truncated factorization, same semantics
+      of the causalnex InferenceEngine "do_intervention") and then behaves as an observational query.
+
+The joint posterior of several nodes (e.g. all the failures) is given by "joint", from the same joint distribution.
+
+The results are cached by evidence/intervention signature, with a bounded LRU eviction, so repeated dashboard queries
+are dictionary look-ups. The compiled tables can be saved into a JSON file and loaded without causalnex.
+
+The compilation is exact and meant for the small networks of the manufacturing model: the joint state space is bounded
+by "max_states".
+"""
+
+import json
+from collections import OrderedDict
+import numpy
+
+
+class QueryService(object):
+    def __init__(self, nodes, node_states, parents, cpd_values, cache_size=1024, max_states=2 ** 22):
+        """
+        nodes: list of the node names.
+        node_states: dict node -> list of the node states.
+        parents: dict node -> list of the node parents, in the CPD columns order.
+        cpd_values: dict node -> array (node states, parent states combinations), as in the causalnex cpds dataframes.
+        """
+        self.nodes = list(nodes)
+        self.node_states = {node: list(node_states[node]) for node in self.nodes}
+        self.parents = {node: list(parents[node]) for node in self.nodes}
+        self._cpd_values = {node: numpy.asarray(cpd_values[node], dtype=float) for node in self.nodes}
+
+        self._axis = {node: i for i, node in enumerate(self.nodes)}
+        self._shape = tuple(len(self.node_states[node]) for node in self.nodes)
+        if numpy.prod(self._shape, dtype=float) > max_states:
+            raise ValueError('The network joint state space is too large to be compiled: {0} states.'
+                             .format(int(numpy.prod(self._shape, dtype=float))))
+
+        # Compiling the network: one factor array per node, broadcastable over the joint state space.
+        self._factors = {node: self._factor(node) for node in self.nodes}
+        self._joint = self._product(self._factors.values())
+
+        # LRU caches: query results, and joint distributions of the intervened networks.
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._intervened_joints = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # CONSTRUCTORS -----------------------------------------------------------------------------------------------------
+    @classmethod
+    def from_bayesian_network(cls, bayesian_net, **kwargs):
+        """Compile a causalnex BayesianNetwork, after "fit_node_states" and "fit_cpds"."""
+        node_states, parents, cpd_values = dict(), dict(), dict()
+        for node, cpd in bayesian_net.cpds.items():
+            node_states[node] = list(cpd.index)
+            # Nodes without parents have a single unnamed column.
+            parents[node] = [name for name in cpd.columns.names if name is not None]
+            cpd_values[node] = cpd.to_numpy()
+        return cls(list(bayesian_net.cpds.keys()), node_states, parents, cpd_values, **kwargs)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path, 'r') as f:
+            tables = json.load(f)
+            f.close()
+        return cls(tables['nodes'], tables['node_states'], tables['parents'], tables['cpd_values'], **kwargs)
+
+    def save(self, path):
+        tables = {
+            'nodes': self.nodes,
+            'node_states': self.node_states,
+            'parents': self.parents,
+            'cpd_values': {node: values.tolist() for node, values in self._cpd_values.items()},
+        }
+        with open(path, 'w') as f:
+            json.dump(tables, f)
+            f.close()
+
+    # QUERIES ----------------------------------------------------------------------------------------------------------
+    def query(self, evidence=None, intervention=None):
+        """
+        Marginal distributions of all the nodes, as dict node -> {state: probability}.
+
+        evidence: dict node -> observed state.
+        intervention: dict node -> forced state, or node -> {state: probability} distribution.
+
+        The returned dictionaries are shared with the cache and must not be modified.
+        """
+        key = self._signature(evidence, intervention)
+        return self._cached(key, lambda: self._marginals(self._intervened_joint(key[1]), evidence or dict()))
+
+    def query_batch(self, queries):
+        """
+        Answer a batch of queries. Each query is an (evidence, intervention) tuple or a dict with the optional keys
+        "evidence" and "intervention".
+        """
+        results = list()
+        for query in queries:
+            if isinstance(query, dict):
+                results.append(self.query(query.get('evidence'), query.get('intervention')))
+            else:
+                results.append(self.query(*query))
+        return results
+
+    def joint(self, nodes, evidence=None, intervention=None):
+        """
+        Joint distribution of some nodes given the evidence (and intervention), as an array with one axis per node in
+        the given order, e.g. the posterior of all the failures at once. Cached as the queries, must not be modified.
+        """
+        key = ('joint', tuple(nodes)) + self._signature(evidence, intervention)
+        return self._cached(key, lambda: self._joint_of(nodes, self._intervened_joint(key[3]), evidence or dict()))
+
+    def probability(self, node, state, evidence=None, intervention=None):
+        """Probability of a single node state, e.g. probability("Machine_C_flag", 1, {"failure_Machine_A": 1})."""
+        return self.query(evidence, intervention)[node][state]
+
+    def cache_info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache), 'max_size': self._cache_size}
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._intervened_joints.clear()
+
+    # INTERNAL FUNCTIONS -----------------------------------------------------------------------------------------------
+    def _factor(self, node, values=None):
+        # Conditional distribution of the node given its parents, as an array with one axis per network node.
+        variables = [node] + self.parents[node]
+        if values is None:
+            values = self._cpd_values[node].reshape([len(self.node_states[v]) for v in variables])
+        # Moving the axes into the network order, then adding the missing axes.
+        order = sorted(range(len(variables)), key=lambda i: self._axis[variables[i]])
+        values = numpy.transpose(values, order)
+        shape = [1] * len(self.nodes)
+        for v in variables:
+            shape[self._axis[v]] = len(self.node_states[v])
+        return values.reshape(shape)
+
+    def _product(self, factors):
+        joint = numpy.ones(self._shape)
+        for factor in factors:
+            joint = joint * factor
+        return joint
+
+    def _cached(self, key, compute):
+        # Result of the key from the LRU cache, or computed and cached.
+        try:
+            result = self._cache[key]
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return result
+        except KeyError:
+            self.misses += 1
+
+        result = compute()
+
+        self._cache[key] = result
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _signature(self, evidence, intervention):
+        evidence_key = tuple(sorted((evidence or dict()).items()))
+        intervention_key = list()
+        for node, value in sorted((intervention or dict()).items()):
+            if isinstance(value, dict):
+                value = tuple(sorted(value.items()))
+            intervention_key.append((node, value))
+        return evidence_key, tuple(intervention_key)
+
+    def _intervened_joint(self, intervention_key):
+        if not intervention_key:
+            return self._joint
+        try:
+            joint = self._intervened_joints[intervention_key]
+            self._intervened_joints.move_to_end(intervention_key)
+            return joint
+        except KeyError:
+            pass
+
+        factors = dict(self._factors)
+        for node, value in intervention_key:
+            states = self.node_states[node]
+            if isinstance(value, tuple):
+                distribution = dict(value)
+                values = numpy.array([distribution.get(state, 0.0) for state in states])
+            else:
+                values = numpy.array([1.0 if state == value else 0.0 for state in states])
+            # The intervened node loses its parents: the factor only depends on the node itself.
+            shape = [1] * len(self.nodes)
+            shape[self._axis[node]] = len(states)
+            factors[node] = values.reshape(shape)
+        joint = self._product(factors.values())
+
+        self._intervened_joints[intervention_key] = joint
+        if len(self._intervened_joints) > self._cache_size:
+            self._intervened_joints.popitem(last=False)
+        return joint
+
+    def _observed(self, joint, evidence):
+        # Slicing the joint distribution at the observed states (the axes are kept, with length 1), and its total.
+        index = [slice(None)] * len(self.nodes)
+        for node, state in evidence.items():
+            i = self.node_states[node].index(state)
+            index[self._axis[node]] = slice(i, i + 1)
+        joint = joint[tuple(index)]
+
+        total = joint.sum()
+        if total == 0:
+            raise ValueError('The evidence {0} has zero probability in the network.'.format(evidence))
+        return joint, total, index
+
+    def _marginals(self, joint, evidence):
+        joint, total, _ = self._observed(joint, evidence)
+        result = dict()
+        for node in self.nodes:
+            if node in evidence:
+                result[node] = {state: float(state == evidence[node]) for state in self.node_states[node]}
+                continue
+            axis = self._axis[node]
+            marginal = joint.sum(axis=tuple(a for a in range(len(self.nodes)) if a != axis)) / total
+            result[node] = dict(zip(self.node_states[node], marginal.tolist()))
+        return result
+
+    def _joint_of(self, nodes, joint, evidence):
+        joint, total, index = self._observed(joint, evidence)
+        kept_axes = [self._axis[node] for node in nodes]
+        result = joint.sum(axis=tuple(a for a in range(len(self.nodes)) if a not in kept_axes)) / total
+        # The observed nodes keep all their states, with a zero probability out of the observed one.
+        if any(node in evidence for node in nodes):
+            full = numpy.zeros([self._shape[a] for a in sorted(kept_axes)])
+            full[tuple(index[a] for a in sorted(kept_axes))] = result
+            result = full
+        # Remaining axes in the network order, moved into the order of the nodes.
+        result = numpy.transpose(result, numpy.argsort(numpy.argsort(kept_axes)))
+        result.flags.writeable = False
+        return result
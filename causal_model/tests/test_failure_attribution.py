@@ -0,0 +1,39 @@
+"""
+test_failure_attribution.py file: tests of the attribution with a machine that never fails in the data
+"""
+
+import numpy
+import pandas
+from failure_attribution import FailureAttribution
+
+
+def _attribution(tmp_path):
+    # A and B starve C; B never breaks in the data, so its failure node has the state 0 only.
+    random = numpy.random.RandomState(0)
+    failure_a = (random.rand(2000) < 0.2).astype(int)
+    data = pandas.DataFrame({'failure_Machine_A': failure_a,
+                             'failure_Machine_B': numpy.zeros(2000, dtype=int),
+                             'Machine_C_flag': failure_a & (random.rand(2000) < 0.9).astype(int)})
+    structure = tmp_path / 'edges-weights.txt'
+    structure.write_text('failure_Machine_A -> Machine_C_flag: 1.0\nfailure_Machine_B -> Machine_C_flag: 0.5\n')
+    return FailureAttribution.from_structure(str(structure), data)
+
+
+def test_failure_never_observed_has_no_effect(tmp_path):
+    attribution = _attribution(tmp_path)
+    assert attribution.causes == ['failure_Machine_A', 'failure_Machine_B']
+    assert attribution.effects['failure_Machine_B'] == 0.0
+    assert attribution.effects['failure_Machine_A'] > 0.5
+
+
+def test_failure_never_observed_is_ranked_last(tmp_path):
+    attribution = _attribution(tmp_path)
+    rankings = attribution.run([{'machine': 'A', 'event': 'repair', 'step': 0},
+                                {'machine': 'B', 'event': 'breakdown', 'step': 10},
+                                {'machine': 'A', 'event': 'breakdown', 'step': 20},
+                                {'machine': 'C', 'event': 'flag', 'value': 1, 'step': 30}])
+    assert len(rankings) == 1
+    causes = rankings[0]['causes']
+    assert [cause['cause'] for cause in causes] == ['failure_Machine_A', 'failure_Machine_B']
+    assert causes[0]['score'] == 1.0
+    assert causes[1]['posterior'] == 0.0 and causes[1]['score'] == 0.0 and causes[1]['activity'] == 1.0
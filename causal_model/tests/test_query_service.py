@@ -0,0 +1,106 @@
+"""
+test_query_service.py file: tests of the compiled queries of QueryService against the full enumeration of the network
+"""
+
+import itertools
+import numpy
+import pytest
+from query_service import QueryService
+
+NODES = ['failure_Machine_A', 'failure_Machine_B', 'Machine_A_flag', 'Machine_B_flag', 'Machine_C_flag']
+NODE_STATES = {'failure_Machine_A': [0, 1], 'failure_Machine_B': [0, 1], 'Machine_A_flag': [0, 1, 2],
+               'Machine_B_flag': [0, 1], 'Machine_C_flag': [0, 1]}
+PARENTS = {'failure_Machine_A': [], 'failure_Machine_B': [], 'Machine_A_flag': ['failure_Machine_A'],
+           'Machine_B_flag': ['failure_Machine_B'], 'Machine_C_flag': ['Machine_A_flag', 'Machine_B_flag']}
+
+
+def _cpd_values(seed):
+    # Random CPDs: one column per combination of the parent states, the last parent changing first.
+    random = numpy.random.RandomState(seed)
+    cpd_values = dict()
+    for node in NODES:
+        columns = int(numpy.prod([len(NODE_STATES[parent]) for parent in PARENTS[node]]))
+        values = random.rand(len(NODE_STATES[node]), columns)
+        cpd_values[node] = values / values.sum(axis=0)
+    return cpd_values
+
+
+def _enumerated(cpd_values, evidence=None, intervention=None):
+    # Probability of each assignment of the nodes, by the product of the CPD entries (truncated for the interventions).
+    evidence, intervention = evidence or dict(), intervention or dict()
+    probabilities = dict()
+    for states in itertools.product(*[NODE_STATES[node] for node in NODES]):
+        assignment = dict(zip(NODES, states))
+        if any(assignment[node] != state for node, state in evidence.items()):
+            continue
+        probability = 1.0
+        for node in NODES:
+            if node in intervention:
+                probability *= float(assignment[node] == intervention[node])
+                continue
+            row = NODE_STATES[node].index(assignment[node])
+            parents = PARENTS[node]
+            column = numpy.ravel_multi_index([NODE_STATES[parent].index(assignment[parent]) for parent in parents],
+                                             [len(NODE_STATES[parent]) for parent in parents]) if parents else 0
+            probability *= cpd_values[node][row, column]
+        probabilities[states] = probability
+    total = sum(probabilities.values())
+    return {states: probability / total for states, probability in probabilities.items()}
+
+
+def _marginal(probabilities, node):
+    marginal = dict.fromkeys(NODE_STATES[node], 0.0)
+    for states, probability in probabilities.items():
+        marginal[states[NODES.index(node)]] += probability
+    return marginal
+
+
+QUERIES = [(None, None),
+           ({'failure_Machine_A': 1}, None),
+           ({'Machine_C_flag': 1}, None),
+           ({'Machine_C_flag': 1, 'failure_Machine_B': 0}, None),
+           ({'Machine_A_flag': 2}, None),
+           (None, {'failure_Machine_A': 1}),
+           ({'Machine_C_flag': 1}, {'Machine_A_flag': 0}),
+           ({'failure_Machine_A': 0}, {'failure_Machine_B': 1, 'Machine_A_flag': 2})]
+
+
+def test_queries_give_the_enumerated_marginals():
+    cpd_values = _cpd_values(0)
+    service = QueryService(NODES, NODE_STATES, PARENTS, cpd_values)
+    for evidence, intervention in QUERIES:
+        probabilities = _enumerated(cpd_values, evidence, intervention)
+        result = service.query(evidence, intervention)
+        for node in NODES:
+            assert result[node] == pytest.approx(_marginal(probabilities, node))
+
+
+def test_repeated_queries_are_cached(tmp_path):
+    service = QueryService(NODES, NODE_STATES, PARENTS, _cpd_values(2), cache_size=4)
+    first = service.query_batch([{'evidence': {'Machine_C_flag': 1}}, ({'Machine_C_flag': 1}, None)])
+    assert first[0] is first[1]
+    assert service.cache_info() == {'hits': 1, 'misses': 1, 'size': 1, 'max_size': 4}
+
+    # The saved tables answer the same queries.
+    service.save(str(tmp_path / 'query-tables.json'))
+    loaded = QueryService.load(str(tmp_path / 'query-tables.json'))
+    for evidence, intervention in QUERIES:
+        assert loaded.query(evidence, intervention) == service.query(evidence, intervention)
+    assert service.cache_info()['size'] == 4
+
+    with pytest.raises(ValueError):
+        QueryService(NODES, NODE_STATES, PARENTS, _cpd_values(2), max_states=10)
+
+
+def test_joint_gives_the_enumerated_joint():
+    cpd_values = _cpd_values(1)
+    service = QueryService(NODES, NODE_STATES, PARENTS, cpd_values)
+    nodes = ['Machine_C_flag', 'failure_Machine_A', 'Machine_A_flag']
+    for evidence, intervention in QUERIES:
+        probabilities = _enumerated(cpd_values, evidence, intervention)
+        expected = numpy.zeros([len(NODE_STATES[node]) for node in nodes])
+        for states, probability in probabilities.items():
+            expected[tuple(NODE_STATES[node].index(states[NODES.index(node)]) for node in nodes)] += probability
+        assert service.joint(nodes, evidence, intervention) == pytest.approx(expected)
+
+
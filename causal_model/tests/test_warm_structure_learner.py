@@ -0,0 +1,28 @@
+"""
+test_warm_structure_learner.py file: tests of the data windows added to the learner statistics
+"""
+
+import numpy
+import pytest
+
+pytest.importorskip('causalnex')
+from warm_structure_learner import WarmStructureLearner
+
+COLUMNS = ['failure_Machine_A', 'Machine_A_flag', 'Machine_C_flag']
+
+
+def test_a_window_added_again_is_skipped(tmp_path):
+    random = numpy.random.RandomState(0)
+    first, second = random.rand(100, len(COLUMNS)), random.rand(50, len(COLUMNS))
+    learner = WarmStructureLearner(COLUMNS)
+    assert learner.update(first) and learner.update(second)
+    gram = learner._gram.copy()
+    assert not learner.update(first.copy(), forgetting=0.5)
+    assert learner.n_rows == 150 and numpy.array_equal(learner._gram, gram)
+
+    # The fingerprints are kept in the state file.
+    learner.save(str(tmp_path / 'learner.json'))
+    loaded = WarmStructureLearner.load(str(tmp_path / 'learner.json'))
+    assert not loaded.update(second)
+    assert loaded.update(first[:-1])
+    assert loaded.n_rows == 249
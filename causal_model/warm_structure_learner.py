@@ -0,0 +1,234 @@
+"""
+warm_structure_learner.py file: WarmStructureLearner class
+
+The class responsibility is to learn the causal structure of the manufacturing dataset run after run, without
+re-training the causal net from zero every time a new simulation dataset is produced.
+
+The learner implements the same linear NOTEARS problem solved by causalnex "from_pandas" (least squares loss, acyclicity
+constraint h(W) = tr(exp(W * W)) - d, augmented Lagrangian, L-BFGS-B), but the loss is computed from the sufficient
+statistics of the data (number of rows and Gram matrix X'X) instead of the data itself:
+
+    loss(W) = 0.5 / n * ||X - XW||^2 = 0.5 * tr((I - W)' S (I - W)),  with S = X'X / n
+
+So:
+    - updating the learner with a new data window costs O(rows_in_window * d^2), the history is never re-read;
+    - the optimisation costs O(d^3) per iteration, whatever the number of rows seen so far;
+    - the optimisation starts from the weights (and Lagrangian multipliers) of the previous solution, so a run that
+      changes very little converges in a few iterations.
+
+A fingerprint of each data window is kept, so a window added again (e.g. the same dataset loaded by the notebook run
+twice) is skipped instead of being counted twice in the statistics.
+
+The learner state (statistics, fingerprints, weights, multipliers) is saved as a JSON file. A prior solution can also be
+imported from the "graph.dot" or "edges-weights.txt" files exported by the notebook of a previous run.
+"""
+
+import hashlib
+import json
+import os
+import re
+import numpy
+import scipy.linalg
+import scipy.optimize
+import networkx
+from causalnex.structure import StructureModel
+
+
+class WarmStructureLearner(object):
+    def __init__(self, columns, tabu_child_nodes=None, tabu_parent_nodes=None, beta=0.0, max_iter=100, h_tol=1e-8):
+        self.columns = list(columns)
+        self._d = len(self.columns)
+
+        # Optimisation parameters, same meaning and defaults of causalnex "from_pandas".
+        self._tabu_child_nodes = list(tabu_child_nodes or [])
+        self._tabu_parent_nodes = list(tabu_parent_nodes or [])
+        self._beta = beta
+        self._max_iter = max_iter
+        self._h_tol = h_tol
+
+        # Sufficient statistics of all the data seen so far.
+        self.n_rows = 0
+        self._gram = numpy.zeros((self._d, self._d))
+        self._fingerprints = set()
+
+        # Last solution: weighted adjacency matrix and augmented Lagrangian multipliers.
+        self.weights = numpy.zeros((self._d, self._d))
+        self._rho = 1.0
+        self._alpha = 0.0
+
+    # DATA UPDATE ------------------------------------------------------------------------------------------------------
+    def update(self, data, forgetting=1.0):
+        """
+        Add a new data window to the learner statistics.
+
+        "data" is a dataframe with the learner columns, or an array with the columns in the same order.
+        With "forgetting" < 1 the statistics collected so far are down-weighted before adding the new window, so the
+        learner follows a plant that drifts slowly from run to run.
+
+        Return False, without changing the statistics, if the same window has already been added.
+        """
+        if hasattr(data, 'loc'):
+            data = data[self.columns].to_numpy(dtype=float)
+        values = numpy.ascontiguousarray(data, dtype=float)
+
+        fingerprint = self.fingerprint(values)
+        if fingerprint in self._fingerprints:
+            return False
+        self._fingerprints.add(fingerprint)
+
+        self.n_rows = self.n_rows * forgetting + values.shape[0]
+        self._gram = self._gram * forgetting + values.T @ values
+        return True
+
+    @staticmethod
+    def fingerprint(values):
+        """SHA-256 digest of the shape and of the values of a data window."""
+        values = numpy.ascontiguousarray(values, dtype=float)
+        digest = hashlib.sha256(str(values.shape).encode())
+        digest.update(values.tobytes())
+        return digest.hexdigest()
+
+    # LEARNING ---------------------------------------------------------------------------------------------------------
+    def fit(self, w_threshold=0.0):
+        """Solve NOTEARS on the collected statistics, warm-starting from the last solution."""
+        if self.n_rows == 0:
+            raise ValueError('No data has been added to the learner, call update() before fit().')
+
+        d = self._d
+        covariance = self._gram / self.n_rows
+        identity = numpy.eye(d)
+
+        # Bounds: no self loops, no edges into tabu children nor out of tabu parents.
+        bounds = list()
+        for i in range(d):
+            for j in range(d):
+                if i == j or self.columns[j] in self._tabu_child_nodes or self.columns[i] in self._tabu_parent_nodes:
+                    bounds.append((0, 0))
+                else:
+                    bounds.append((0, None))
+        bounds = bounds * 2
+
+        def to_matrix(w):
+            # The weights are split into a positive and a negative part, as in the NOTEARS paper.
+            return (w[:d * d] - w[d * d:]).reshape(d, d)
+
+        def h_function(weights):
+            exp_matrix = scipy.linalg.expm(weights * weights)
+            return numpy.trace(exp_matrix) - d, exp_matrix
+
+        def objective(w):
+            weights = to_matrix(w)
+            residual = identity - weights
+            loss = 0.5 * numpy.trace(residual.T @ covariance @ residual)
+            h_value, exp_matrix = h_function(weights)
+
+            obj = loss + 0.5 * rho * h_value * h_value + alpha * h_value + self._beta * w.sum()
+
+            grad_loss = - covariance @ residual
+            grad_h = exp_matrix.T * weights * 2
+            grad = grad_loss + (rho * h_value + alpha) * grad_h
+            return obj, numpy.append(grad, - grad, axis=None) + self._beta
+
+        # Warm start from the previous solution.
+        w_est = numpy.append(numpy.clip(self.weights, 0, None), numpy.clip(- self.weights, 0, None))
+        rho, alpha = self._rho, self._alpha
+        h_value = h_function(to_matrix(w_est))[0] if self.weights.any() else numpy.inf
+
+        for _ in range(self._max_iter):
+            w_new, h_new = w_est, numpy.inf
+            while rho < 1e20:
+                w_new = scipy.optimize.minimize(objective, w_est, method='L-BFGS-B', jac=True, bounds=bounds).x
+                h_new = h_function(to_matrix(w_new))[0]
+                # Accept the step if the constraint violation has been reduced enough, or if the previous solution was
+                # already feasible (warm start from a converged run).
+                if h_new <= 0.25 * h_value or h_new <= self._h_tol:
+                    break
+                rho *= 10
+            w_est, h_value = w_new, h_new
+            alpha += rho * h_value
+            if h_value <= self._h_tol:
+                break
+
+        self.weights = to_matrix(w_est)
+        self._rho, self._alpha = rho, alpha
+
+        return self.structure_model(w_threshold)
+
+    def structure_model(self, w_threshold=0.0):
+        """Return the last solution as a causalnex StructureModel, dropping edges with |weight| <= w_threshold."""
+        structure_model = StructureModel()
+        structure_model.add_nodes_from(self.columns)
+        for i, j in zip(*numpy.nonzero(numpy.abs(self.weights) > w_threshold)):
+            structure_model.add_edge(self.columns[i], self.columns[j], origin="learned", weight=self.weights[i, j])
+        return structure_model
+
+    # PERSISTENCE ------------------------------------------------------------------------------------------------------
+    def save(self, path):
+        state = {
+            'columns': self.columns,
+            'tabu_child_nodes': self._tabu_child_nodes,
+            'tabu_parent_nodes': self._tabu_parent_nodes,
+            'beta': self._beta,
+            'max_iter': self._max_iter,
+            'h_tol': self._h_tol,
+            'n_rows': self.n_rows,
+            'gram': self._gram.tolist(),
+            'fingerprints': sorted(self._fingerprints),
+            'weights': self.weights.tolist(),
+            'rho': self._rho,
+            'alpha': self._alpha,
+        }
+        with open(path, 'w') as f:
+            json.dump(state, f)
+            f.close()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            state = json.load(f)
+            f.close()
+
+        learner = cls(state['columns'], tabu_child_nodes=state['tabu_child_nodes'],
+                      tabu_parent_nodes=state['tabu_parent_nodes'], beta=state['beta'], max_iter=state['max_iter'],
+                      h_tol=state['h_tol'])
+        learner.n_rows = state['n_rows']
+        learner._gram = numpy.array(state['gram'])
+        # State files saved before the fingerprints were kept have none.
+        learner._fingerprints = set(state.get('fingerprints', []))
+        learner.weights = numpy.array(state['weights'])
+        learner._rho = state['rho']
+        learner._alpha = state['alpha']
+        return learner
+
+    @classmethod
+    def load_or_create(cls, path, columns, **kwargs):
+        """Load the learner state saved by the previous run, or create a new learner if there is none."""
+        if os.path.exists(path):
+            learner = cls.load(path)
+            if learner.columns == list(columns):
+                return learner
+            print('The saved learner state has different columns, starting a new one.')
+        return cls(columns, **kwargs)
+
+    def set_prior_edges(self, edges):
+        """Use a list of (parent, child, weight) edges as the starting solution."""
+        self.weights = numpy.zeros((self._d, self._d))
+        for parent, child, weight in edges:
+            self.weights[self.columns.index(parent), self.columns.index(child)] = float(weight)
+        # Restart the multipliers: an imported solution is not guaranteed to be feasible for the new data.
+        self._rho, self._alpha = 1.0, 0.0
+
+    def set_prior_from_dot(self, dot_path):
+        """Use the "graph.dot" file exported by the notebook as the starting solution."""
+        graph = networkx.drawing.nx_pydot.read_dot(dot_path)
+        edges = [(u, v, str(data.get('weight', 0)).strip('"')) for u, v, data in graph.edges(data=True)]
+        self.set_prior_edges(edges)
+
+    def set_prior_from_edges_weights(self, txt_path):
+        """Use the "edges-weights.txt" file exported by the notebook as the starting solution."""
+        with open(txt_path, 'r') as f:
+            text = f.read()
+            f.close()
+        # Lines in the form "parent -> child: weight". The pattern does not rely on new lines to split the records.
+        pattern = r'([A-Za-z_]\w*) -> ([A-Za-z_]\w*): ([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)'
+        self.set_prior_edges(re.findall(pattern, text))
@@ -0,0 +1,111 @@
+"""
+weighted_estimation.py file: WeightedEstimation class
+
+The class responsibility is to compute the statistics of the causal stage from an importance sampled dataset.
+
+With importance sampling (see the IMPORTANCE_ variables of the manufacturing model), the machines break more often than
+in reality and each machine log row has the likelihood ratio of the run up to that row ("weight Machine X" columns of
+merged_logs.csv). The weight of a dataset row is the product of the machine weights. The row counts of the notebook are
+replaced by sums of the row weights:
+    - ratio: P(event | condition) = sum of the weights of the rows with the condition and the event / sum of the weights
+      of the rows with the condition (self-normalized estimator);
+    - CPDs: the counts of each node state and parent states combination are weighted, with the same K2 prior (one
+      pseudo-count per cell) of the causalnex BayesianEstimator. The fitted tables are compiled into a QueryService.
+
+Without weight columns, all the weights are 1 and the results are the unweighted ones of the notebook.
+"""
+
+import itertools
+import numpy
+import pandas
+from query_service import QueryService
+
+
+class WeightedEstimation(object):
+    # Prefix of the weight columns of the merged logs (spaces replaced by underscores in the notebook data).
+    WEIGHT_PREFIXES = ('weight ', 'weight_')
+
+    # WEIGHTS ----------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def weight_columns(columns):
+        return [column for column in columns if column.startswith(WeightedEstimation.WEIGHT_PREFIXES)]
+
+    @staticmethod
+    def row_weights(data):
+        """Weight of each row of a dataframe: product of its weight columns, or 1 without weight columns."""
+        weights = numpy.ones(len(data))
+        for column in WeightedEstimation.weight_columns(data.columns):
+            weights *= data[column].to_numpy(dtype=float)
+        return weights
+
+    @staticmethod
+    def read_weights(csv_path, chunk_rows=1000000):
+        """Row weights of the merged logs CSV, reading only its weight columns by chunks."""
+        columns = WeightedEstimation.weight_columns(pandas.read_csv(csv_path, nrows=0).columns)
+        if not columns:
+            return numpy.ones(sum(len(chunk) for chunk in pandas.read_csv(csv_path, usecols=[0], chunksize=chunk_rows)))
+        return numpy.concatenate([WeightedEstimation.row_weights(chunk) for chunk in
+                                  pandas.read_csv(csv_path, usecols=columns, chunksize=chunk_rows)])
+
+    @staticmethod
+    def effective_sample_size(weights):
+        """Number of unweighted rows giving the same precision: (sum of the weights)^2 / sum of the squared weights."""
+        weights = numpy.asarray(weights, dtype=float)
+        return float(weights.sum() ** 2 / (weights * weights).sum()) if len(weights) else 0.0
+
+    # ESTIMATES --------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def _mask(data, values):
+        mask = numpy.ones(len(data), dtype=bool)
+        for column, value in values.items():
+            mask &= data[column].to_numpy() == value
+        return mask
+
+    @staticmethod
+    def ratio(data, weights, condition, event):
+        """
+        Weighted P(event | condition), with condition and event dicts column -> value, e.g. the notebook "Ratio A High":
+        ratio(data, weights, {"failure Machine A": 1, "Machine A flag": 1}, {"Machine C flag": 1}).
+        """
+        weights = numpy.asarray(weights, dtype=float)
+        condition_mask = WeightedEstimation._mask(data, condition)
+        total = weights[condition_mask].sum()
+        if total == 0:
+            return float('nan')
+        return float(weights[condition_mask & WeightedEstimation._mask(data, event)].sum() / total)
+
+    @staticmethod
+    def cpd_values(data, weights, node, parents, node_states, prior=1.0):
+        """
+        Weighted CPD of the node given its parents, as an array (node states, parent states combinations) with the
+        column order of the causalnex CPDs (first parent outermost). "prior" is the pseudo-count of each cell (K2: 1).
+        """
+        weights = numpy.asarray(weights, dtype=float)
+        combinations = list(itertools.product(*[node_states[parent] for parent in parents]))
+        values = numpy.full((len(node_states[node]), len(combinations)), float(prior))
+
+        node_values = data[node].to_numpy()
+        parent_masks = {parent: {state: data[parent].to_numpy() == state for state in node_states[parent]}
+                        for parent in parents}
+        for j, combination in enumerate(combinations):
+            mask = numpy.ones(len(data), dtype=bool)
+            for parent, state in zip(parents, combination):
+                mask &= parent_masks[parent][state]
+            for i, state in enumerate(node_states[node]):
+                values[i, j] += weights[mask & (node_values == state)].sum()
+        return values / values.sum(axis=0, keepdims=True)
+
+    @staticmethod
+    def query_service(bayesian_net, data, weights, prior=1.0, **kwargs):
+        """
+        QueryService of the structure and node states of a causalnex BayesianNetwork (after "fit_node_states"), with
+        the CPDs fitted on the weighted data.
+        """
+        node_states, parents, cpd_values = dict(), dict(), dict()
+        nodes = list(bayesian_net.cpds.keys())
+        for node, cpd in bayesian_net.cpds.items():
+            node_states[node] = list(cpd.index)
+            parents[node] = [name for name in cpd.columns.names if name is not None]
+        for node in nodes:
+            cpd_values[node] = WeightedEstimation.cpd_values(data, weights, node, parents[node], node_states, prior)
+        return QueryService(nodes, node_states, parents, cpd_values, **kwargs)
@@ -0,0 +1,12 @@
+"""
+conftest.py file: tests configuration
+
+The modules of the model import each other by their file name, as when they are run from their folder: the folders of
+the manufacturing model and of the causal model are added to the import path of the tests.
+"""
+
+import os
+import sys
+
+for folder in ('manufacturing_model', 'causal_model'):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), folder))
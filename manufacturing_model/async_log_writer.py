@@ -0,0 +1,114 @@
+"""
+async_log_writer.py file: AsyncLogWriter class
+
+The class responsibility is to take the log file writes out of the simulation thread: the texts are queued and a
+background thread appends them to their files, keeping the files open. The order of the writes of each file is kept.
+
+While a writer is installed, the CsvLogger and TxtLogger writes are queued into it, and the console output can be
+redirected into a log file with "stream". A writer can also be attached to the loggers of some model entities only
+("attach", e.g. the machines and containers of a line), without changing the other loggers: it is how the StreamingTwin
+and the shards of the ShardedSimulation use it, where the simulation must never wait for the disk.
+"""
+
+import collections
+import queue
+import threading
+from csv_logger import CsvLogger
+from txt_logger import TxtLogger
+
+
+class AsyncLogWriter(object):
+    def __init__(self, flush_interval=1.0):
+        self._queue = queue.Queue()
+        self._flush_interval = flush_interval
+        self._files = dict()
+        self._previous_writers = None
+
+        self._thread = threading.Thread(target=self._writing, name='AsyncLogWriter', daemon=True)
+        self._thread.start()
+
+    def write(self, path, text):
+        """Append the text to the file, without waiting for the disk."""
+        self._queue.put((path, text))
+
+    def stream(self, path):
+        """File-like object writing into the file through the writer, e.g. for contextlib.redirect_stdout."""
+        return _WriterStream(self, path)
+
+    def install(self):
+        """Route the CsvLogger and TxtLogger writes into this writer."""
+        self._previous_writers = (CsvLogger.writer, TxtLogger.writer)
+        CsvLogger.writer = self
+        TxtLogger.writer = self
+        return self
+
+    def attach(self, entities):
+        """Route the writes of the loggers of the model entities (machines, containers) into this writer."""
+        for entity in entities:
+            for logger in vars(entity).values():
+                if isinstance(logger, (CsvLogger, TxtLogger)):
+                    logger.writer = self
+        return self
+
+    def close(self):
+        """Restore the loggers, write all the queued texts and close the files."""
+        if self._previous_writers is not None:
+            CsvLogger.writer, TxtLogger.writer = self._previous_writers
+            self._previous_writers = None
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _writing(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                # Nothing to write: the data reaches the disk while the simulation is idle.
+                for f in self._files.values():
+                    f.flush()
+                continue
+
+            # Taking all the queued texts at once, to write each file once.
+            items = [item]
+            while item is not None:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                items.append(item)
+
+            texts = collections.OrderedDict()
+            for item in items:
+                if item is not None:
+                    texts.setdefault(item[0], list()).append(item[1])
+            for path, text in texts.items():
+                f = self._files.get(path)
+                if f is None:
+                    f = self._files[path] = open(path, 'a')
+                f.write(''.join(text))
+
+            if items[-1] is None:
+                break
+
+        for f in self._files.values():
+            f.close()
+        self._files = dict()
+
+
+class _WriterStream(object):
+    def __init__(self, writer, path):
+        self._writer = writer
+        self._path = path
+
+    def write(self, text):
+        self._writer.write(self._path, text)
+        return len(text)
+
+    def flush(self):
+        pass
@@ -0,0 +1,349 @@
+"""
+batch_simulator.py file: BatchSimulator class
+
+Vectorized simulator of the A/B -> C production line, for large Monte Carlo studies: thousands of replications of the
+line are advanced together, one time step at a time (lockstep), as NumPy arrays of buffer levels, phase end steps,
+repair end steps and next failure steps. No SimPy process is involved.
+
+The event semantics are the ones of the SimPy model:
+    - Machine: a cycle is "wait for the input buffer" -> input handling (GET_STD_DELAY) -> processing (normal time) ->
+      "wait for the output buffer" -> output handling (PUT_STD_DELAY) -> 1 time step before the next cycle. A failure
+      (exponential TTF, re-drawn at each failure) breaks the machine only during the handling and the processing: the
+      phase is suspended for the repair time (exponential TTR). Failures during the waits, the last time step of the
+      cycle or the repairs are lost. The breakdowns are counted when the repair ends.
+    - InputContainer A/B: when the level is under the critical level at a check step, the supplier refills 50 pieces
+      after its lead time, then the level is checked again after the refilling check time.
+    - OutputContainer C: when the level reaches the critical level at a check step, the dispatcher takes all the pieces
+      after its lead time, then the level is checked again after the retrieved check time.
+    - TransferenceSystem: at each step, one piece of A and one of B are moved into the raw container of C, if possible.
+As in the SimPy model, the first failure step of the machines is drawn from the same random number (each SimPy machine
+re-seeds the random generator when its breakdown process starts).
+
+Within a time step the entities are updated in a fixed order: failures, input containers controls, machine A,
+machine B, transference system, machine C, output container control. The SimPy model orders the events of the same
+step by their scheduling, so single replications differ, while the KPI distributions are the same: the
+ValidationHarness checks the statistical equivalence of the two models.
+
+The KPIs have the keys of ProductionLine.kpis(), with one value per replication. The step by step series (buffer
+levels, produced parts, failure flags, expected product flags) are recorded for the first "record" replications, and can
+be read as a dataframe with the column names of the merged logs.
+"""
+
+import math
+import time
+import numpy
+import pandas
+from statistics import mean
+from global_variables import GlobalVariables
+
+
+# BATCH SIMULATOR CLASS ------------------------------------------------------------------------------------------------
+class BatchSimulator(object):
+    # Machine phases
+    WAIT_IN = 0
+    HANDLE_IN = 1
+    PROCESS = 2
+    WAIT_OUT = 3
+    HANDLE_OUT = 4
+    TRAIL = 5
+
+    MACHINES = ('A', 'B', 'C')
+    CONTAINERS = ('input A', 'output A', 'input B', 'output B', 'input C', 'output C')
+
+    def __init__(self, replications, variables=GlobalVariables, seed=None, record=0):
+        self.replications = replications
+        self._variables = variables
+        self._rng = numpy.random.default_rng(seed)
+        self._record = min(record, replications)
+        self.now = 0
+
+        v = variables
+        r = replications
+        # Containers: level and capacity.
+        self.level = {
+            'input A': numpy.full(r, v.INITIAL_A_RAW, dtype=numpy.int64),
+            'output A': numpy.full(r, v.INITIAL_A_FINISHED, dtype=numpy.int64),
+            'input B': numpy.full(r, v.INITIAL_B_RAW, dtype=numpy.int64),
+            'output B': numpy.full(r, v.INITIAL_B_FINISHED, dtype=numpy.int64),
+            'input C': numpy.full(r, v.INITIAL_C_FINISHED, dtype=numpy.int64),
+            'output C': numpy.full(r, v.INITIAL_C_FINISHED, dtype=numpy.int64),
+        }
+        self._capacity = {
+            'input A': v.CONTAINER_A_RAW_CAPACITY, 'output A': v.CONTAINER_A_FINISHED_CAPACITY,
+            'input B': v.CONTAINER_B_RAW_CAPACITY, 'output B': v.CONTAINER_B_FINISHED_CAPACITY,
+            'input C': v.CONTAINER_C_FINISHED_CAPACITY, 'output C': v.CONTAINER_C_FINISHED_CAPACITY,
+        }
+        self.products_delivered = numpy.zeros(r, dtype=numpy.int64)
+
+        # Containers controls, as in ProductionLine: suppliers of A and B raw containers, dispatcher of C finished one.
+        self._suppliers = list()
+        for key in ('A', 'B'):
+            self._suppliers.append({
+                'container': 'input ' + key,
+                'critical': getattr(v, 'CRITICAL_STOCK_' + key + '_RAW'),
+                'lead_time': getattr(v, 'SUPPLIER_LEAD_TIME_' + key + '_RAW'),
+                'after_check': getattr(v, 'AFTER_REFILLING_CHECK_TIME_' + key + '_RAW'),
+                'std_check': getattr(v, 'STANDARD_' + key + '_CHECK_TIME'),
+                'next_check': numpy.zeros(r, dtype=numpy.int64),
+                'arrival': numpy.full(r, -1, dtype=numpy.int64),
+            })
+        self._dispatcher = {
+            'container': 'output C',
+            'critical': v.CRITICAL_STOCK_C_FINISHED,
+            'lead_time': v.DISPATCHER_LEAD_TIME_C_FINISHED,
+            'after_check': v.DISPATCHER_RETRIEVED_CHECK_TIME_C_FINISHED,
+            'std_check': v.DISPATCHER_STD_CHECK_TIME_C_FINISHED,
+            'next_check': numpy.zeros(r, dtype=numpy.int64),
+            'arrival': numpy.full(r, -1, dtype=numpy.int64),
+        }
+
+        # Machines: phase, phase end step (waits are checked at every step), failures and counters.
+        first_failure = self._rng.random(r)
+        self._tolerance = int(mean([v.MEAN_PROCESS_TIME_A, v.MEAN_PROCESS_TIME_B, v.MEAN_PROCESS_TIME_C]))
+        self.machine = dict()
+        for key in self.MACHINES:
+            mttf = getattr(v, 'MTTF_' + key)
+            self.machine[key] = {
+                'input': 'input ' + key, 'output': 'output ' + key,
+                'mean_process_time': getattr(v, 'MEAN_PROCESS_TIME_' + key),
+                'sigma_process_time': getattr(v, 'SIGMA_PROCESS_TIME_' + key),
+                'MTTF': mttf, 'MTTR': getattr(v, 'MTTR_' + key),
+                # Every replication starts a cycle at the step 0.
+                'phase': numpy.full(r, self.TRAIL, dtype=numpy.int8),
+                'end': numpy.zeros(r, dtype=numpy.int64),
+                'wait_start': numpy.zeros(r, dtype=numpy.int64),
+                'lost_failure': numpy.zeros(r, dtype=bool),
+                'next_failure': (- numpy.log(1.0 - first_failure) * mttf).astype(numpy.int64),
+                'failure_start': numpy.full(r, -1, dtype=numpy.int64),
+                'repair_end': numpy.full(r, -1, dtype=numpy.int64),
+                'last_piece_step': numpy.zeros(r, dtype=numpy.int64),
+                'parts_made': numpy.zeros(r, dtype=numpy.int64),
+                'breakdowns': numpy.zeros(r, dtype=numpy.int64),
+                'breakdown_time': numpy.zeros(r, dtype=numpy.int64),
+                'starving_time': numpy.zeros(r, dtype=numpy.int64),
+                'blocking_time': numpy.zeros(r, dtype=numpy.int64),
+            }
+            self.machine[key]['first_failure'] = int(self.machine[key]['next_failure'].min())
+
+        self._series = None
+
+    # SIMULATION -------------------------------------------------------------------------------------------------------
+    def run(self, until=None):
+        """Advance all the replications up to the step "until" (excluded), default SIM_TIME."""
+        until = int(until if until is not None else self._variables.SIM_TIME)
+        if self._record and self._series is None:
+            self._init_series(until)
+
+        for step in range(self.now, until):
+            self.now = step
+            for key in self.MACHINES:
+                if self.machine[key]['first_failure'] == step:
+                    self._failures(self.machine[key], step)
+            for supplier in self._suppliers:
+                self._supplier(supplier, step)
+            self._machine(self.machine['A'], step)
+            self._machine(self.machine['B'], step)
+            self._transfer()
+            self._machine(self.machine['C'], step)
+            self._dispatch(self._dispatcher, step)
+            if self._record:
+                self._record_step(step)
+        self.now = until
+        return self.kpis()
+
+    def _failures(self, m, step):
+        while m['first_failure'] == step:
+            idx = numpy.flatnonzero(m['next_failure'] == step)
+            m['next_failure'][idx] = step + (self._rng.exponential(m['MTTF'], idx.size)).astype(numpy.int64)
+            m['first_failure'] = int(m['next_failure'].min())
+
+            # Failures during a repair are skipped, failures out of the handling and the processing are lost.
+            idx = idx[m['repair_end'][idx] < step]
+            phase = m['phase'][idx]
+            lost = (phase == self.WAIT_IN) | (phase == self.WAIT_OUT)
+            m['lost_failure'][idx[lost]] = True
+            idx = idx[(phase == self.HANDLE_IN) | (phase == self.PROCESS) | (phase == self.HANDLE_OUT)]
+            if idx.size == 0:
+                continue
+
+            # The phase is suspended for the repair time.
+            repair = (self._rng.exponential(m['MTTR'], idx.size)).astype(numpy.int64)
+            m['failure_start'][idx] = step
+            m['repair_end'][idx] = step + repair
+            m['end'][idx] += repair
+            m['breakdowns'][idx] += 1
+            m['breakdown_time'][idx] += repair
+
+    def _machine(self, m, step):
+        idx = numpy.flatnonzero(m['end'] == step)
+        if idx.size == 0:
+            return
+        phase = m['phase'][idx]
+        input_level = self.level[m['input']]
+        output_level = self.level[m['output']]
+
+        # The steps of the cycle are processed in order, so a replication can go through more than one of them.
+        # End of the cycle: start a new one, checking the input buffer.
+        done = idx[phase == self.TRAIL]
+        m['phase'][done] = self.WAIT_IN
+        m['wait_start'][done] = step
+
+        # Waiting for the input buffer: the wait is counted at each step (unless a lost failure interrupted it).
+        waiting = idx[m['phase'][idx] == self.WAIT_IN]
+        counted = waiting[(m['wait_start'][waiting] < step) & ~ m['lost_failure'][waiting]]
+        m['starving_time'][counted] += 1
+        m['lost_failure'][waiting] = False
+        ready = waiting[input_level[waiting] > 0]
+        m['end'][waiting] = step + 1
+        m['phase'][ready] = self.HANDLE_IN
+        m['end'][ready] = step + self._variables.GET_STD_DELAY
+
+        # End of the input handling: the piece is taken and its processing time drawn.
+        done = idx[(m['phase'][idx] == self.HANDLE_IN) & (m['end'][idx] == step)]
+        input_level[done] -= 1
+        process_time = self._rng.normal(m['mean_process_time'], m['sigma_process_time'], done.size)
+        m['phase'][done] = self.PROCESS
+        m['end'][done] = step + numpy.maximum(process_time.astype(numpy.int64), 0)
+
+        # Part done, checking the output buffer.
+        done = idx[(m['phase'][idx] == self.PROCESS) & (m['end'][idx] == step)]
+        m['parts_made'][done] += 1
+        m['last_piece_step'][done] = step
+        m['phase'][done] = self.WAIT_OUT
+        m['wait_start'][done] = step
+
+        # Waiting for the output buffer.
+        waiting = idx[m['phase'][idx] == self.WAIT_OUT]
+        counted = waiting[(m['wait_start'][waiting] < step) & ~ m['lost_failure'][waiting]]
+        m['blocking_time'][counted] += 1
+        m['lost_failure'][waiting] = False
+        ready = waiting[output_level[waiting] < self._capacity[m['output']]]
+        m['end'][waiting] = step + 1
+        m['phase'][ready] = self.HANDLE_OUT
+        m['end'][ready] = step + self._variables.PUT_STD_DELAY
+
+        # End of the output handling: the piece is stored, the cycle ends at the next step.
+        done = idx[(m['phase'][idx] == self.HANDLE_OUT) & (m['end'][idx] == step)]
+        output_level[done] += 1
+        m['phase'][done] = self.TRAIL
+        m['end'][done] = step + 1
+
+    def _transfer(self):
+        output_a, output_b, input_c = self.level['output A'], self.level['output B'], self.level['input C']
+        idx = numpy.flatnonzero((output_a > 0) & (output_b > 0) & (input_c < self._capacity['input C']))
+        output_a[idx] -= 1
+        output_b[idx] -= 1
+        input_c[idx] += 1
+
+    def _supplier(self, control, step):
+        level = self.level[control['container']]
+        # Refill of the supplier arrived: the put waits if the container has no room for it.
+        arrived = numpy.flatnonzero(control['arrival'] == step)
+        if arrived.size:
+            room = level[arrived] + 50 <= self._capacity[control['container']]
+            control['arrival'][arrived[~ room]] = step + 1
+            arrived = arrived[room]
+            level[arrived] += 50
+            control['arrival'][arrived] = -1
+            control['next_check'][arrived] = step + control['after_check']
+
+        checked = self._checked(control, step)
+        called = checked[level[checked] <= control['critical']]
+        control['next_check'][checked] = step + control['std_check']
+        control['next_check'][called] = -1
+        control['arrival'][called] = step + control['lead_time']
+        if control['lead_time'] == 0 and called.size:
+            self._supplier(control, step)
+
+    def _dispatch(self, control, step):
+        level = self.level[control['container']]
+        arrived = numpy.flatnonzero(control['arrival'] == step)
+        if arrived.size:
+            self.products_delivered[arrived] += level[arrived]
+            level[arrived] = 0
+            control['arrival'][arrived] = -1
+            control['next_check'][arrived] = step + control['after_check']
+
+        checked = self._checked(control, step)
+        called = checked[level[checked] >= control['critical']]
+        control['next_check'][checked] = step + control['std_check']
+        control['next_check'][called] = -1
+        control['arrival'][called] = step + control['lead_time']
+        if control['lead_time'] == 0 and called.size:
+            self._dispatch(control, step)
+
+    @staticmethod
+    def _checked(control, step):
+        # Replications checking the level at this step (-1: waiting for the supplier or the dispatcher).
+        return numpy.flatnonzero(control['next_check'] == step)
+
+    # RESULTS ----------------------------------------------------------------------------------------------------------
+    def kpis(self):
+        """KPIs of each replication, with the keys of ProductionLine.kpis() and an array of values per key."""
+        kpis = {'sim_time': self.now,
+                'delivered_pieces': self.products_delivered + self.level['output C']}
+        for key, m in self.machine.items():
+            # As in the SimPy model, a breakdown is counted when its repair ends.
+            repairing = m['repair_end'] >= self.now
+            kpis['parts_made_' + key] = m['parts_made'].copy()
+            kpis['breakdowns_' + key] = m['breakdowns'] - repairing
+            kpis['breakdown_time_' + key] = m['breakdown_time'] - numpy.where(
+                repairing, m['repair_end'] - m['failure_start'], 0)
+            kpis['starving_time_' + key] = m['starving_time'].copy()
+            kpis['blocking_time_' + key] = m['blocking_time'].copy()
+        return kpis
+
+    def _init_series(self, until):
+        shape = (self._record, until)
+        self._series = {'step': numpy.arange(until)}
+        for key in self.MACHINES:
+            name = 'Machine ' + key
+            self._series['input ' + name] = numpy.zeros(shape, dtype=numpy.int32)
+            self._series['output ' + name] = numpy.zeros(shape, dtype=numpy.int32)
+            self._series['produced ' + name] = numpy.zeros(shape, dtype=numpy.int32)
+            self._series['failure ' + name] = numpy.zeros(shape, dtype=bool)
+            self._series[name + ' flag'] = numpy.zeros(shape, dtype=bool)
+
+    def _record_step(self, step):
+        if step >= self._series['step'].size:
+            return
+        k = self._record
+        for key, m in self.machine.items():
+            name = 'Machine ' + key
+            self._series['input ' + name][:, step] = self.level[m['input']][:k]
+            self._series['output ' + name][:, step] = self.level[m['output']][:k]
+            self._series['produced ' + name][:, step] = m['parts_made'][:k]
+            self._series['failure ' + name][:, step] = (m['failure_start'][:k] <= step) & (m['repair_end'][:k] > step)
+            self._series[name + ' flag'][:, step] = \
+                m['last_piece_step'][:k] + m['mean_process_time'] + self._tolerance < step
+
+    def series(self, replication=0):
+        """Step by step series of a recorded replication, as a dataframe with the merged logs column names."""
+        if self._series is None or replication >= self._record:
+            raise ValueError('The replication {0} has not been recorded: set "record" to at least {1}.'
+                             .format(replication, replication + 1))
+        data = {'step': self._series['step']}
+        for name, values in self._series.items():
+            if name != 'step':
+                data[name] = values[replication]
+        return pandas.DataFrame(data).set_index('step')
+
+    @staticmethod
+    def summary(kpis):
+        """Mean, standard deviation and 95% confidence interval half width of each KPI over the replications."""
+        rows = dict()
+        for name, values in kpis.items():
+            values = numpy.asarray(values, dtype=float)
+            if values.ndim == 0:
+                continue
+            std = values.std(ddof=1) if values.size > 1 else 0.0
+            rows[name] = {'mean': values.mean(), 'std': std, 'ci95': 1.96 * std / math.sqrt(values.size)}
+        return pandas.DataFrame(rows).T
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    start_time = time.time()
+    simulator = BatchSimulator(1000, GlobalVariables.derive(WORKING_WEEKS=4), seed=0)
+    print(BatchSimulator.summary(simulator.run()))
+    print('1000 replications in {0:.1f} secs'.format(time.time() - start_time))
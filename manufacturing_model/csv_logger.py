@@ -3,21 +3,52 @@ csv_logger.py file: CsvLogger class
 
 the class responsibility is to enable the log capabilities for the instantiated model objects and to save them as a .csv
 file.
+
+While an AsyncLogWriter is installed (class attribute "writer") or attached to the logger ("writer" of the instance),
+the log lines are queued into it instead of written.
+While a LogSegmenter is installed (class attribute "segmenter") when the logger is created, the log is written into
+segments of the file, each one starting with the header.
+
+Without log path (None), no file is created: the log is kept in memory, see csv_text().
 """
 
 import os
 
 
 class CsvLogger(object):
+    # AsyncLogWriter receiving the writes, if any.
+    writer = None
+    # LogSegmenter splitting the files, if any.
+    segmenter = None
+
     def __init__(self, csv_log_path, csv_log_filename):
         self._csv_log_path = csv_log_path
         self._csv_log_filename = csv_log_filename
 
-        self._complete_csv_filename = os.path.join(self._csv_log_path + "/" + self._csv_log_filename)
+        self._complete_csv_filename = None
+        # In memory log (head and texts written), without log path.
+        self._texts = None
+        if csv_log_path is None:
+            self._texts = list()
+        else:
+            self._complete_csv_filename = os.path.join(self._csv_log_path + "/" + self._csv_log_filename)
 
         self._heading = self._csv_log_filename.split("log.")[0].strip()
+        # Segmented log: the segmenter, the header of the segments and the index of the "until" column, if any.
+        self._segmenter = self.segmenter if csv_log_path is not None else None
+        self._head = ''
+        self._until_column = None
 
     def initialise_csv_log_file(self, head):
+        if self._texts is not None:
+            self._texts = [head]
+            return
+        if self._segmenter is not None:
+            # The segments are created by the segmenter at the first write.
+            self._head = head
+            columns = head.rstrip('\n').split(',')
+            self._until_column = columns.index('until') if 'until' in columns else None
+            return
         try:
             with open(self._complete_csv_filename, "w") as f:
                 f.close()
@@ -48,6 +79,30 @@ class CsvLogger(object):
                     # ... else, just add the string to the text.
                     text = text + str(data_list[i][j]) + ","
 
+        if self._texts is not None:
+            self._texts.append(text)
+            return
+        if self._segmenter is not None:
+            self._segmenter.write(self._complete_csv_filename, text, self._head, *self._step_range(data_list))
+            return
+        if self.writer is not None:
+            self.writer.write(self._complete_csv_filename, text)
+            return
+
         with open(self._complete_csv_filename, "a") as f:
             f.write(text)
             f.close()
+
+    def _step_range(self, data_list):
+        # First and last step of the rows ("step.moment" or step), the last one up to the "until" of an interval.
+        if not data_list:
+            return None, None
+        steps = [int(str(row[0]).split('.')[0]) for row in data_list]
+        if self._until_column is not None:
+            steps.extend(int(row[self._until_column]) for row in data_list
+                         if len(row) > self._until_column and row[self._until_column] not in (None, ''))
+        return steps[0], max(steps)
+
+    def csv_text(self):
+        """Content of the in memory log (without log path), as the CSV file would have."""
+        return ''.join(self._texts or ())
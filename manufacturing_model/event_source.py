@@ -0,0 +1,134 @@
+"""
+event_source.py file: EventSource, IterableEventSource, FileTailEventSource and SocketEventSource classes
+
+The classes responsibility is to deliver the machine state events of the real line to the StreamingTwin. An event is a
+dict:
+
+    {"machine": "A", "event": "breakdown", "step": 1200, "repair_time": 300}
+
+    - "machine": identifying letter of the machine;
+    - "event": "breakdown", "repair" or "part_done";
+    - "step": simulation step of the event (optional: the twin uses its clock when missing);
+    - "repair_time": only for the breakdowns, optional (the machine stays broken until the "repair" event when missing).
+
+The sources are interchangeable: the live ones read JSON lines from a file being written (FileTailEventSource) or from
+a local TCP socket (SocketEventSource); IterableEventSource replays a list of events, to use the twin offline.
+Each event gets a "received" key, the time.perf_counter() value when it has been read, to measure the twin latency.
+"""
+
+import abc
+import json
+import os
+import socket
+import time
+
+
+# EVENT SOURCE CLASS ---------------------------------------------------------------------------------------------------
+class EventSource(abc.ABC):
+    """Base class: an iterable of events. The iteration ends when the source is closed or exhausted."""
+    def __iter__(self):
+        for event in self._events():
+            event['received'] = time.perf_counter()
+            yield event
+
+    @abc.abstractmethod
+    def _events(self):
+        """Events of the source, without the "received" key."""
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def parse(line):
+        """Event from a JSON line, None for the empty lines."""
+        line = line.strip()
+        if not line:
+            return None
+        return json.loads(line)
+
+
+class IterableEventSource(EventSource):
+    def __init__(self, events):
+        self._source = events
+
+    def _events(self):
+        for event in self._source:
+            yield dict(event)
+
+
+class FileTailEventSource(EventSource):
+    """
+    Follows a file of JSON lines, as "tail -f" does. The iteration ends after "idle_timeout" seconds without new lines
+    (never, when None).
+    """
+    def __init__(self, path, poll_interval=0.01, idle_timeout=None, from_start=True):
+        self._path = path
+        self._poll_interval = poll_interval
+        self._idle_timeout = idle_timeout
+        self._from_start = from_start
+        self._closed = False
+
+    def _events(self):
+        while not os.path.exists(self._path) and not self._closed:
+            time.sleep(self._poll_interval)
+
+        with open(self._path, 'r') as f:
+            if not self._from_start:
+                f.seek(0, os.SEEK_END)
+            buffer = ''
+            last_line_time = time.time()
+            while not self._closed:
+                chunk = f.readline()
+                if chunk:
+                    buffer += chunk
+                    # A line is complete only with its newline: the writer may be in the middle of it.
+                    if buffer.endswith('\n'):
+                        event = self.parse(buffer)
+                        buffer = ''
+                        last_line_time = time.time()
+                        if event is not None:
+                            yield event
+                    continue
+
+                if self._idle_timeout is not None and time.time() - last_line_time > self._idle_timeout:
+                    break
+                time.sleep(self._poll_interval)
+            f.close()
+
+    def close(self):
+        self._closed = True
+
+
+class SocketEventSource(EventSource):
+    """
+    Local TCP server receiving JSON lines. The clients are served one at a time; the iteration ends when a client
+    disconnects, unless "keep_listening" is set.
+    """
+    def __init__(self, host='127.0.0.1', port=0, keep_listening=False):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(1)
+        self._keep_listening = keep_listening
+        # The port chosen by the system when port is 0.
+        self.address = self._server.getsockname()
+
+    def _events(self):
+        try:
+            while True:
+                connection, _ = self._server.accept()
+                # Small events: they are sent as soon as they are written.
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with connection, connection.makefile('r') as stream:
+                    for line in stream:
+                        event = self.parse(line)
+                        if event is not None:
+                            yield event
+                if not self._keep_listening:
+                    break
+        except OSError:
+            # The server socket has been closed.
+            pass
+
+    def close(self):
+        self._server.close()
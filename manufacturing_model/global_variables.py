@@ -94,6 +94,12 @@ class GlobalVariables(object):
     # Standard Availability = 91,3%
     # Standard Un-Availability = 8,7%
 
+    # Importance sampling of the breakdowns, for rare-failure studies: the failure rates of the machines are multiplied
+    # by IMPORTANCE_FAILURE_FACTOR and their mean repair times by IMPORTANCE_REPAIR_FACTOR, and the logs and the KPIs
+    # get the likelihood ratio weights of the real rates. 1 to disable.
+    IMPORTANCE_FAILURE_FACTOR = 1
+    IMPORTANCE_REPAIR_FACTOR = 1
+
     # SIM PARAMETERS ---------------------------------------------------------------------------------------------------
     WORKING_SECS = 60               # Working seconds for a minute in a day
     WORKING_MINS = 60               # Working minutes for an hour in a day
@@ -105,9 +111,66 @@ class GlobalVariables(object):
     # Total simulation time in minutes - for test purposes keep 60/90/120 total days
     SIM_TIME = WORKING_SECS * WORKING_MINS * WORKING_HOURS * SHIFTS_IN_A_WORKING_DAY * BUSINESS_DAYS * WORKING_WEEKS
 
+    # Fast-forward mode: processes jump to the next step when their state can change, instead of checking it at every
+    # step. Repeated logs are interval encoded. The order of the processes within a step is not the one of the step by
+    # step mode, so a waiting process can notice a buffer change one step apart: the merged datasets of the two modes
+    # are not the same, even with the same inputs (Trace), only their statistics agree (see validation_harness.py).
+    FAST_FORWARD = False
+
+    # Warm-up detection (see warmup_detector.py): the throughput and the buffer levels are observed by windows of
+    # WARMUP_WINDOW steps, and the end of the initial transient is found with the MSER-5 rule. The online statistics
+    # restart and the merged dataset starts after it.
+    WARMUP_DETECTION = False
+    WARMUP_WINDOW = 3600
+
     # LOG PARAMETERS ---------------------------------------------------------------------------------------------------
     LOG_FILENAME = "Log.txt"
+    # Segmented logs (see log_segmenter.py): each log file is split into segments of LOG_SEGMENT_DAYS working days
+    # and/or of LOG_SEGMENT_MB megabytes at most, listed with their step ranges in the manifest of their folder. 0 to
+    # disable.
+    LOG_SEGMENT_DAYS = 0
+    LOG_SEGMENT_MB = 0
+    LOG_MANIFEST_FILENAME = "manifest.csv"
+    # Warm-up end step written by the WarmupDetector into the log folder, read by merge_logs.py.
+    WARMUP_FILENAME = "warmup.txt"
+
+    # Input traces (see input_trace.py): with RECORD_TRACE, the random draws of the machines are saved into the log
+    # folder (TRACE_FILENAME). REPLAY_TRACE is the path of a trace (.npz, or .csv "machine,purpose,value") replayed
+    # instead of the random draws, None to disable.
+    RECORD_TRACE = False
+    REPLAY_TRACE = None
+    TRACE_FILENAME = "trace.npz"
+
+    # Lazy text logs: the machines only write their CSV logs, the text messages are rendered on demand from them (see
+    # log_renderer.py). The console and Log.txt keep only the containers messages.
+    LAZY_TEXT_LOGS = False
+
+    # Recent state records kept in memory by each machine and container (ring buffer), 0 to disable. The StreamingTwin
+    # enables it.
+    HISTORY_SIZE = 0
+
+    # Live KPI metrics in the Prometheus text format, served on a local HTTP port (e.g. 8000, at /metrics) and/or
+    # written into a file every few seconds. None to disable.
+    METRICS_PORT = None
+    METRICS_FILE = None
 
     # OTHER PARAMETERS -------------------------------------------------------------------------------------------------
 
     # CLASS METHODS ----------------------------------------------------------------------------------------------------
+    # SIM_TIME overridden by derive, in this copy or in one it was derived from.
+    _SIM_TIME_OVERRIDDEN = False
+
+    @classmethod
+    def derive(cls, **overrides):
+        """
+        Return a copy of the global variables with some values overridden, e.g. derive(MTTF_A=50000, WORKING_WEEKS=4).
+        The original class is not modified. SIM_TIME is recomputed, unless it is overridden too, here or in a copy this
+        one is derived from.
+        """
+        variables = type(cls.__name__, (cls,), dict(overrides))
+        if 'SIM_TIME' in overrides:
+            variables._SIM_TIME_OVERRIDDEN = True
+        elif not cls._SIM_TIME_OVERRIDDEN:
+            variables.SIM_TIME = variables.WORKING_SECS * variables.WORKING_MINS * variables.WORKING_HOURS * \
+                                 variables.SHIFTS_IN_A_WORKING_DAY * variables.BUSINESS_DAYS * variables.WORKING_WEEKS
+        return variables
@@ -5,18 +5,22 @@ This class extends the Container/Store Class of SimPy, integrating the level con
 The level control is needed in order to have always some material available.
 
 Is possible to exclude the level control service.
+
+In fast-forward mode, the level is not checked at every time step: the control waits for the next level change, then
+re-aligns to the check time steps.
 """
 
-import simpy
+from monitored_container import MonitoredContainer
 from txt_logger import TxtLogger
 from global_variables import GlobalVariables
 
 
-class InputContainer(simpy.Container):
+class InputContainer(MonitoredContainer):
     def __init__(self, env, name, log_path, max_capacity, init_capacity, input_control=True,
                  critical_level_input_container=50, supplier_lead_time=0, supplier_std_supply=50,
-                 input_refilled_check_time=8, input_std_check_time=1):
-        super().__init__(env, max_capacity, init_capacity)
+                 input_refilled_check_time=8, input_std_check_time=1, fast_forward=False,
+                 history_size=0):
+        super().__init__(env, max_capacity, init_capacity, history_size)
         self.name = name
         self._env = env
 
@@ -30,15 +34,27 @@ class InputContainer(simpy.Container):
         self._supplier_std_supply = supplier_std_supply
         self._after_refilling_check_time = input_refilled_check_time
         self._std_check_time = input_std_check_time
+        self._fast_forward = fast_forward
 
         self.products_picked = 0
 
         # Logging objects
-        # No local log path is used because the log is only global for logistics instances
+        # No local log path is used because the log is only global for logistics instances. Without log path (None),
+        # nothing is written nor printed.
+        self._log_path = log_path
         self.global_txt_logger = TxtLogger(log_path, GlobalVariables.LOG_FILENAME)
         # The following line is not printed ... Why? maybe delete it.
         self.global_txt_logger.write_txt_log_file('### DATA LOG FROM INPUT CONTAINER FILE ###\n')
 
+    def _log(self, text, separator=False):
+        # Printing the text in the console, with an optional separator line, and writing it into the global log file.
+        if self._log_path is None:
+            return
+        print(text)
+        if separator:
+            print('----------------------------------')
+        self.global_txt_logger.write_txt_log_file(text)
+
     def _input_control_container(self):
         yield self._env.timeout(0)
 
@@ -51,33 +67,36 @@ class InputContainer(simpy.Container):
                 # Logging the event.
                 text = '{0}.1 - in_log: container {1} stock under the critical level {2}, {3} pieces left.\n ' \
                        'Calling the component supplier'
-                print(text.format(self._env.now, self.name, self._critical_level, self.level))
-                print('----------------------------------')
-                # Writing into the log file - logistic
-                self.global_txt_logger.write_txt_log_file(text.format(self._env.now, self.name, self._critical_level,
-                                                                      self.level))
+                # Printing in the console and writing into the log file - logistic
+                self._log(text.format(self._env.now, self.name, self._critical_level, self.level), separator=True)
 
                 # Wait for the supplier lead time.
                 yield self._env.timeout(self._supplier_lead_time)
 
                 # Supplier arrived, logging the event.
                 text = '{0}.2 - in_log: component supplier {1} arrived\n'
-                print(text.format(self._env.now, self.name))
-                # Writing into the log file - logistic
-                self.global_txt_logger.write_txt_log_file(text.format(self._env.now, self.name))
+                # Printing in the console and writing into the log file - logistic
+                self._log(text.format(self._env.now, self.name))
 
                 # The warehouse will be refilled with a standard quantity.
                 yield self.put(50)
 
                 # Logging the event.
                 text = '{0}.3 - in_log: container {1} new A component stock is {2}\n'
-                print(text.format(self._env.now, self.name, self.level))
-                print('----------------------------------')
-                # Writing into the log file - logistic
-                self.global_txt_logger.write_txt_log_file(text.format(self._env.now, self.name, self.level))
+                # Printing in the console and writing into the log file - logistic
+                self._log(text.format(self._env.now, self.name, self.level), separator=True)
 
                 # After the refill, check the level status after a given time (usually 8).
                 yield self._env.timeout(self._after_refilling_check_time)
+            elif self._fast_forward and self._std_check_time:
+                # The level can only go under the critical level with a level change: jump to it...
+                check_start = self._env.now
+                while self.level > self._critical_level:
+                    yield self.level_change()
+                # ... then wait for the step when the standard check would have found it.
+                misalignment = (self._env.now - check_start) % self._std_check_time
+                if misalignment:
+                    yield self._env.timeout(self._std_check_time - misalignment)
             else:
                 # If no dispatch, check the level status after at the next step.
                 yield self._env.timeout(self._std_check_time)
@@ -0,0 +1,170 @@
+"""
+input_trace.py file: Trace, TraceStream and TraceRecorder classes
+
+The classes responsibility is to run the model on given stochastic inputs: the times to failure, the repair times and
+the processing times of each machine are read from a trace instead of being drawn.
+
+A trace is one sequence of integer times per machine and purpose (the purposes of RandomStreams: "failures", "repairs",
+"process times"). It is saved as a compressed numpy archive (.npz, one int32 array per sequence), or read from a CSV
+file with the columns "machine,purpose,value" (e.g. the failure history of the real shop floor, in order of occurrence).
+
+    - TraceRecorder: attached to a ProductionLine, it records each draw of the machines of any run (see
+      Machine.recorder) and saves the trace;
+    - Trace: given as the "streams" of a ProductionLine, each machine takes its times from the trace sequences, in order
+      (TraceStream). Each purpose has its own sequence, so the n-th time to failure of a machine is the same whatever
+      the order of the events of the engine: two engine versions (e.g. the step by step and the fast-forward modes)
+      given the same trace get the same inputs, and their outputs can be compared.
+
+Replaying a recorded trace in the mode of the recorded run gives the same logs, and a replayed draw is a list look-up
+instead of a random number generation. Replayed in the other mode, the KPIs are the same but not the logs: the
+fast-forward mode can notice a buffer change one step apart (see GlobalVariables.FAST_FORWARD). A sequence shorter
+than the run is repeated from its start, unless "repeat" is False.
+
+Usage:
+    python input_trace.py [--weeks WEEKS]   record a run, replay it with both engines and compare the KPIs
+"""
+
+import argparse
+import contextlib
+import csv
+import os
+import random
+import tempfile
+import time
+import timeit
+import numpy
+import simpy
+from random_streams import RandomStreams
+
+
+# TRACE STREAM CLASS ---------------------------------------------------------------------------------------------------
+class TraceStream(object):
+    """Sequence of recorded times, with the drawing interface of RandomStream (the distribution is ignored)."""
+    def __init__(self, values, name='', repeat=True):
+        self._values = [int(value) for value in values]
+        self._name = name
+        self._repeat = repeat
+        self._next = 0
+
+    def _value(self):
+        if self._next == len(self._values):
+            if not self._repeat or not self._values:
+                raise IndexError('The trace sequence "{0}" is exhausted after {1} values.'.format(self._name,
+                                                                                                len(self._values)))
+            self._next = 0
+        value = self._values[self._next]
+        self._next += 1
+        return value
+
+    def exponential(self, rate):
+        return self._value()
+
+    def normal(self, mean, sigma):
+        return self._value()
+
+
+# TRACE CLASS ----------------------------------------------------------------------------------------------------------
+class Trace(object):
+    # Purposes of the machine draws, as in RandomStreams.
+    FAILURES = RandomStreams.FAILURES
+    REPAIRS = RandomStreams.REPAIRS
+    PROCESS_TIMES = RandomStreams.PROCESS_TIMES
+
+    def __init__(self, sequences, repeat=True):
+        """sequences: dict (machine name, purpose) -> sequence of integer times."""
+        self.sequences = {key: numpy.asarray(values, dtype=numpy.int32) for key, values in sequences.items()}
+        self.repeat = repeat
+
+    def stream(self, entity, purpose):
+        """New stream of the sequence of a machine and a purpose, from its start."""
+        values = self.sequences.get((entity, purpose), ())
+        return TraceStream(values.tolist() if isinstance(values, numpy.ndarray) else values,
+                           '{0}/{1}'.format(entity, purpose), self.repeat)
+
+    def __len__(self):
+        return sum(len(values) for values in self.sequences.values())
+
+    # FILES ------------------------------------------------------------------------------------------------------------
+    def save(self, path):
+        """Save the trace as a compressed numpy archive, one array "machine/purpose" per sequence."""
+        numpy.savez_compressed(path, **{entity + '/' + purpose: values
+                                        for (entity, purpose), values in self.sequences.items()})
+
+    @classmethod
+    def load(cls, path, repeat=True):
+        with numpy.load(path) as archive:
+            return cls({tuple(key.split('/', 1)): archive[key] for key in archive.files}, repeat)
+
+    @classmethod
+    def from_csv(cls, path, repeat=True):
+        """Trace of a CSV file with the columns "machine,purpose,value", e.g. "Machine A,failures,64800"."""
+        sequences = dict()
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                sequences.setdefault((row['machine'], row['purpose']), list()).append(int(float(row['value'])))
+        return cls(sequences, repeat)
+
+
+# TRACE RECORDER CLASS -------------------------------------------------------------------------------------------------
+class TraceRecorder(object):
+    def __init__(self, line):
+        self._sequences = dict()
+        for machine in line.machines:
+            machine.recorder = self
+
+    def record(self, entity, purpose, value):
+        self._sequences.setdefault((entity, purpose), list()).append(value)
+
+    def trace(self, repeat=True):
+        """Trace of the draws recorded so far."""
+        return Trace(self._sequences, repeat)
+
+    def save(self, path):
+        self.trace().save(path)
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    from production_line import ProductionLine
+    from global_variables import GlobalVariables
+
+    parser = argparse.ArgumentParser(description='Record a run, then replay its trace with both engines.')
+    parser.add_argument('--weeks', type=int, default=4, help='working weeks simulated')
+    args = parser.parse_args()
+
+    def run(variables, streams=None, record=False):
+        start_time = time.time()
+        with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull):
+                env = simpy.Environment()
+                line = ProductionLine(env, log_dir, variables, streams=streams)
+                recorder = TraceRecorder(line) if record else None
+                env.run(until=int(variables.SIM_TIME))
+                line.close_logs()
+        return line.kpis(), time.time() - start_time, recorder
+
+    step_by_step = GlobalVariables.derive(WORKING_WEEKS=args.weeks)
+    fast_forward = GlobalVariables.derive(WORKING_WEEKS=args.weeks, FAST_FORWARD=True)
+
+    recorded_kpis, recorded_time, trace_recorder = run(step_by_step, record=True)
+    with tempfile.TemporaryDirectory() as trace_dir:
+        trace_path = os.path.join(trace_dir, 'trace.npz')
+        trace_recorder.save(trace_path)
+        print('trace of {0} draws: {1} bytes'.format(len(trace_recorder.trace()), os.path.getsize(trace_path)))
+        trace = Trace.load(trace_path)
+
+    # Replaying the trace with both engines.
+    replayed_kpis, replayed_time, _ = run(fast_forward, streams=trace)
+    step_kpis, step_time, _ = run(step_by_step, streams=trace)
+    print('replay: {0:.2f} secs step by step, {1:.2f} secs fast-forward'.format(step_time, replayed_time))
+
+    # Cost of a processing time draw: sampling against replay.
+    draws = 100000
+    stream = TraceStream(range(draws))
+    sampling = timeit.timeit(lambda: int(random.normalvariate(250, 15)), number=draws)
+    replaying = timeit.timeit(lambda: int(stream.normal(250, 15)), number=draws)
+    print('{0} draws: {1:.3f} secs sampling, {2:.3f} secs replaying'.format(draws, sampling, replaying))
+    print('step by step replay equal to the recorded run: {0}'.format(step_kpis == recorded_kpis))
+    print('fast-forward replay KPIs equal to the step by step replay ones: {0}'.format(replayed_kpis == step_kpis))
+    for kpi in ('parts_made_C', 'delivered_pieces', 'breakdowns_A', 'breakdown_time_A'):
+        print('    {0}: recorded {1}, replayed {2}'.format(kpi, recorded_kpis[kpi], replayed_kpis[kpi]))
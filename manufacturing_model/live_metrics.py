@@ -0,0 +1,110 @@
+"""
+live_metrics.py file: LiveMetrics class
+
+The class responsibility is to keep the live KPIs of a running ProductionLine into a MetricsRegistry:
+    - per machine: parts made, breakdowns number and time, broken flag, starving and blocking time;
+    - per container: buffer level;
+    - simulation: current step and simulated time rate (steps per wall second).
+
+The metrics are updated incrementally, as listener of the machines (at each logged event) and of the containers (at
+each level change). The simulated time and its rate are sampled by a SimPy process every "sample_interval" steps, that
+also writes the metrics file every "file_period" wall seconds, if a file is given.
+"""
+
+import time
+from metrics_registry import MetricsRegistry
+
+
+# LIVE METRICS CLASS ---------------------------------------------------------------------------------------------------
+class LiveMetrics(object):
+    # Moments of the machine logs changing the metrics (see the Machine log encoding).
+    BREAKDOWN_MOMENTS = ('3', '7', '12')
+    REPAIR_MOMENTS = ('4', '8', '13')
+
+    def __init__(self, line, registry=None, sample_interval=60, file_path=None, file_period=5.0):
+        self.line = line
+        self.registry = registry if registry is not None else MetricsRegistry(prefix='manufacturing_')
+        self._sample_interval = sample_interval
+        self._file_path = file_path
+        self._file_period = file_period
+
+        r = self.registry
+        r.counter('parts_made_total', 'Parts made by the machine.')
+        r.counter('breakdowns_total', 'Repaired breakdowns of the machine.')
+        r.counter('breakdown_time_steps_total', 'Time spent in repair by the machine.')
+        r.counter('starving_time_steps_total', 'Time spent by the machine waiting for its input buffer.')
+        r.counter('blocking_time_steps_total', 'Time spent by the machine waiting for its output buffer.')
+        r.counter('pieces_delivered_total', 'Pieces taken by the dispatcher of the last container.')
+        r.gauge('machine_broken', 'Machine broken (1) or not (0).')
+        r.gauge('buffer_level', 'Pieces in the container.')
+        r.gauge('sim_time_steps', 'Current simulation step.')
+        r.gauge('sim_time_rate', 'Simulated steps per wall clock second.')
+
+        for machine in line.machines:
+            machine.listeners.append(self)
+            self._machine_metrics(machine)
+        for container in line.containers:
+            container.listeners.append(self)
+            self.on_level_change(container)
+
+        self._last_sample = (line.env.now, time.time())
+        self._last_file_time = 0
+        line.env.process(self._sampling())
+
+    # LISTENER FUNCTIONS -----------------------------------------------------------------------------------------------
+    def on_machine_event(self, machine, step, moment):
+        if moment == '9':
+            self.registry.set('parts_made_total', machine.parts_made, machine=machine.name)
+        elif moment in self.BREAKDOWN_MOMENTS:
+            self.registry.set('machine_broken', 1, machine=machine.name)
+        elif moment in self.REPAIR_MOMENTS:
+            self._machine_metrics(machine)
+        elif moment == '2':
+            self.registry.set('starving_time_steps_total', machine.starving_time, machine=machine.name)
+        elif moment == '11':
+            self.registry.set('blocking_time_steps_total', machine.blocking_time, machine=machine.name)
+
+    def on_level_change(self, container):
+        self.registry.set('buffer_level', container.level, container=container.name)
+        if hasattr(container, 'products_delivered'):
+            self.registry.set('pieces_delivered_total', container.products_delivered, container=container.name)
+
+    def _machine_metrics(self, machine):
+        r = self.registry
+        r.set('parts_made_total', machine.parts_made, machine=machine.name)
+        r.set('breakdowns_total', machine.breakdown_num, machine=machine.name)
+        r.set('breakdown_time_steps_total', machine.breakdown_time, machine=machine.name)
+        r.set('starving_time_steps_total', machine.starving_time, machine=machine.name)
+        r.set('blocking_time_steps_total', machine.blocking_time, machine=machine.name)
+        r.set('machine_broken', int(machine._broken), machine=machine.name)
+
+    # SAMPLING ---------------------------------------------------------------------------------------------------------
+    def _sampling(self):
+        env = self.line.env
+        while True:
+            yield env.timeout(self._sample_interval)
+            now = time.time()
+            last_step, last_time = self._last_sample
+            self.registry.set('sim_time_steps', env.now)
+            if now > last_time:
+                self.registry.set('sim_time_rate', round((env.now - last_step) / (now - last_time), 1))
+            self._last_sample = (env.now, now)
+
+            if self._file_path is not None and now - self._last_file_time >= self._file_period:
+                self.write_file()
+
+    def write_file(self):
+        self.registry.write_file(self._file_path)
+        self._last_file_time = time.time()
+
+    def serve(self, port=8000, host='127.0.0.1'):
+        return self.registry.serve(port, host)
+
+    def close(self):
+        """Write the last values and stop the HTTP server."""
+        for machine in self.line.machines:
+            self._machine_metrics(machine)
+        self.registry.set('sim_time_steps', self.line.env.now)
+        if self._file_path is not None:
+            self.write_file()
+        self.registry.shutdown()
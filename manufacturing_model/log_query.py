@@ -0,0 +1,96 @@
+"""
+log_query.py file: LogQuery class
+
+The class responsibility is to read a time window of a merged log (e.g. the steps around a breakdown) without loading
+the whole file: the time-range index written by MergeLogs gives the byte offset of the blocks of rows, so only the
+blocks overlapping the window are read and parsed. The time of a query does not depend on the file size.
+
+For a merged file without index (e.g. merged before the index existed), the index is built once by scanning the file.
+
+Usage:
+    python log_query.py MERGED_CSV --start STEP --end STEP [--columns COLUMN ...] [--output FILE]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import numpy
+import pandas
+from merge_logs import MergeLogs
+
+
+class LogQuery(object):
+    def __init__(self, file_path):
+        self._file_path = file_path
+        index_path = file_path + MergeLogs.INDEX_SUFFIX
+        if not os.path.exists(index_path):
+            LogQuery.build_index(file_path)
+        index = pandas.read_csv(index_path)
+        self._steps = index['step'].to_numpy()
+        # Byte offsets of the blocks, and of the end of the file.
+        self._offsets = numpy.append(index['offset'].to_numpy(), os.path.getsize(file_path))
+
+        with open(file_path, 'rb') as f:
+            self._header = f.readline()
+        self.columns = self._header.decode().strip().split(',')
+
+    @staticmethod
+    def build_index(file_path, block_rows=None):
+        """Write the time-range index of an existing merged file, reading it once."""
+        block_rows = block_rows or MergeLogs.INDEX_BLOCK_ROWS
+        index = list()
+        with open(file_path, 'rb') as f:
+            f.readline()
+            offset = f.tell()
+            rows = 0
+            for line in f:
+                if rows == 0:
+                    index.append([line.split(b',', 1)[0].decode(), offset, 0])
+                rows += 1
+                offset += len(line)
+                if rows == block_rows:
+                    index[-1][2] = rows
+                    rows = 0
+            if rows:
+                index[-1][2] = rows
+
+        with open(file_path + MergeLogs.INDEX_SUFFIX, 'w') as f:
+            f.write('step,offset,rows\n')
+            f.writelines('{0},{1},{2}\n'.format(*entry) for entry in index)
+
+    def window(self, start, end, columns=None):
+        """Rows of the time steps start to end (included), as a dataframe."""
+        # Blocks from the last one starting before the window, to the last one starting in it.
+        first = max(int(numpy.searchsorted(self._steps, start, side='right')) - 1, 0)
+        last = int(numpy.searchsorted(self._steps, end + 1, side='left'))
+        if last <= first:
+            return pandas.DataFrame(columns=columns or self.columns)
+
+        with open(self._file_path, 'rb') as f:
+            f.seek(self._offsets[first])
+            data = f.read(self._offsets[last] - self._offsets[first])
+
+        usecols = None if columns is None else ['step'] + [column for column in columns if column != 'step']
+        df = pandas.read_csv(io.BytesIO(self._header + data), usecols=usecols)
+        df = df[(df['step'] >= start) & (df['step'] < end + 1)].reset_index(drop=True)
+        return df if columns is None else df[columns]
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Read a time window of a merged log, through its time-range index.')
+    parser.add_argument('file', help='merged log csv file, e.g. logs/<run>/merged_logs/merged_logs.csv')
+    parser.add_argument('--start', type=int, required=True, help='first step of the window')
+    parser.add_argument('--end', type=int, required=True, help='last step of the window')
+    parser.add_argument('--columns', nargs='+', help='columns read (default: all)')
+    parser.add_argument('--output', help='csv file written (default: the console)')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    window = LogQuery(args.file).window(args.start, args.end, args.columns)
+    elapsed = time.perf_counter() - start_time
+
+    window.to_csv(args.output if args.output else sys.stdout, index=False)
+    print('{0} rows in {1:.1f} ms'.format(len(window), 1000 * elapsed), file=sys.stderr)
@@ -0,0 +1,105 @@
+"""
+log_renderer.py file: LogRenderer class
+
+The class responsibility is to render the human readable text logs of the machines from their CSV logs, on demand: with
+GlobalVariables.LAZY_TEXT_LOGS the simulation records only the CSV events, and the text of a machine and a time range is
+rendered when needed, with the message templates of the Machine class (Machine.MESSAGES).
+
+The rendered text is the one the machine would have written into its "Machine X log.txt". The fast-forward interval logs
+are expanded, one message per step, as the step by step loops write them.
+
+Usage:
+    python log_renderer.py LOG_DIR [--machine A] [--start STEP] [--end STEP] [--output FILE]
+
+Without a machine, the messages of all the machines are rendered in step order, as in the global Log.txt.
+"""
+
+import argparse
+import csv
+import heapq
+import os
+import sys
+from machine_model import Machine
+from log_segmenter import LogSegmenter
+
+
+class LogRenderer(object):
+    # Columns of the machine CSV log, after the step: CSV log fields of the message templates.
+    FIELDS = ('input', 'time_process', 'output', 'produced', 'failure', 'MTTF', 'repair_time')
+
+    def __init__(self, log_path):
+        self._log_path = log_path
+
+    def machines(self):
+        """Identifying letters of the machines with a CSV log."""
+        return sorted(name.split('_', 1)[1] for name in os.listdir(self._log_path) if name.startswith('Machine_'))
+
+    def events(self, machine, start=None, end=None):
+        """
+        Events of the machine CSV log with start <= step <= end, as tuples (step, moment, values dict). The intervals of
+        the fast-forward mode are expanded.
+        """
+        path = os.path.join(self._log_path, 'Machine_' + machine, 'Machine ' + machine + ' log.csv')
+        # Segmented logs: only the segments of the time range are read.
+        for segment_path in LogSegmenter.segment_paths(path, start, end):
+            with open(segment_path, newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader)
+                # Fast-forward logs have the "until" column (importance sampled logs a "weight" column too).
+                until_column = header.index('until') if 'until' in header else None
+                for row in reader:
+                    step, moment = row[0].split('.')
+                    step = int(step)
+                    until = int(row[until_column]) if until_column is not None and row[until_column] else step
+                    if end is not None and step > end:
+                        return
+                    if start is not None and until < start:
+                        continue
+                    values = dict(zip(self.FIELDS, row[1:8]))
+                    for repeated_step in range(max(step, start or step),
+                                               min(until, end if end is not None else until) + 1):
+                        yield repeated_step, moment, values
+
+    def render(self, machine, start=None, end=None):
+        """Text log lines of the machine (letter) between the steps start and end."""
+        name = 'Machine ' + machine
+        for step, moment, values in self.events(machine, start, end):
+            template, fields = Machine.MESSAGES[moment]
+            yield template.format(step, moment, name, *[values[field] for field in fields])
+
+    def render_all(self, start=None, end=None):
+        """Text log lines of all the machines, in step order."""
+        streams = [self._keyed(machine, start, end) for machine in self.machines()]
+        for _, text in heapq.merge(*streams, key=lambda item: item[0]):
+            yield text
+
+    def _keyed(self, machine, start, end):
+        # Lines of a machine with their step, for the merge of the machines.
+        name = 'Machine ' + machine
+        for step, moment, values in self.events(machine, start, end):
+            template, fields = Machine.MESSAGES[moment]
+            yield step, template.format(step, moment, name, *[values[field] for field in fields])
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render the text logs of the machines from their CSV logs.')
+    parser.add_argument('log_dir', help='log directory of a simulation run')
+    parser.add_argument('--machine', help='identifying letter of the machine (default: all the machines)')
+    parser.add_argument('--start', type=int, help='first step rendered')
+    parser.add_argument('--end', type=int, help='last step rendered')
+    parser.add_argument('--output', help='text file written (default: the console)')
+    args = parser.parse_args()
+
+    renderer = LogRenderer(args.log_dir)
+    if args.machine:
+        lines = renderer.render(args.machine, args.start, args.end)
+    else:
+        lines = renderer.render_all(args.start, args.end)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        output.writelines(lines)
+    finally:
+        if args.output:
+            output.close()
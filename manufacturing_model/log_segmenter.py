@@ -0,0 +1,184 @@
+"""
+log_segmenter.py file: LogSegmenter class
+
+The class responsibility is to split the log files of a run into segments bounded in simulated time and in size, instead
+of single ever-growing files (Log.txt, Machine X log.csv, Machine X exp_prod_flag.csv), for very long horizons.
+
+While a segmenter is installed (class attribute "segmenter" of CsvLogger and TxtLogger), each log file "name.ext" is
+written into the segments "name.0000.ext", "name.0001.ext", ... A new segment is started when the simulation time
+reaches the end of the period of the current segment ("segment_steps", e.g. some working days), or when its size would
+exceed "segment_bytes". Each CSV segment starts with the header, so it can be read alone.
+
+When a segment is closed, a line is appended to the manifest of its folder (GlobalVariables.LOG_MANIFEST_FILENAME):
+
+    file,segment,segment_file,first_step,last_step,bytes
+
+with the first and the last step of the rows of the segment (the "until" step for the fast-forward intervals), or the
+simulation time of the writes for the text logs. The segments still open are added by close(): after a crash, the
+manifest lists the complete segments only, and just the open ones are lost.
+
+segment_paths gives the segments of a log file from the manifest, optionally only the ones of a time range: the merge,
+the archive or the causal preprocessing can work on the segments in parallel, or on the new ones only.
+"""
+
+import csv
+import os
+from csv_logger import CsvLogger
+from txt_logger import TxtLogger
+from global_variables import GlobalVariables
+
+
+# LOG SEGMENTER CLASS --------------------------------------------------------------------------------------------------
+class LogSegmenter(object):
+    MANIFEST_HEAD = 'file,segment,segment_file,first_step,last_step,bytes\n'
+
+    def __init__(self, env, segment_steps=None, segment_bytes=None):
+        self.env = env
+        self._segment_steps = segment_steps
+        self._segment_bytes = segment_bytes
+        # Open segment of each log file path, and number of segments of each log file path.
+        self._segments = dict()
+        self._numbers = dict()
+        # Manifests created by this segmenter.
+        self._manifests = set()
+        self._previous_segmenters = None
+
+    @classmethod
+    def from_variables(cls, env, variables=GlobalVariables):
+        """Segmenter of the LOG_SEGMENT_DAYS and LOG_SEGMENT_MB variables, or None if both are disabled."""
+        if not variables.LOG_SEGMENT_DAYS and not variables.LOG_SEGMENT_MB:
+            return None
+        day_steps = variables.WORKING_SECS * variables.WORKING_MINS * variables.WORKING_HOURS * \
+            variables.SHIFTS_IN_A_WORKING_DAY
+        return cls(env, int(variables.LOG_SEGMENT_DAYS * day_steps) or None,
+                   int(variables.LOG_SEGMENT_MB * 1024 * 1024) or None)
+
+    # INSTALLATION -----------------------------------------------------------------------------------------------------
+    def install(self):
+        """Route the CsvLogger and TxtLogger files created from now on into segments."""
+        self._previous_segmenters = (CsvLogger.segmenter, TxtLogger.segmenter)
+        CsvLogger.segmenter = self
+        TxtLogger.segmenter = self
+        return self
+
+    def close(self):
+        """Record the open segments into the manifests and restore the loggers."""
+        for path in list(self._segments):
+            self._close_segment(path)
+        if self._previous_segmenters is not None:
+            CsvLogger.segmenter, TxtLogger.segmenter = self._previous_segmenters
+            self._previous_segmenters = None
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # WRITING ----------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def segment_path(path, number):
+        root, extension = os.path.splitext(path)
+        return '{0}.{1:04d}{2}'.format(root, number, extension)
+
+    def write(self, path, text, head='', first_step=None, last_step=None):
+        """
+        Append the text to the open segment of the log file path, starting a new segment before it if needed. The head
+        starts each segment. The steps of the text default to the simulation time.
+        """
+        now = self.env.now
+        segment = self._segments.get(path)
+        if segment is not None and (self._segment_steps and now >= segment['end'] or self._segment_bytes and
+                                    segment['bytes'] > len(head) and
+                                    segment['bytes'] + len(text) > self._segment_bytes):
+            self._close_segment(path)
+            segment = None
+        if segment is None:
+            segment = self._open_segment(path, now)
+            if head:
+                self._append(segment['path'], head)
+                segment['bytes'] += len(head)
+
+        self._append(segment['path'], text)
+        if segment['first_step'] is None:
+            segment['first_step'] = now if first_step is None else first_step
+        last_step = now if last_step is None else last_step
+        segment['last_step'] = last_step if segment['last_step'] is None else max(segment['last_step'], last_step)
+        segment['bytes'] += len(text)
+
+    def _open_segment(self, path, now):
+        number = self._numbers.get(path, 0)
+        self._numbers[path] = number + 1
+        # The periods of the segments are aligned on the multiples of segment_steps.
+        end = now - now % self._segment_steps + self._segment_steps if self._segment_steps else None
+        segment = {'number': number, 'path': self.segment_path(path, number), 'end': end, 'first_step': None,
+                   'last_step': None, 'bytes': 0}
+        # New segment: created empty, the writes are appended.
+        with open(segment['path'], 'w'):
+            pass
+        self._segments[path] = segment
+        return segment
+
+    def _close_segment(self, path):
+        segment = self._segments.pop(path)
+        manifest = os.path.join(os.path.dirname(segment['path']), GlobalVariables.LOG_MANIFEST_FILENAME)
+        if manifest not in self._manifests:
+            with open(manifest, 'w') as f:
+                f.write(self.MANIFEST_HEAD)
+            self._manifests.add(manifest)
+        self._append(manifest, '{0},{1},{2},{3},{4},{5}\n'.format(
+            os.path.basename(path), segment['number'], os.path.basename(segment['path']), segment['first_step'],
+            segment['last_step'], segment['bytes']))
+
+    @staticmethod
+    def _append(path, text):
+        # Through the AsyncLogWriter if installed, the segments and the manifest lines keep their order.
+        if CsvLogger.writer is not None:
+            CsvLogger.writer.write(path, text)
+            return
+        with open(path, 'a') as f:
+            f.write(text)
+
+    # READING ----------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def manifest(folder):
+        """Segments of the manifest of a folder, as dicts of the manifest columns (empty without manifest)."""
+        path = os.path.join(folder, GlobalVariables.LOG_MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return list()
+        with open(path, newline='') as f:
+            return [dict(row, segment=int(row['segment']), first_step=float(row['first_step']),
+                         last_step=float(row['last_step']), bytes=int(row['bytes'])) for row in csv.DictReader(f)]
+
+    @staticmethod
+    def segment_paths(path, start=None, end=None):
+        """
+        Paths of the segments of a log file with rows between the steps start and end, in order. A log file that is not
+        segmented is its own only segment.
+        """
+        folder, name = os.path.split(path)
+        segments = sorted([segment for segment in LogSegmenter.manifest(folder) if segment['file'] == name],
+                          key=lambda segment: segment['segment'])
+        if not segments:
+            return [path]
+        return [os.path.join(folder, segment['segment_file']) for segment in segments
+                if (start is None or segment['last_step'] >= start) and (end is None or segment['first_step'] <= end)]
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    import contextlib
+    import tempfile
+    from simulation_api import simulate
+
+    # Four working days logged into segments of one day, then the segments of the third day only.
+    variables = GlobalVariables.derive(WORKING_WEEKS=4, LOG_SEGMENT_DAYS=1, LAZY_TEXT_LOGS=True)
+    day_steps = variables.SIM_TIME // (variables.BUSINESS_DAYS * variables.WORKING_WEEKS)
+    with tempfile.TemporaryDirectory() as log_dir:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            simulate(variables, seed=1, log_path=log_dir)
+        folder = os.path.join(log_dir, 'Machine_A')
+        for segment in LogSegmenter.manifest(folder):
+            print(segment)
+        print('third day: {0}'.format([os.path.basename(path) for path in LogSegmenter.segment_paths(
+            os.path.join(folder, 'Machine A log.csv'), 2 * day_steps, 3 * day_steps - 1)]))
@@ -35,15 +35,50 @@ The log encoding is the following:
     x.12: breakdown during output material handling
     x.13: repairing during output material handling
     x.14: finished the output material handling
+
+In fast-forward mode, the machine does not check its buffers and its expected products at every time step: it waits for
+the next buffer level change, or for the next step when the expected product flag can change. The logs that would be
+repeated at every time step are written once, with an additional "until" column reporting the last repeated step
+(interval encoding). The MergeLogs class expands them back, so the merged dataset keeps one row per time step.
+
+With a "history_size", the last logged events are also kept in memory (StateHistory), for the queries of a live twin.
+
+By default, all the random draws come from the global random generator, reseeded with "seed" when the breakdowns
+start. With "streams" (RandomStreams), the failures, repairs and processing times of the machine have their own streams,
+for common random numbers and antithetic variates in the scenario comparisons. A Trace (see input_trace.py) can be given
+as "streams" too: the draws are then replayed from a recorded or real sequence of times, and a TraceRecorder records
+the draws of any run.
+
+With a "failure_factor" or a "repair_factor" different from 1 (importance sampling), the failure rate is multiplied by
+"failure_factor" and the mean repair time by "repair_factor", so the breakdowns of rare-failure studies are observed in
+much shorter runs. Each draw multiplies the likelihood ratio of the run (density of the real distribution over the one
+drawn from; survival ratio for the time to failure in progress), and the current ratio is logged in the "weight" column
+of each CSV log row: the estimates weighted by it are the ones of the real distributions (see ProductionLine.kpis and
+causal_model/weighted_estimation.py).
+
+The summary statistics of the time between failures, of the repair time and of the cycle time are kept online
+(RunningStatistics in "statistics"), so they need no post-processing of the logs.
+
+Without "log_path" (None), the machine does no filesystem work: the CSV logs are kept in memory (see
+CsvLogger.csv_text) and nothing is printed. The handling delays and the mean process times are read from "variables".
+
+With "lazy_text_logs", the events are only recorded into the CSV log: the console, the global Log.txt and the machine
+log.txt messages are not formatted nor written during the run. The log_renderer.py command renders them on demand from
+the CSV log, for a machine and a time range, with the same templates (MESSAGES).
 """
 
+import math
 import os
 import random
+import numpy
 import simpy
 from global_variables import GlobalVariables
 from statistics import mean
 from csv_logger import CsvLogger
 from txt_logger import TxtLogger
+from state_history import StateHistory
+from running_statistics import RunningStatistics
+from random_streams import RandomStreams
 
 
 # MACHINE CLASS --------------------------------------------------------------------------------------------------------
@@ -58,8 +93,11 @@ class Machine(object):
     A machine has a "name" and a number of parts processed.
     """
     def __init__(self, env, name, log_path, mean_process_time, sigma_process_time, MTTF, MTTR, input_buffer,
-                 output_buffer):
+                 output_buffer, fast_forward=False, seed=0, random_breakdowns=True,
+                 history_size=0, lazy_text_logs=False, streams=None, failure_factor=1, repair_factor=1,
+                 variables=GlobalVariables):
         self.env = env
+        self._variables = variables             # Line parameters: handling delays and mean process times
         self._name = name                       # Must be coded as "Machine" + identifying letter from A to Z
 
         # Process variables.
@@ -75,18 +113,74 @@ class Machine(object):
         self._broken = False
         self._breakdown_num_counter = 0
         self._breakdown_time_counter = 0
+        self._seed = seed                       # Seed of the random generator, set when the breakdowns start.
+
+        # Importance sampling: the draws come from the failure rate x failure_factor and the mean repair time x
+        # repair_factor. The logarithm of the likelihood ratio of the elapsed draws is kept, and the time to failure in
+        # progress (start step and value) enters it when elapsed.
+        self._failure_factor = failure_factor
+        self._repair_factor = repair_factor
+        self.importance_sampling = failure_factor != 1 or repair_factor != 1
+        self._log_likelihood_ratio = 0.0
+        self._pending_failure = None
+
+        # Random streams of the machine (see RandomStreams), or None to draw from the global random generator.
+        self._streams = None
+        if streams is not None:
+            self._streams = {purpose: streams.stream(name, purpose) for purpose in
+                             (streams.FAILURES, streams.REPAIRS, streams.PROCESS_TIMES)}
+
+        # Waiting variables: time spent with the input buffer empty (starving) or the output buffer full (blocking).
+        self._starving_time_counter = 0
+        self._blocking_time_counter = 0
+        # Fast-forward wait in progress (moment of its log and start step): its steps are counted when it ends.
+        self._wait = None
 
         self._last_piece_step = 0
 
         self._input_buffer = input_buffer
         self._output_buffer = output_buffer
 
+        # Fast-forward mode: event triggered at each part done, and open interval of the expected product flag log.
+        self._fast_forward = fast_forward
+        self._part_done_event = self.env.event() if fast_forward else None
+        self._exp_interval = None
+
+        # Objects notified at each logged event, with on_machine_event(machine, step, moment).
+        self.listeners = list()
+        # Trace recorder receiving each random draw, with record(machine name, purpose, value) (see input_trace.py).
+        self.recorder = None
+
+        # Recent logged events kept in memory, with the columns of the CSV log.
+        self.history = StateHistory(history_size, self.HISTORY_FIELDS) if history_size else None
+
+        # Online statistics of the run (RunningStatistics), updated at each logged event: observed time between
+        # failures (from the start or the last repair), repair time, and cycle time (time between two parts made).
+        self.statistics = {'time_between_failures': RunningStatistics(), 'repair_time': RunningStatistics(),
+                           'cycle_time': RunningStatistics()}
+        self._up_since = self.env.now
+        self._down_since = self.env.now
+        self._cycle_start = self.env.now
+
+        # Digital twin: the breakdowns can come from the real machine (see breakdown, repair and complete_part) instead
+        # of the random breakdown process.
+        self._processing = False
+        # The machine can be interrupted only while it handles or processes a part (not while it waits for the buffers
+        # or for a repair), and once: the flag is cleared when an interruption is sent, until the next handling or
+        # processing wait.
+        self._interruptible = False
+        self._repaired_event = None
+
         # Simpy processes
         self._process = self.env.process(self._working())
-        self.env.process(self._break_machine())
+        if random_breakdowns:
+            self.env.process(self._break_machine())
 
         self._expected_products_sensor = False
-        self.env.process(self._expected_products())
+        if self._fast_forward:
+            self.env.process(self._expected_products_intervals())
+        else:
+            self.env.process(self._expected_products())
 
         self._logistic_breakdowns = True         # To exclude breakdowns during logistic operations, set to False.
         self._processing_breakdowns = True       # To exclude breakdowns during processing operations, set to False.
@@ -94,13 +188,18 @@ class Machine(object):
         # Logging objects - As a best practice, write before in the txt, console, then append data into the data list.
 
         # Logging objects
-        # Creating the folder that contains the i-th machine log
-        os.mkdir(log_path + os.path.join('/Machine_') + self._name.split(" ")[1])
-        # Creating the local log path that will be used with log_path that represents the global log path.
-        local_log_path = log_path + os.path.join('/Machine_') + self._name.split(" ")[1]
-        # Creating logging objects
+        # Without log path (None), no folder nor file is created: the CSV logs are kept in memory by the CsvLoggers,
+        # and no text log is formatted nor printed (as with lazy text logs).
+        local_log_path = None
+        if log_path is not None:
+            # Creating the folder that contains the i-th machine log
+            os.mkdir(log_path + os.path.join('/Machine_') + self._name.split(" ")[1])
+            # Creating the local log path that will be used with log_path that represents the global log path.
+            local_log_path = log_path + os.path.join('/Machine_') + self._name.split(" ")[1]
+        # Creating logging objects. With lazy text logs, only the CSV logs are written (see MESSAGES).
+        self._lazy_text_logs = lazy_text_logs or log_path is None
         self.global_txt_logger = TxtLogger(log_path, GlobalVariables.LOG_FILENAME)
-        self.local_txt_logger = TxtLogger(local_log_path, self._name + " log.txt")
+        self.local_txt_logger = None if self._lazy_text_logs else TxtLogger(local_log_path, self._name + " log.txt")
         self.csv_logger = CsvLogger(local_log_path, self._name + " log.csv")
         self.expected_products_logger = CsvLogger(local_log_path, self._name + " exp_prod_flag.csv")
 
@@ -109,6 +208,129 @@ class Machine(object):
         # List containing the csv log files of the expected product flag of each machine.
         self._exp_pieces = list()
 
+    # Text log message of each moment: template and CSV log fields filling it after the step ({0}), the moment ({1})
+    # and the machine name ({2}). The LogRenderer renders the text logs from the CSV logs with the same templates.
+    MESSAGES = {
+        '0': ("{0}.{1} - mach: state of {2} at step {0} moment {1}: input buffer {3}, output buffer {4}\n",
+              ('input', 'output')),
+        '1': ("{0}.{1} - mach: the {2} input buffer level is {3}. Waiting 1 time step and re-check.\n", ('input',)),
+        '2': ("{0}.{1} - mach: the {2} input buffer has been filled up. The buffer level is {3}. Continuing with "
+              "the process\n", ('input',)),
+        '3': ("\n{0}.{1} down - mach: {2} broke. Handling-in stopped. Machine will be repaired in {3}\n",
+              ('repair_time',)),
+        '4': ("\n{0}.{1} up - mach: {2} repaired. Handling-in restarted.\n", ()),
+        '5': ("{0}.{1} - mach: input {2} level {3}; taken 1 from input {2}.\n", ('input',)),
+        '6': ("{0}.{1} - mach: started 1 in {2}. Processing time: {3}\n", ('time_process',)),
+        '7': ("\n{0}.{1} down - mach: {2} broke. {3} step for the job to be completed. Machine will be repaired "
+              "in {4}\n", ('time_process', 'repair_time')),
+        '8': ("\n{0}.{1} up - mach: {2} repaired. Working restarted.\n", ()),
+        '9': ("{0}.{1} - mach: made 1 in {2}. Total pieces made: {3}.\n", ('produced',)),
+        '10': ("{0}.{1} - out_full - mach: the {2} output buffer level is {3}. Waiting 1 time step and re-check.\n",
+               ('output',)),
+        '11': ("{0}.{1} - mach: the {2} output buffer has been emptied. The buffer level is {3}. Continuing with "
+               "the process\n", ('output',)),
+        '12': ("\n{0}.{1} down - mach: {2} broke. Handling-out stopped. Machine will be repaired in {3}\n",
+               ('repair_time',)),
+        '13': ("\n{0}.{1} up - mach: {2} repaired. Handling-out restarted.\n", ()),
+        '14': ("{0}.{1} - mach: output {2} level {3}; put 1 in output {2}.\n", ('output',)),
+    }
+
+    # Fields of the history records, after the step.
+    HISTORY_FIELDS = [('moment', numpy.int8), ('input', numpy.int32), ('time_process', numpy.int32),
+                      ('output', numpy.int32), ('produced', numpy.int32), ('failure', numpy.bool_),
+                      ('repair_time', numpy.int32)]
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def mean_process_time(self):
+        return self._mean_process_time
+
+    @property
+    def breakdown_num(self):
+        return self._breakdown_num_counter
+
+    @property
+    def breakdown_time(self):
+        return self._breakdown_time_counter
+
+    @property
+    def starving_time(self):
+        return self._starving_time_counter + self._waiting_time('1')
+
+    @property
+    def blocking_time(self):
+        return self._blocking_time_counter + self._waiting_time('10')
+
+    def _waiting_time(self, moment):
+        # Steps of the fast-forward wait in progress, as counted step by step: up to the last step before now, since a
+        # run stopped at now does not check the buffers at now.
+        if self._wait is None or self._wait[0] != moment:
+            return 0
+        return max(self.env.now - self._wait[1] - 1, 0)
+
+    # DIGITAL TWIN EVENTS ----------------------------------------------------------------------------------------------
+    # Interruption causes, besides the random breakdowns (no cause).
+    PART_DONE = 'part done'
+    UNTIL_REPAIRED = 'until repaired'
+
+    def breakdown(self, repair_time=None):
+        """
+        Break the machine now, as reported by the real machine. Without "repair_time", the machine stays broken until
+        repair() is called. As for the random breakdowns, a machine that is not working (waiting for the buffers or
+        already broken) is not affected, nor a machine already interrupted at this step. Returns True if the machine
+        broke.
+        """
+        if not self._interruptible or not (self._processing_breakdowns if self._processing else
+                                           self._logistic_breakdowns):
+            return False
+        self._interruptible = False
+        self._process.interrupt(self.UNTIL_REPAIRED if repair_time is None else int(repair_time))
+        return True
+
+    def repair(self):
+        """End the current repair now, as reported by the real machine. Returns True if the machine was broken."""
+        if self._repaired_event is None or self._repaired_event.triggered:
+            return False
+        self._repaired_event.succeed()
+        return True
+
+    def complete_part(self):
+        """
+        Finish the part in process now, as reported by the real machine. Returns False if the machine is not
+        processing a part (or is broken, or already interrupted at this step).
+        """
+        if not self._processing or not self._interruptible:
+            return False
+        self._interruptible = False
+        self._process.interrupt(self.PART_DONE)
+        return True
+
+    def _repair_time(self, interruption):
+        # Random breakdown: the time to repair follows the MTTR distribution.
+        if interruption.cause is None:
+            return self._draw_repair_time()
+        # Breakdown of the real machine: the time to repair is given, or unknown (logged as 0).
+        return 0 if interruption.cause == self.UNTIL_REPAIRED else interruption.cause
+
+    def _repairing(self, interruption, break_down_time):
+        """Wait for the end of the repair, returning the repair time."""
+        if interruption.cause is None:
+            yield self.env.timeout(break_down_time)
+            return break_down_time
+
+        # The real machine can be repaired before the given time, or when it is reported as repaired.
+        start = self.env.now
+        self._repaired_event = self.env.event()
+        if interruption.cause == self.UNTIL_REPAIRED:
+            yield self._repaired_event
+        else:
+            yield self.env.any_of([self.env.timeout(break_down_time), self._repaired_event])
+        self._repaired_event = None
+        return self.env.now - start
+
     # Function describing the machine process.
     def _working(self):
         """
@@ -120,7 +342,8 @@ class Machine(object):
 
         csv_head = 'step,input ' + self._name + ',time process ' + self._name + ',output ' + self._name + \
                    ',produced ' + self._name + ',failure ' + self._name + ',MTTF ' + self._name + \
-                   ',repair time ' + self._name + '\n'
+                   ',repair time ' + self._name + (',until' if self._fast_forward else '') + \
+                   (',weight ' + self._name if self.importance_sampling else '') + '\n'
 
         self.csv_logger.initialise_csv_log_file(csv_head)
 
@@ -133,7 +356,13 @@ class Machine(object):
             # CHECK THE INPUT BUFFER LEVEL -----------------------------------------------------------------------------
             # Perform the output warehouse level checking: if empty, wait 1 time step.
             # If in the input buffer there is no raw material ...
-            if self._input_buffer.level == 0:
+            if self._input_buffer.level == 0 and self._fast_forward:
+                # ... jump to the step when the buffer is filled up, logging the wait as intervals.
+                waiting_time = yield from self._wait_buffers('1', lambda: self._input_buffer.level == 0)
+                self._starving_time_counter += waiting_time
+                self._write_extended_log(self.env.now, '2', self._input_buffer.level, '0',
+                                         self._output_buffer.level, self.parts_made, self._broken, self._MTTF, '0')
+            elif self._input_buffer.level == 0:
                 # ... and while the buffer is empty ...
                 while self._input_buffer.level == 0:
                     # ... log the status ...
@@ -143,6 +372,7 @@ class Machine(object):
                     try:
                         # ... and wait one time step.
                         yield self.env.timeout(1)
+                        self._starving_time_counter += 1
                     except simpy.Interrupt:
                         pass
                 # When the buffer is filled, log the status and continue.
@@ -153,18 +383,20 @@ class Machine(object):
             # Take the raw product from raw products warehouse. Wait the necessary step to retrieve the material.
             # The action is performed in a try-except block because the machine may break during the handling of the
             # material
-            handled_in = GlobalVariables.GET_STD_DELAY
+            handled_in = self._variables.GET_STD_DELAY
             start_handling = 0
             while handled_in:
                 try:
                     # Handling the part
                     start_handling = self.env.now
                     # No handling logging - Maybe it should be added?
+                    self._interruptible = True
                     yield self.env.timeout(handled_in)
+                    self._interruptible = False
                     # handled_in set 0 to exit to the loop
                     handled_in = 0
 
-                except simpy.Interrupt:
+                except simpy.Interrupt as interruption:
                     # If machine breakdowns are considered during logistic operations into the simulation...
                     if self._logistic_breakdowns:
                         # ... then simulate the process stop for the machine breakdown and relative time to repair
@@ -173,14 +405,14 @@ class Machine(object):
                         self._broken = True
                         handled_in -= self.env.now - start_handling  # How much time left to handle the material?
 
-                        break_down_time = int(random.expovariate(self._repair_mean))
+                        break_down_time = self._repair_time(interruption)
 
                         self._write_extended_log(self.env.now, '3', self._input_buffer.level, '0',
                                                  self._output_buffer.level, self.parts_made, self._broken, '0',
                                                  break_down_time)
 
                         # The yield value is truncate in order to have int time-steps
-                        yield self.env.timeout(break_down_time)
+                        break_down_time = yield from self._repairing(interruption, break_down_time)
 
                         # Count breakdown number and time.
                         self._breakdown_num_counter += 1
@@ -205,7 +437,7 @@ class Machine(object):
 
             # PROCESSING THE MATERIAL ----------------------------------------------------------------------------------
             # Start making a new part
-            time_per_part = int(random.normalvariate(self._mean_process_time, self._sigma_process_time))
+            time_per_part = self._draw_process_time()
             # time_per_part = self._mean_process_time
             done_in = time_per_part
             start = 0
@@ -217,13 +449,19 @@ class Machine(object):
                     self._write_extended_log(self.env.now, '6', self._input_buffer.level, done_in,
                                              self._output_buffer.level, self.parts_made, self._broken, self._MTTF, '0')
                     # The yield value is truncate in order to have int time-steps
+                    self._processing = True
+                    self._interruptible = True
                     yield self.env.timeout(done_in)
+                    self._interruptible = False
                     # Set 0 to exit to the loop
                     done_in = 0
 
-                except simpy.Interrupt:
+                except simpy.Interrupt as interruption:
+                    # If the real machine finished the part (digital twin), the processing is over...
+                    if interruption.cause == self.PART_DONE:
+                        done_in = 0
                     # If machine breakdowns are considered during machine operations into the simulation...
-                    if self._processing_breakdowns:
+                    elif self._processing_breakdowns:
                         # ... then simulate the process stop for the machine breakdown and relative time to repair
                         # wait...
 
@@ -232,14 +470,14 @@ class Machine(object):
                         done_in -= self.env.now - start     # How much time left to finish the job?
 
                         # Count breakdown number and time.
-                        break_down_time = int(random.expovariate(self._repair_mean))
+                        break_down_time = self._repair_time(interruption)
 
                         self._write_extended_log(self.env.now, '7', self._input_buffer.level, done_in,
                                                  self._output_buffer.level, self.parts_made, self._broken, '0',
                                                  break_down_time)
 
                         # The yield value is truncate in order to have int time-steps
-                        yield self.env.timeout(break_down_time)
+                        break_down_time = yield from self._repairing(interruption, break_down_time)
 
                         # Count breakdown number and time.
                         self._breakdown_num_counter += 1
@@ -256,9 +494,14 @@ class Machine(object):
                         pass
 
             # Part is done
+            self._processing = False
             prod_time = self.env.now
             self._last_piece_step = prod_time
             self.parts_made += 1
+            if self._fast_forward:
+                # Waking up the expected product flag.
+                event, self._part_done_event = self._part_done_event, self.env.event()
+                event.succeed()
 
             self._write_extended_log(prod_time, '9', self._input_buffer.level, '0', self._output_buffer.level,
                                      self.parts_made, self._broken, self._MTTF, '0')
@@ -266,7 +509,14 @@ class Machine(object):
             # CHECK THE OUTPUT BUFFER LEVEL ----------------------------------------------------------------------------
             # Perform the output warehouse level checking: if full, wait 1 time step.
             # If the output buffer is full ...
-            if self._output_buffer.level == self._output_buffer.capacity:
+            if self._output_buffer.level == self._output_buffer.capacity and self._fast_forward:
+                # ... jump to the step when the buffer is emptied, logging the wait as intervals.
+                waiting_time = yield from self._wait_buffers(
+                    '10', lambda: self._output_buffer.level == self._output_buffer.capacity)
+                self._blocking_time_counter += waiting_time
+                self._write_extended_log(self.env.now, '11', self._input_buffer.level, '0',
+                                         self._output_buffer.level, self.parts_made, self._broken, self._MTTF, '0')
+            elif self._output_buffer.level == self._output_buffer.capacity:
                 # ... and while the buffer is still full ...
                 while self._output_buffer.level == self._output_buffer.capacity:
                     # ... log the status ...
@@ -276,6 +526,7 @@ class Machine(object):
                     try:
                         # ... and wait one time step.
                         yield self.env.timeout(1)
+                        self._blocking_time_counter += 1
                     except simpy.Interrupt:
                         pass
                 # When the buffer is emptied, log the status and continue.
@@ -283,17 +534,19 @@ class Machine(object):
                                          self._output_buffer.level, self.parts_made, self._broken, self._MTTF, '0')
 
             # HANDLING OUTPUT MATERIAL ---------------------------------------------------------------------------------
-            handled_out = GlobalVariables.PUT_STD_DELAY
+            handled_out = self._variables.PUT_STD_DELAY
             start_handling = 0
             while handled_out:
                 try:
                     # Handling the part
                     start_handling = self.env.now
                     # No handling logging - Maybe it should be added?
+                    self._interruptible = True
                     yield self.env.timeout(handled_out)
+                    self._interruptible = False
                     handled_out = 0  # Set 0 to exit to the loop
 
-                except simpy.Interrupt:
+                except simpy.Interrupt as interruption:
                     # If machine breakdowns are considered during logistic operations into the simulation...
                     if self._logistic_breakdowns:
                         # ... then simulate the process stop for the machine breakdown and relative time to repair
@@ -303,14 +556,14 @@ class Machine(object):
                         handled_out -= self.env.now - start_handling  # How much time left to handle the material?
 
                         # Count breakdown number and time.
-                        break_down_time = int(random.expovariate(self._repair_mean))
+                        break_down_time = self._repair_time(interruption)
 
                         self._write_extended_log(self.env.now, '12', self._input_buffer.level, '0',
                                                  self._output_buffer.level, self.parts_made, self._broken, '0',
                                                  break_down_time)
 
                         # The yield value is truncate in order to have int time-steps
-                        yield self.env.timeout(break_down_time)
+                        break_down_time = yield from self._repairing(interruption, break_down_time)
 
                         # Count breakdown number and time.
                         self._breakdown_num_counter += 1
@@ -348,19 +601,84 @@ class Machine(object):
 
     def _break_machine(self):
         """Occasionally break the machine."""
-        random.seed(0)
+        if self._streams is None:
+            random.seed(self._seed)
         while True:
             # Extract the next failure step following the MTTF distribution
-            time_to_failure = int(random.expovariate(self._break_mean))
+            time_to_failure = self._draw_time_to_failure()
             # Block the failure triggering process for the TTF extracted time.
             yield self.env.timeout(time_to_failure)
             # If the machine is not already broken and is currently working...
             if not self._broken:
+                self._interruptible = False
                 self._process.interrupt()
 
+    # RANDOM DRAWS -----------------------------------------------------------------------------------------------------
+    @property
+    def likelihood_ratio(self):
+        """
+        Likelihood ratio of the run up to now (1 without importance sampling): density ratio of the repair times and of
+        the times to failure elapsed, and survival ratio of the time to failure in progress.
+        """
+        log_ratio = self._log_likelihood_ratio
+        if self._pending_failure is not None:
+            start, _ = self._pending_failure
+            biased_rate = self._break_mean * self._failure_factor
+            log_ratio += (biased_rate - self._break_mean) * (self.env.now - start)
+        return math.exp(log_ratio)
+
+    @staticmethod
+    def _log_density_ratio(rate, biased_rate, value):
+        # Logarithm of the density of the exponential with "rate" over the one with "biased_rate", at "value".
+        return math.log(rate / biased_rate) - (rate - biased_rate) * value
+
+    def _draw_time_to_failure(self):
+        if self._failure_factor == 1:
+            if self._streams is None:
+                return self._recorded(RandomStreams.FAILURES, int(random.expovariate(self._break_mean)))
+            return self._recorded(RandomStreams.FAILURES,
+                                  int(self._streams[RandomStreams.FAILURES].exponential(self._break_mean)))
+
+        biased_rate = self._break_mean * self._failure_factor
+        # The previous time to failure elapsed: its density enters the likelihood ratio.
+        if self._pending_failure is not None:
+            self._log_likelihood_ratio += self._log_density_ratio(self._break_mean, biased_rate,
+                                                                  self._pending_failure[1])
+        if self._streams is None:
+            value = random.expovariate(biased_rate)
+        else:
+            value = self._streams[RandomStreams.FAILURES].exponential(biased_rate)
+        self._pending_failure = (self.env.now, value)
+        return self._recorded(RandomStreams.FAILURES, int(value))
+
+    def _draw_repair_time(self):
+        biased_rate = self._repair_mean / self._repair_factor if self._repair_factor != 1 else self._repair_mean
+        if self._streams is None:
+            value = random.expovariate(biased_rate)
+        else:
+            value = self._streams[RandomStreams.REPAIRS].exponential(biased_rate)
+        # The repair time is logged at the breakdown: its density enters the likelihood ratio at once.
+        if self._repair_factor != 1:
+            self._log_likelihood_ratio += self._log_density_ratio(self._repair_mean, biased_rate, value)
+        return self._recorded(RandomStreams.REPAIRS, int(value))
+
+    def _draw_process_time(self):
+        if self._streams is None:
+            value = int(random.normalvariate(self._mean_process_time, self._sigma_process_time))
+        else:
+            value = int(self._streams[RandomStreams.PROCESS_TIMES].normal(self._mean_process_time,
+                                                                          self._sigma_process_time))
+        return self._recorded(RandomStreams.PROCESS_TIMES, value)
+
+    def _recorded(self, purpose, value):
+        # Passing the drawn value to the trace recorder, if any.
+        if self.recorder is not None:
+            self.recorder.record(self._name, purpose, value)
+        return value
+
     def _expected_products(self):
-        check_error_tolerance = mean([GlobalVariables.MEAN_PROCESS_TIME_A, GlobalVariables.MEAN_PROCESS_TIME_B,
-                                      GlobalVariables.MEAN_PROCESS_TIME_C])
+        check_error_tolerance = mean([self._variables.MEAN_PROCESS_TIME_A, self._variables.MEAN_PROCESS_TIME_B,
+                                      self._variables.MEAN_PROCESS_TIME_C])
 
         csv_head = 'step,' + self._name + ' flag\n'
         self.expected_products_logger.initialise_csv_log_file(csv_head)
@@ -381,189 +699,153 @@ class Machine(object):
 
             yield self.env.timeout(1)
 
-    def _write_extended_log(self, step, moment, input_level, done_in, output_level, parts_made, broken, MTTF, TTR):
-        # Signature = step, moment, input_level, done_in (time_process), output_level, parts_made (produced), broken,
-        # MTTF, MTTR
-        if moment == "0":
-            text = "{0}.{1} - mach: state of {2} at step {0} moment {1}: input buffer {3}, output buffer {4}\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, input_level, output_level))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, input_level, output_level))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, input_level, output_level))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
-
-        if moment == "1":
-            text = "{0}.{1} - mach: the {2} input buffer level is {3}. Waiting 1 time step and re-check.\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, input_level))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, input_level))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, input_level))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
-
-        if moment == "2":
-            text = "{0}.{1} - mach: the {2} input buffer has been filled up. The buffer level is {3}. Continuing with "\
-                   "the process\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, input_level))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, input_level))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, input_level))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
-
-        elif moment == "3":
-            text = "\n{0}.{1} down - mach: {2} broke. Handling-in stopped. Machine will be repaired in {3}\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, TTR))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, TTR))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, TTR))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
-
-        elif moment == "4":
-            text = "\n{0}.{1} up - mach: {2} repaired. Handling-in restarted.\n"
-            # Print in the console
-            print(text.format(step, moment, self._name))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
-
-        elif moment == "5":
-            text = "{0}.{1} - mach: input {2} level {3}; taken 1 from input {2}.\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, input_level))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, input_level))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, input_level))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
-
-        elif moment == "6":
-            text = "{0}.{1} - mach: started 1 in {2}. Processing time: {3}\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, done_in))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, done_in))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, done_in))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
-
-        elif moment == "7":
-            text = "\n{0}.{1} down - mach: {2} broke. {3} step for the job to be completed. Machine will be repaired " \
-                   "in {4}\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, done_in, TTR))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, done_in, TTR))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, done_in, TTR))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
+    def _wait_buffers(self, moment, waiting):
+        """
+        Fast-forward version of the loops waiting one time step at a time for the input or output buffer.
 
-        elif moment == "8":
-            text = "\n{0}.{1} up - mach: {2} repaired. Working restarted.\n"
-            # Print in the console
-            print(text.format(step, moment, self._name))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name))
+        The machine sleeps until the next buffer level change, instead of checking every time step. The logs that the
+        loop would repeat at every step are written as intervals: a new interval starts when a buffer level changes.
+        Returns the number of waited steps.
+        """
+        start = self.env.now
+        interval_start = start
+        levels = (self._input_buffer.level, self._output_buffer.level)
+        self._wait = (moment, start)
 
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
+        while waiting():
+            try:
+                yield self.env.any_of([self._input_buffer.level_change(), self._output_buffer.level_change()])
+            except simpy.Interrupt:
+                # Breakdowns are ignored while waiting, as in the step by step loop.
+                continue
+
+            # The step by step loop has mostly checked the buffers before the change: it is noticed at the next step.
+            # Its checks can also come after the change in the step (e.g. a machine waiting since the start checks
+            # after the transference), so some changes are noticed one step later than step by step.
+            seen_step = self.env.now + 1
+            while self.env.now < seen_step:
+                try:
+                    yield self.env.timeout(seen_step - self.env.now)
+                except simpy.Interrupt:
+                    pass
+
+            new_levels = (self._input_buffer.level, self._output_buffer.level)
+            if new_levels != levels:
+                # Closing the current interval, the next one starts at this step with the new levels.
+                if self.env.now > interval_start:
+                    self._write_extended_log(interval_start, moment, levels[0], '0', levels[1], self.parts_made,
+                                             self._broken, self._MTTF, '0', until=self.env.now - 1)
+                interval_start = self.env.now
+                levels = new_levels
+
+        # The step by step loop checks the buffer at least once more after the first log.
+        while self.env.now == start:
+            try:
+                yield self.env.timeout(1)
+            except simpy.Interrupt:
+                pass
 
-        elif moment == "9":
-            text = "{0}.{1} - mach: made 1 in {2}. Total pieces made: {3}.\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, parts_made))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, parts_made))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, parts_made))
+        if self.env.now > interval_start:
+            self._write_extended_log(interval_start, moment, levels[0], '0', levels[1], self.parts_made, self._broken,
+                                     self._MTTF, '0', until=self.env.now - 1)
+        self._wait = None
+        return self.env.now - start
 
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
+    def _expected_products_intervals(self):
+        """
+        Fast-forward version of _expected_products.
 
-        # if statement ready-to-use but case never called in the working method.
-        elif moment == "10":
-            text = "{0}.{1} - out_full - mach: the {2} output buffer level is {3}. Waiting 1 time step and re-check.\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, output_level))
-            # Print in the txt
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, output_level))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, output_level))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
-
-        elif moment == "11":
-            text = "{0}.{1} - mach: the {2} output buffer has been emptied. The buffer level is {3}. Continuing with " \
-                   "the process\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, output_level))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, output_level))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, output_level))
+        The flag only rises when the expected time of the next piece is passed, and only falls when a part is done: the
+        process sleeps until one of the two, and logs the flag as intervals.
+        """
+        check_error_tolerance = mean([self._variables.MEAN_PROCESS_TIME_A, self._variables.MEAN_PROCESS_TIME_B,
+                                      self._variables.MEAN_PROCESS_TIME_C])
 
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
+        csv_head = 'step,' + self._name + ' flag,until\n'
+        self.expected_products_logger.initialise_csv_log_file(csv_head)
 
-        elif moment == "12":
-            text = "\n{0}.{1} down - mach: {2} broke. Handling-out stopped. Machine will be repaired in {3}\n"
-            # Print in the console
-            print(text.format(step, moment, self._name, TTR))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, TTR))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, TTR))
+        def flag():
+            return (self._last_piece_step + self._mean_process_time + int(check_error_tolerance)) < self.env.now
 
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
+        self._expected_products_sensor = flag()
+        self._exp_interval = [self.env.now, self._expected_products_sensor]
 
-        elif moment == "13":
-            text = "\n{0}.{1} up - mach: {2} repaired. Handling-out restarted.\n"
-            # Print in the console
-            print(text.format(step, moment, self._name))
-            # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name))
+        while True:
+            if self._expected_products_sensor:
+                yield self._part_done_event
+            else:
+                # First step when the flag would be raised.
+                rise_step = self._last_piece_step + self._mean_process_time + int(check_error_tolerance) + 1
+                yield self.env.any_of([self.env.timeout(max(int(rise_step - self.env.now), 1)),
+                                       self._part_done_event])
+
+            self._expected_products_sensor = flag()
+            if self._expected_products_sensor != self._exp_interval[1]:
+                if self.env.now > self._exp_interval[0]:
+                    self.expected_products_logger.write_csv_log_file([self._exp_interval + [self.env.now - 1]])
+                self._exp_interval = [self.env.now, self._expected_products_sensor]
+
+    def close_logs(self):
+        """
+        Write the logs still open at the end of the simulation.
 
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
+        Only the fast-forward mode keeps logs open: the expected product flag interval is closed at the last step.
+        With lazy text logs, the events of the current cycle are written too, since they have no text log.
+        """
+        if self._lazy_text_logs and self._data_list:
+            self.csv_logger.write_csv_log_file(self._data_list)
+            self._data_list = list()
+        if self._exp_interval is not None and self.env.now > self._exp_interval[0]:
+            self.expected_products_logger.write_csv_log_file([self._exp_interval + [self.env.now - 1]])
+            self._exp_interval = [self.env.now, self._expected_products_sensor]
 
-        elif moment == "14":
-            text = "{0}.{1} - mach: output {2} level {3}; put 1 in output {2}.\n"
+    def _write_extended_log(self, step, moment, input_level, done_in, output_level, parts_made, broken, MTTF, TTR,
+                            until=None):
+        # Signature = step, moment, input_level, done_in (time_process), output_level, parts_made (produced), broken,
+        # MTTF, MTTR
+        if not self._lazy_text_logs:
+            template, fields = self.MESSAGES[moment]
+            values = {'input': input_level, 'time_process': done_in, 'output': output_level, 'produced': parts_made,
+                      'repair_time': TTR}
+            text = template.format(step, moment, self._name, *[values[field] for field in fields])
             # Print in the console
-            print(text.format(step, moment, self._name, output_level))
+            print(text)
             # Print in the txt file
-            self.global_txt_logger.write_txt_log_file(text.format(step, moment, self._name, output_level))
-            self.local_txt_logger.write_txt_log_file(text.format(step, moment, self._name, output_level))
-
-            # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
-            self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made,
-                                    broken, MTTF, TTR])
+            self.global_txt_logger.write_txt_log_file(text)
+            self.local_txt_logger.write_txt_log_file(text)
+
+        # csv_log = step + moment, input_level, time_process, output_level, produced, failure, MTTF, MTTR
+        self._data_list.append([str(step) + "." + str(moment), input_level, done_in, output_level, parts_made, broken,
+                                MTTF, TTR])
+
+        # In fast-forward mode, the last column is the last step the log is repeated at (interval encoding).
+        if self._fast_forward:
+            self._data_list[-1].append('' if until is None else until)
+        # With importance sampling, the likelihood ratio of the draws up to this event.
+        if self.importance_sampling:
+            self._data_list[-1].append(self.likelihood_ratio)
+
+        if self.history is not None:
+            self.history.append((step, int(moment), input_level, int(done_in), output_level, parts_made, broken,
+                                 int(TTR)))
+
+        self._update_statistics(step, moment)
+
+        # Notifying the listeners (e.g. LiveMetrics) of the logged event.
+        for listener in self.listeners:
+            listener.on_machine_event(self, step, moment)
+
+    def _update_statistics(self, step, moment):
+        if moment == '9':
+            self.statistics['cycle_time'].add(step - self._cycle_start)
+            self._cycle_start = step
+        elif moment in ('3', '7', '12'):
+            self.statistics['time_between_failures'].add(step - self._up_since)
+            self._down_since = step
+        elif moment in ('4', '8', '13'):
+            self.statistics['repair_time'].add(step - self._down_since)
+            self._up_since = step
+
+    def reset_statistics(self):
+        """Restart the online statistics from now (e.g. at the end of the warm-up), the open intervals are kept."""
+        self.statistics = {name: RunningStatistics() for name in self.statistics}
@@ -10,10 +10,33 @@ The merged file has to be consistent with time order.
 The responsibility is achieved leveraging pandas, turning the log files into dataframes and then merging them performing
 a full-outer-join.
 
+Logs written in fast-forward mode are interval encoded: a row with a value in the "until" column stands for the same row
+repeated at every time step up to "until". These rows are expanded before the merge, so the merged file has the rows of
+a step by step run (not the same values, see GlobalVariables.FAST_FORWARD).
+
+The per-machine merges (machine log with its expected product flag) are independent: they run in a process pool. The
+final merge of the per-machine files is streamed (k-way merge of the sorted files, forward filling the missing values),
+so it never holds the whole dataset in memory, and gives the same file of the pandas outer join.
+
+The merged files are written by blocks of rows, and an index of the blocks (first step, byte offset and rows of each
+block) is written next to each of them ("merged_logs.csv.index"). The LogQuery class uses it to read only the blocks of
+a time range, without parsing the whole file.
+
+The dataframes of the logs and of the merges use the narrowest integer type of each column (see compact_dtypes).
+
+The segmented logs are read segment by segment, in the order of their manifest.
+
+If the run detected the end of its warm-up (see warmup_detector.py), the merged file starts at the warm-up end step.
 """
 
+import concurrent.futures
+import heapq
+import itertools
 import os
+import numpy
 import pandas
+from log_segmenter import LogSegmenter
+from global_variables import GlobalVariables
 
 
 class MergeLogs(object):
@@ -31,9 +54,21 @@ class MergeLogs(object):
         df_list = list()
         # Appending the data in the list read from the CSVs files.
         for arg in args:
-            df = pandas.read_csv(os.path.join(input_path + "/" + arg))
+            df = MergeLogs.read_log(os.path.join(input_path + "/" + arg))
             df_list.append(df)
 
+        df_merge = MergeLogs.merge_frames(df_list)
+
+        # Saving the merged dataframe into a csv file, with its time-range index.
+        MergeLogs.write_indexed(df_merge, os.path.join(output_path + '/' + output_name))
+
+    # Rows of each block of the time-range index.
+    INDEX_BLOCK_ROWS = 4096
+    INDEX_SUFFIX = '.index'
+
+    @staticmethod
+    def merge_frames(df_list):
+        """Full-outer-join on the step of the log dataframes, with the missing values forward filled."""
         # Merging the first two dataframes.
         df1 = df_list[0]
         df2 = df_list[1]
@@ -50,10 +85,172 @@ class MergeLogs(object):
 
         # Handling missing data generated from machine breakdowns
         df_merge.fillna(method="ffill", inplace=True)
-        # Converting all the data into int comprised Trues and Falses
-        df_merge.iloc[:, 1:] = df_merge.iloc[:, 1:].astype('Int64')
-        # Saving the merged dataframe into a csv file.
-        df_merge.to_csv(os.path.join(output_path + '/' + output_name), index=False)
+        # Converting all the data into the narrowest integers, except the importance sampling weights.
+        return MergeLogs.compact_dtypes(df_merge)
+
+    @staticmethod
+    def compact_dtypes(df):
+        """
+        Convert in place each integer valued column to its narrowest integer type: int8 for the failures and the flags,
+        int16 or int32 for the levels, the times and the counters (the nullable Int8, Int16... types only for columns
+        with missing values). The step becomes an integer (at least int32) when it has no moment, the weights stay
+        floats. The CSV text of the dataframe does not change.
+        """
+        for column in df.columns:
+            values = df[column]
+            if column.startswith('weight ') or not (values.dropna() % 1 == 0).all():
+                continue
+            if column == 'step':
+                df[column] = values.astype('int32' if values.max() < 2 ** 31 else 'int64')
+            elif values.isna().any():
+                df[column] = pandas.to_numeric(values.astype('Int64'), downcast='integer')
+            else:
+                df[column] = pandas.to_numeric(values.astype('int64'), downcast='integer')
+        return df
+
+    @staticmethod
+    def write_indexed(df, file_path, block_rows=None):
+        """
+        Write the dataframe into a csv file block by block, and the index of the blocks into file_path + INDEX_SUFFIX:
+        one line per block with its first step, the byte offset of its first row and its number of rows.
+        """
+        block_rows = block_rows or MergeLogs.INDEX_BLOCK_ROWS
+        index = list()
+        with open(file_path, 'w', newline='') as f:
+            df.iloc[:0].to_csv(f, index=False)
+            for start in range(0, len(df), block_rows):
+                block = df.iloc[start:start + block_rows]
+                f.flush()
+                index.append((block['step'].iloc[0], f.tell(), len(block)))
+                block.to_csv(f, index=False, header=False)
+
+        with open(file_path + MergeLogs.INDEX_SUFFIX, 'w') as f:
+            f.write('step,offset,rows\n')
+            f.writelines('{0},{1},{2}\n'.format(*entry) for entry in index)
+
+    @staticmethod
+    def merge_machine(raw_log_path, merged_log_path, component):
+        """Merge the log and the expected product flag of a machine folder (e.g. "Machine_A") into component.csv."""
+        in_path = os.path.join(raw_log_path + '/' + component)
+        merge_file_1 = component.split('_')[0] + ' ' + component.split('_')[1] + ' log.csv'
+        merge_file_2 = component.split('_')[0] + ' ' + component.split('_')[1] + ' exp_prod_flag.csv'
+        MergeLogs.merge_logs(in_path, merged_log_path, component + '.csv', merge_file_1, merge_file_2)
+        return component + '.csv'
+
+    @staticmethod
+    def merge_all(raw_log_path, merged_log_path, components, output_name='merged_logs.csv', processes=None,
+                  start_step=None):
+        """
+        Merge the machine folders in parallel (one process per machine, at most "processes"), then stream the final
+        merge of the per-machine files, from "start_step" (e.g. the warm-up end) if given.
+        """
+        workers = min(len(components), processes or os.cpu_count() or 1)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max(workers, 1)) as executor:
+            file_list = list(executor.map(MergeLogs.merge_machine, itertools.repeat(raw_log_path),
+                                          itertools.repeat(merged_log_path), components))
+
+        MergeLogs.stream_merge([os.path.join(merged_log_path + '/' + name) for name in file_list],
+                               os.path.join(merged_log_path + '/' + output_name), start_step=start_step)
+
+    @staticmethod
+    def stream_merge(file_paths, output_path, block_rows=None, start_step=None):
+        """
+        Outer join on the step of csv files sorted by step, with the missing values forward filled, written with its
+        time-range index. Same result of merge_logs, reading the files line by line. With a "start_step", the rows
+        before it are not written (they still fill the values of the following rows).
+        """
+        block_rows = block_rows or MergeLogs.INDEX_BLOCK_ROWS
+        files = [open(path, 'r') for path in file_paths]
+        try:
+            headers = [f.readline().rstrip('\n').split(',') for f in files]
+            widths = [len(header) - 1 for header in headers]
+
+            def rows(i):
+                # Rows of the file i as (step, file number, row number, values), the row number keeps the file order.
+                for n, line in enumerate(files[i]):
+                    values = line.rstrip('\n').split(',')
+                    yield float(values[0]), i, n, values
+
+            # Last value of each column, for the forward filling.
+            last = [''] * sum(widths)
+            index = list()
+            written = 0
+            with open(output_path, 'w', newline='') as out:
+                out.write(','.join(['step'] + [name for header in headers for name in header[1:]]) + '\n')
+
+                merged = heapq.merge(*[rows(i) for i in range(len(files))])
+                for step, group in itertools.groupby(merged, key=lambda row: row[0]):
+                    # Rows of each file at this step: the join is their cartesian product (pandas order).
+                    groups = [[None] for _ in files]
+                    step_text = None
+                    for _, i, _, values in group:
+                        if groups[i] == [None]:
+                            groups[i] = list()
+                        groups[i].append(values)
+                        step_text = step_text or values[0]
+
+                    for combination in itertools.product(*groups):
+                        values = list()
+                        for i, row in enumerate(combination):
+                            values.extend(row[1:] if row is not None else [''] * widths[i])
+                        for c, value in enumerate(values):
+                            if value == '':
+                                values[c] = last[c]
+                            else:
+                                last[c] = value
+                        if start_step is not None and step < start_step:
+                            continue
+
+                        if written % block_rows == 0:
+                            index.append((step_text, out.tell(), 0))
+                        index[-1] = (index[-1][0], index[-1][1], index[-1][2] + 1)
+                        out.write(step_text + ',' + ','.join(values) + '\n')
+                        written += 1
+        finally:
+            for f in files:
+                f.close()
+
+        with open(output_path + MergeLogs.INDEX_SUFFIX, 'w') as f:
+            f.write('step,offset,rows\n')
+            f.writelines('{0},{1},{2}\n'.format(*entry) for entry in index)
+
+    @staticmethod
+    def read_log(file_path):
+        """
+        Read a log csv file (path or text buffer) into a dataframe, expanding the interval encoded rows, if any. The
+        segments of a segmented log file (see log_segmenter.py) are read in order.
+        """
+        if isinstance(file_path, str):
+            segment_paths = LogSegmenter.segment_paths(file_path)
+            if segment_paths != [file_path]:
+                return MergeLogs.compact_dtypes(pandas.concat([MergeLogs.read_log(path) for path in segment_paths],
+                                                              ignore_index=True))
+        columns = pandas.read_csv(file_path, nrows=0).columns
+        # In memory logs (see CsvLogger.csv_text) are read again from their start.
+        if hasattr(file_path, 'seek'):
+            file_path.seek(0)
+        if 'until' not in columns:
+            return MergeLogs.compact_dtypes(pandas.read_csv(file_path))
+
+        # The step is read as a string to rebuild the repeated steps as "time_step.moment" exactly.
+        df = pandas.read_csv(file_path, dtype={'step': str})
+        until = df.pop('until')
+        step_parts = df['step'].str.split('.', n=1, expand=True)
+        time_step = step_parts[0].astype('int64')
+        repeats = numpy.where(until.isna(), 1, until.fillna(0).astype('int64') - time_step + 1)
+
+        df = df.loc[df.index.repeat(repeats)].reset_index(drop=True)
+        # Progressive number of each repeated row within its interval.
+        offset = numpy.arange(len(df)) - numpy.repeat(numpy.cumsum(repeats) - repeats, repeats)
+        new_time_step = (numpy.repeat(time_step.to_numpy(), repeats) + offset).astype(str)
+
+        if step_parts.shape[1] > 1:
+            moment = numpy.repeat(step_parts[1].to_numpy(), repeats)
+            new_step = pandas.Series(new_time_step) + '.' + pandas.Series(moment, dtype=str)
+            df['step'] = new_step.astype(float)
+        else:
+            df['step'] = pandas.Series(new_time_step).astype('int64')
+        return MergeLogs.compact_dtypes(df)
 
 
 # File Main entry point.
@@ -75,19 +272,13 @@ if __name__ == '__main__':
     # Select the keys to iterate
     folder_list = [x for x in folder_list if '.' not in x and 'Machine' in x]
 
-    # Iter in the Machine file list
-    log_merger = MergeLogs()
-    for component in folder_list:
-        # For each group of file, operate a merge over the flags.
-        in_path = os.path.join(raw_log_path + '/' + component)
-        out_path = merged_log_path
-        out_file = component + '.csv'
-        merge_file_1 = component.split('_')[0] + ' ' + component.split('_')[1] + ' log.csv'
-        merge_file_2 = component.split('_')[0] + ' ' + component.split('_')[1] + ' exp_prod_flag.csv'
-
-        log_merger.merge_logs(in_path, out_path, out_file, merge_file_1, merge_file_2)
-
-    file_list = [x + '.csv' for x in folder_list]
+    # Starting the dataset at the warm-up end, if detected during the run (see warmup_detector.py).
+    start_step = None
+    warmup_path = os.path.join(raw_log_path + '/' + GlobalVariables.WARMUP_FILENAME)
+    if os.path.exists(warmup_path):
+        with open(warmup_path) as f:
+            start_step = int(f.read())
+        print('Merged logs starting at the warm-up end, step {0}'.format(start_step))
 
-    # Merging into 1.
-    log_merger.merge_logs(merged_log_path, merged_log_path, "merged_logs.csv", *file_list)
+    # Merging each machine folder in parallel, then all the machines into 1.
+    MergeLogs.merge_all(raw_log_path, merged_log_path, folder_list, "merged_logs.csv", start_step=start_step)
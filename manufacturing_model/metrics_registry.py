@@ -0,0 +1,116 @@
+"""
+metrics_registry.py file: MetricsRegistry class
+
+The class responsibility is to keep a set of metrics (counters and gauges, with labels) and to expose them in the
+Prometheus text format, on a local HTTP endpoint or into a file.
+
+The values are set by the simulation when they change. The text of each metric is cached and rebuilt only when one of
+its values changed, so a scrape never recomputes the metrics: it joins the cached texts. The HTTP server thread and the
+simulation share the values and the cached texts under a lock.
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MetricsRegistry(object):
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, prefix=''):
+        self._prefix = prefix
+        # Metric name -> {"help", "type", "values": {labels text: value}, "text": cached text or None}
+        self._metrics = dict()
+        self._lock = threading.Lock()
+        self._server = None
+
+    # METRICS DEFINITION AND UPDATE ------------------------------------------------------------------------------------
+    def counter(self, name, help_text):
+        self._define(name, help_text, 'counter')
+
+    def gauge(self, name, help_text):
+        self._define(name, help_text, 'gauge')
+
+    def _define(self, name, help_text, metric_type):
+        with self._lock:
+            self._metrics[self._prefix + name] = {'help': help_text, 'type': metric_type, 'values': dict(),
+                                                  'text': None}
+
+    def set(self, name, value, **labels):
+        metric = self._metrics[self._prefix + name]
+        key = self._labels(labels)
+        with self._lock:
+            if metric['values'].get(key) != value:
+                metric['values'][key] = value
+                metric['text'] = None
+
+    def inc(self, name, amount=1, **labels):
+        metric = self._metrics[self._prefix + name]
+        key = self._labels(labels)
+        with self._lock:
+            metric['values'][key] = metric['values'].get(key, 0) + amount
+            metric['text'] = None
+
+    def get(self, name, **labels):
+        return self._metrics[self._prefix + name]['values'].get(self._labels(labels))
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ''
+        return '{' + ','.join('{0}="{1}"'.format(k, str(v).replace('"', '\\"'))
+                              for k, v in sorted(labels.items())) + '}'
+
+    # EXPOSITION -------------------------------------------------------------------------------------------------------
+    def render(self):
+        """Metrics in the Prometheus text format."""
+        texts = list()
+        with self._lock:
+            for name, metric in self._metrics.items():
+                text = metric['text']
+                if text is None:
+                    lines = ['# HELP {0} {1}'.format(name, metric['help']),
+                             '# TYPE {0} {1}'.format(name, metric['type'])]
+                    for labels, value in metric['values'].items():
+                        lines.append('{0}{1} {2}'.format(name, labels, value))
+                    text = metric['text'] = '\n'.join(lines) + '\n'
+                texts.append(text)
+        return ''.join(texts)
+
+    def write_file(self, path):
+        """Write the metrics into a file, replacing it at once (a reader never sees a partial file)."""
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as f:
+            f.write(self.render())
+            f.close()
+        os.replace(temporary_path, path)
+
+    def serve(self, port=8000, host='127.0.0.1'):
+        """Serve the metrics on http://host:port/metrics, from a background thread. Returns the server address."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', MetricsRegistry.CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                # No access log in the console.
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='MetricsServer', daemon=True).start()
+        return self._server.server_address
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
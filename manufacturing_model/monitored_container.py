@@ -0,0 +1,81 @@
+"""
+monitored_container.py file: MonitoredContainer class
+
+This class extends the Container Class of SimPy, notifying the changes of the container level.
+
+Processes that only depend on the container level (e.g. a machine waiting for raw material) can wait for the next level
+change instead of checking the level at every time step. It is the base class of InputContainer and OutputContainer.
+
+The listeners (e.g. LiveMetrics) are notified of each level change with on_level_change(container).
+
+With a "history_size", the last level changes are kept in memory (StateHistory of step and level).
+
+The buffer occupancy (time average, variance, min and max of the level) is kept online, see level_statistics().
+"""
+
+import numpy
+import simpy
+from state_history import StateHistory
+from running_statistics import RunningStatistics
+
+
+class MonitoredContainer(simpy.Container):
+    def __init__(self, env, max_capacity, init_capacity, history_size=0):
+        super().__init__(env, max_capacity, init_capacity)
+        # Event triggered at the next level change, created only when a process asks for it.
+        self._level_event = None
+        # Objects notified at each level change.
+        self.listeners = list()
+
+        # Time-weighted statistics of the levels, up to the last change.
+        self._level_accumulator = RunningStatistics(time_weighted=True)
+        self._last_level = init_capacity
+        self._level_since = env.now
+
+        # Recent level changes, starting from the initial level.
+        self.history = None
+        if history_size:
+            self.history = StateHistory(history_size, [('level', numpy.int32)])
+            self.history.append((env.now, init_capacity))
+
+    def level_change(self):
+        """Event triggered at the next change of the container level."""
+        if self._level_event is None:
+            self._level_event = self._env.event()
+        return self._level_event
+
+    def level_statistics(self):
+        """Time-weighted statistics (RunningStatistics) of the container level, from the start up to now."""
+        current = RunningStatistics(time_weighted=True)
+        current.add(self._last_level, self._env.now - self._level_since)
+        return self._level_accumulator.merge(current)
+
+    def reset_statistics(self):
+        """Restart the level statistics from now (e.g. at the end of the warm-up)."""
+        self._level_accumulator = RunningStatistics(time_weighted=True)
+        self._level_since = self._env.now
+
+    def _level_changed(self):
+        # The previous level lasted from its change up to now (nothing if it changed again in the same step).
+        self._level_accumulator.add(self._last_level, self._env.now - self._level_since)
+        self._last_level = self.level
+        self._level_since = self._env.now
+        if self._level_event is not None:
+            event, self._level_event = self._level_event, None
+            event.succeed()
+        if self.history is not None:
+            self.history.append((self._env.now, self.level))
+        for listener in self.listeners:
+            listener.on_level_change(self)
+
+    def _do_put(self, event):
+        done = super()._do_put(event)
+        if done and event.amount:
+            self._level_changed()
+        return done
+
+    def _do_get(self, event):
+        done = super()._do_get(event)
+        if done and event.amount:
+            self._level_changed()
+        return done
@@ -5,18 +5,22 @@ This class extends the Container/Store Class of SimPy, integrating the level con
 The level control is needed in order to not run out of available space.
 
 Is possible to exclude the level control service.
+
+In fast-forward mode, the level is not checked at every time step: the control waits for the next level change, then
+re-aligns to the check time steps.
 """
 
-import simpy
+from monitored_container import MonitoredContainer
 from txt_logger import TxtLogger
 from global_variables import GlobalVariables
 
 
-class OutputContainer(simpy.Container):
+class OutputContainer(MonitoredContainer):
     def __init__(self, env, name, log_path, max_capacity, init_capacity, output_control=True,
                  critical_level_output_container=50, dispatcher_lead_time=0, dispatcher_retrieved_check_time=8,
-                 dispatcher_std_check_time=1):
-        super().__init__(env, max_capacity, init_capacity)
+                 dispatcher_std_check_time=1, fast_forward=False,
+                 history_size=0):
+        super().__init__(env, max_capacity, init_capacity, history_size)
         self.env = env
         self.name = name
 
@@ -30,16 +34,28 @@ class OutputContainer(simpy.Container):
         self._dispatcher_lead_time = dispatcher_lead_time
         self._dispatcher_retrieved_check_time = dispatcher_retrieved_check_time
         self._dispatcher_std_check_time = dispatcher_std_check_time
+        self._fast_forward = fast_forward
 
         self.products_stored = 0
         self.products_delivered = 0
 
         # Logging objects
-        # No local log path is used because the log is only global for logistics instances
+        # No local log path is used because the log is only global for logistics instances. Without log path (None),
+        # nothing is written nor printed.
+        self._log_path = log_path
         self.global_txt_logger = TxtLogger(log_path, GlobalVariables.LOG_FILENAME)
         # The following line is not printed ... Why? maybe delete it.
         self.global_txt_logger.write_txt_log_file('### DATA LOG FROM OUTPUT CONTAINER FILE ###\n')
 
+    def _log(self, text, separator=False):
+        # Printing the text in the console, with an optional separator line, and writing it into the global log file.
+        if self._log_path is None:
+            return
+        print(text)
+        if separator:
+            print('----------------------------------')
+        self.global_txt_logger.write_txt_log_file(text)
+
     def _output_control_container(self):
         yield self.env.timeout(0)
 
@@ -53,29 +69,23 @@ class OutputContainer(simpy.Container):
                 text = '{0}.1 - out_log: container {1} dispatch stock upper the critical level{2}, {3} pieces left.\n' \
                        'Calling the dispatcher\n'
 
-                print(text.format(self.env.now, self.name, self._critical_level_output_container, self.level))
-                print('----------------------------------')
-                # Writing into the log file - logistic
-                self.global_txt_logger.write_txt_log_file(text.format(self.env.now, self.name,
-                                                                      self._critical_level_output_container,
-                                                                      self.level))
+                # Printing in the console and writing into the log file - logistic
+                self._log(text.format(self.env.now, self.name, self._critical_level_output_container, self.level),
+                          separator=True)
 
                 # Wait for the dispatcher lead time.
                 yield self.env.timeout(self._dispatcher_lead_time)
 
                 # Dispatcher arrived, writing in the console.
                 text = '{0}.2-out_log: component dispatcher {1} arrived'
-                print(text.format(self.env.now, self.name))
-                self.global_txt_logger.write_txt_log_file(text.format(self.env.now, self.name))
+                self._log(text.format(self.env.now, self.name))
 
                 # The warehouse will be completely emptied. Counting the material amount.
                 self.products_delivered += self.level
 
                 # Logging the event.
                 text = '{0}.3-out_log: dispatcher arrived. {1} pieces took by the dispatcher.\n'
-                print(text.format(str(self.env.now), str(self.level)))
-                print('----------------------------------')
-                self.global_txt_logger.write_txt_log_file(text.format(str(self.env.now), str(self.level)))
+                self._log(text.format(str(self.env.now), str(self.level)), separator=True)
 
                 # Dispatcher get made after the log; otherwise the level logged would be zero.
 
@@ -83,6 +93,15 @@ class OutputContainer(simpy.Container):
 
                 # After the dispatch, check the level status after a given time (usually 8).
                 yield self.env.timeout(self._dispatcher_retrieved_check_time)
+            elif self._fast_forward and self._dispatcher_std_check_time:
+                # The level can only reach the critical level with a level change: jump to it...
+                check_start = self.env.now
+                while self.level < self._critical_level_output_container:
+                    yield self.level_change()
+                # ... then wait for the step when the standard check would have found it.
+                misalignment = (self.env.now - check_start) % self._dispatcher_std_check_time
+                if misalignment:
+                    yield self.env.timeout(self._dispatcher_std_check_time - misalignment)
             else:
                 # If no dispatch, check the level status after at the next step.
                 yield self.env.timeout(self._dispatcher_std_check_time)
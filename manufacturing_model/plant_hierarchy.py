@@ -0,0 +1,202 @@
+"""
+plant_hierarchy.py file: HierarchyNode and PlantHierarchy classes
+
+Hierarchical view of a running ProductionLine: machines are grouped into cells, cells into the line. Each node of the
+hierarchy keeps its KPIs up to date while the simulation runs, so any level can be queried at any step in O(1):
+    - availability: 1 - downtime / (machines * elapsed time). The running repairs are included;
+    - throughput: parts made by the output machines of the node per step, since the start and over a rolling window;
+    - OEE: availability * performance * quality = parts of the output machines * ideal cycle time / elapsed time, per
+      output machine (the model produces no scrap, quality is 1). The ideal cycle time is the machine mean processing
+      time plus the handling times;
+    - WIP: pieces held by the machines (from the input handling to the output handling) plus the pieces in the buffers
+      of the node.
+
+The hierarchy is a listener of the machines and of the containers: each event adds its increments to the node and to
+its ancestors (O(depth)), the queries only combine the stored sums.
+"""
+
+from global_variables import GlobalVariables
+
+
+# HIERARCHY NODE CLASS -------------------------------------------------------------------------------------------------
+class HierarchyNode(object):
+    def __init__(self, name, level, window, bucket_size):
+        self.name = name
+        self.level = level          # "machine", "cell" or "line"
+        self.parent = None
+        self.children = list()
+
+        self.machines = 0           # Machines under the node.
+        self.outputs = 0            # Output machines under the node.
+        self.parts_out = 0          # Parts of the output machines, and their ideal cycle times sum.
+        self.ideal_output_time = 0
+        self.wip = 0
+        self.downtime = 0           # Time of the ended repairs.
+        self.down_machines = 0      # Machines under repair, and sum of their breakdown steps.
+        self.down_since_sum = 0
+
+        # Rolling window of the output parts, as a ring of time buckets.
+        self._bucket_size = bucket_size
+        self._buckets = [0] * max(1, window // bucket_size)
+        self._current_bucket = 0
+        self._window_parts = 0
+
+    def add_part(self, step, ideal_cycle_time):
+        self.parts_out += 1
+        self.ideal_output_time += ideal_cycle_time
+        self._roll(step)
+        self._buckets[self._current_bucket % len(self._buckets)] += 1
+        self._window_parts += 1
+
+    def _roll(self, step):
+        # Emptying the buckets expired since the last update (at most all of them).
+        bucket = step // self._bucket_size
+        for i in range(max(self._current_bucket + 1, bucket - len(self._buckets) + 1), bucket + 1):
+            self._window_parts -= self._buckets[i % len(self._buckets)]
+            self._buckets[i % len(self._buckets)] = 0
+        self._current_bucket = max(bucket, self._current_bucket)
+
+    def kpis(self, now, start=0):
+        elapsed = max(now - start, 1)
+        downtime = self.downtime + self.down_machines * now - self.down_since_sum
+        availability = 1 - downtime / (max(self.machines, 1) * elapsed)
+
+        self._roll(now)
+        # The window ends with the current bucket, partially filled.
+        window_time = min(elapsed, (len(self._buckets) - 1) * self._bucket_size + now % self._bucket_size + 1)
+        oee = self.ideal_output_time / (self.outputs * elapsed) if self.outputs else None
+
+        return {'name': self.name, 'level': self.level, 'step': now,
+                'availability': availability,
+                'throughput': self.parts_out / elapsed,
+                'rolling_throughput': self._window_parts / window_time,
+                'oee': oee,
+                'wip': self.wip,
+                'parts_out': self.parts_out,
+                'downtime': downtime}
+
+
+# PLANT HIERARCHY CLASS ------------------------------------------------------------------------------------------------
+class PlantHierarchy(object):
+    """
+    cells: dict cell name -> (list of machines, list of WIP containers, list of output machines).
+    line_outputs: output machines of the line (default: the output machines of the last cell).
+    variables: GlobalVariables of the line, for the handling times.
+    """
+    def __init__(self, env, cells, line_name='line', line_outputs=None, window=3600, bucket_size=60,
+                 variables=GlobalVariables):
+        self.env = env
+        self._start = env.now
+        self._node_args = (window, bucket_size)
+        self.nodes = dict()
+        self.line = self._node(line_name, 'line', None)
+
+        self._machine_paths = dict()            # Machine -> leaf node and its ancestors
+        self._output_nodes = dict()             # Machine -> nodes counting its parts
+        self._container_nodes = dict()          # Container -> nodes counting its level as WIP
+        self._container_levels = dict()
+        self._broken_since = dict()
+        self._ideal_cycle_time = dict()         # Machine -> mean processing time plus the handling times
+
+        last_outputs = list()
+        for cell_name, (machines, containers, outputs) in cells.items():
+            cell = self._node(cell_name, 'cell', self.line)
+            for machine in machines:
+                leaf = self._node(machine.name, 'machine', cell)
+                self._machine_paths[machine] = self._path(leaf)
+                self._ideal_cycle_time[machine] = machine.mean_process_time + variables.GET_STD_DELAY + \
+                    variables.PUT_STD_DELAY
+                for node in self._machine_paths[machine]:
+                    node.machines += 1
+                self._add_output(machine, [leaf] + ([cell] if machine in outputs else list()))
+                machine.listeners.append(self)
+            for container in containers:
+                self._container_nodes[container] = [cell, self.line]
+                self._container_levels[container] = container.level
+                cell.wip += container.level
+                self.line.wip += container.level
+                container.listeners.append(self)
+            last_outputs = outputs
+
+        for machine in (line_outputs if line_outputs is not None else last_outputs):
+            self._add_output(machine, [self.line])
+
+    @classmethod
+    def standard(cls, line, **kwargs):
+        """Hierarchy of the A/B -> C ProductionLine: cell AB (machines A and B) feeding cell C (machine C)."""
+        cells = {
+            'cell AB': ([line.machine_A, line.machine_B], [line.output_A, line.output_B],
+                        [line.machine_A, line.machine_B]),
+            'cell C': ([line.machine_C], [line.input_C], [line.machine_C]),
+        }
+        kwargs.setdefault('variables', line.variables)
+        return cls(line.env, cells, **kwargs)
+
+    def _node(self, name, level, parent):
+        node = HierarchyNode(name, level, *self._node_args)
+        node.parent = parent
+        if parent is not None:
+            parent.children.append(node)
+        self.nodes[name] = node
+        return node
+
+    @staticmethod
+    def _path(node):
+        # The node and its ancestors.
+        path = list()
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        return path
+
+    def _add_output(self, machine, nodes):
+        for node in nodes:
+            node.outputs += 1
+        self._output_nodes.setdefault(machine, list()).extend(nodes)
+
+    # LISTENER FUNCTIONS -----------------------------------------------------------------------------------------------
+    def on_machine_event(self, machine, step, moment):
+        path = self._machine_paths[machine]
+        if moment == '9':
+            ideal_cycle_time = self._ideal_cycle_time[machine]
+            for node in self._output_nodes[machine]:
+                node.add_part(step, ideal_cycle_time)
+        elif moment == '5':
+            for node in path:
+                node.wip += 1
+        elif moment == '14':
+            for node in path:
+                node.wip -= 1
+        elif moment in ('3', '7', '12'):
+            self._broken_since[machine] = step
+            for node in path:
+                node.down_machines += 1
+                node.down_since_sum += step
+        elif moment in ('4', '8', '13'):
+            since = self._broken_since.pop(machine)
+            for node in path:
+                node.down_machines -= 1
+                node.down_since_sum -= since
+                node.downtime += step - since
+
+    def on_level_change(self, container):
+        delta = container.level - self._container_levels[container]
+        self._container_levels[container] = container.level
+        for node in self._container_nodes[container]:
+            node.wip += delta
+
+    # QUERIES ----------------------------------------------------------------------------------------------------------
+    def kpis(self, name=None):
+        """KPIs of a node (default: the line) at the current step."""
+        node = self.line if name is None else self.nodes[name]
+        return node.kpis(self.env.now, self._start)
+
+    def report(self):
+        """KPIs of all the nodes, from the line down to the machines."""
+        rows = list()
+        stack = [self.line]
+        while stack:
+            node = stack.pop()
+            rows.append(node.kpis(self.env.now, self._start))
+            stack.extend(reversed(node.children))
+        return rows
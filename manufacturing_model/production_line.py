@@ -0,0 +1,226 @@
+"""
+production_line.py file: ProductionLine class
+
+Class that builds the A/B -> C production line of the model into a SimPy environment: the logistic entities, the
+machines and the transference system, with the parameters taken from a GlobalVariables class.
+
+The class is used by the running_model.py main entry point, and by every tool that needs to run the model more than once
+(e.g. with the parameters overridden through GlobalVariables.derive).
+"""
+
+from machine_model import Machine
+from input_container import InputContainer
+from output_container import OutputContainer
+from transference_system import TransferenceSystem
+from running_statistics import RunningStatistics
+from global_variables import GlobalVariables
+
+
+# PRODUCTION LINE CLASS ------------------------------------------------------------------------------------------------
+class ProductionLine(object):
+    """
+    Raw containers A and B feed the machines A and B; their finished containers are moved by the transference system
+    into the raw container C, that feeds the assembling machine C.
+
+    The seed of the random generator is the same for all the runs by default: pass a different "seed" to get independent
+    replications. Without "random_breakdowns", the machines only break when told so (see Machine.breakdown), as in the
+    StreamingTwin. With "streams" (RandomStreams), each machine draws from its own streams instead of the seeded global
+    generator, for common random numbers and antithetic variates. The importance sampling of the breakdowns is set by
+    the IMPORTANCE_ variables (see Machine).
+    """
+    def __init__(self, env, log_path, variables=GlobalVariables, seed=0, random_breakdowns=True, streams=None):
+        self.env = env
+        self.variables = variables
+
+        # LOGISTIC ENTITIES DEFINITION ---------------------------------------------------------------------------------
+        self.input_A = InputContainer(env, name="input A", log_path=log_path,
+                                      max_capacity=variables.CONTAINER_A_RAW_CAPACITY,
+                                      init_capacity=variables.INITIAL_A_RAW, input_control=True,
+                                      critical_level_input_container=variables.CRITICAL_STOCK_A_RAW,
+                                      supplier_lead_time=variables.SUPPLIER_LEAD_TIME_A_RAW,
+                                      supplier_std_supply=variables.SUPPLIER_STD_SUPPLY_A_RAW,
+                                      input_refilled_check_time=variables.AFTER_REFILLING_CHECK_TIME_A_RAW,
+                                      input_std_check_time=variables.STANDARD_A_CHECK_TIME,
+                                      fast_forward=variables.FAST_FORWARD, history_size=variables.HISTORY_SIZE)
+
+        self.output_A = OutputContainer(env, name="output A", log_path=log_path,
+                                        max_capacity=variables.CONTAINER_A_FINISHED_CAPACITY,
+                                        init_capacity=variables.INITIAL_A_FINISHED, output_control=False,
+                                        fast_forward=variables.FAST_FORWARD, history_size=variables.HISTORY_SIZE)
+
+        self.input_B = InputContainer(env, name="input B", log_path=log_path,
+                                      max_capacity=variables.CONTAINER_B_RAW_CAPACITY,
+                                      init_capacity=variables.INITIAL_B_RAW, input_control=True,
+                                      critical_level_input_container=variables.CRITICAL_STOCK_B_RAW,
+                                      supplier_lead_time=variables.SUPPLIER_LEAD_TIME_B_RAW,
+                                      supplier_std_supply=variables.SUPPLIER_STD_SUPPLY_B_RAW,
+                                      input_refilled_check_time=variables.AFTER_REFILLING_CHECK_TIME_B_RAW,
+                                      input_std_check_time=variables.STANDARD_B_CHECK_TIME,
+                                      fast_forward=variables.FAST_FORWARD, history_size=variables.HISTORY_SIZE)
+
+        self.output_B = OutputContainer(env, name="output B", log_path=log_path,
+                                        max_capacity=variables.CONTAINER_B_FINISHED_CAPACITY,
+                                        init_capacity=variables.INITIAL_B_FINISHED, output_control=False,
+                                        fast_forward=variables.FAST_FORWARD, history_size=variables.HISTORY_SIZE)
+
+        self.input_C = InputContainer(env, name="input C", log_path=log_path,
+                                      max_capacity=variables.CONTAINER_C_FINISHED_CAPACITY,
+                                      init_capacity=variables.INITIAL_C_FINISHED, input_control=False,
+                                      fast_forward=variables.FAST_FORWARD, history_size=variables.HISTORY_SIZE)
+
+        self.output_C = OutputContainer(env, name="output C", log_path=log_path,
+                                        max_capacity=variables.CONTAINER_C_FINISHED_CAPACITY,
+                                        init_capacity=variables.INITIAL_C_FINISHED, output_control=True,
+                                        critical_level_output_container=variables.CRITICAL_STOCK_C_FINISHED,
+                                        dispatcher_lead_time=variables.DISPATCHER_LEAD_TIME_C_FINISHED,
+                                        dispatcher_retrieved_check_time=variables
+                                        .DISPATCHER_RETRIEVED_CHECK_TIME_C_FINISHED,
+                                        dispatcher_std_check_time=variables.DISPATCHER_STD_CHECK_TIME_C_FINISHED,
+                                        fast_forward=variables.FAST_FORWARD, history_size=variables.HISTORY_SIZE)
+
+        # MACHINES DEFINITION ------------------------------------------------------------------------------------------
+        self.machine_A = Machine(env, "Machine A", log_path, variables.MEAN_PROCESS_TIME_A,
+                                 variables.SIGMA_PROCESS_TIME_A, variables.MTTF_A, variables.MTTR_A, self.input_A,
+                                 self.output_A, fast_forward=variables.FAST_FORWARD, seed=seed,
+                                 random_breakdowns=random_breakdowns, history_size=variables.HISTORY_SIZE,
+                                 lazy_text_logs=variables.LAZY_TEXT_LOGS, streams=streams,
+                                 failure_factor=variables.IMPORTANCE_FAILURE_FACTOR,
+                                 repair_factor=variables.IMPORTANCE_REPAIR_FACTOR, variables=variables)
+        self.machine_B = Machine(env, "Machine B", log_path, variables.MEAN_PROCESS_TIME_B,
+                                 variables.SIGMA_PROCESS_TIME_B, variables.MTTF_B, variables.MTTR_B, self.input_B,
+                                 self.output_B, fast_forward=variables.FAST_FORWARD, seed=seed,
+                                 random_breakdowns=random_breakdowns, history_size=variables.HISTORY_SIZE,
+                                 lazy_text_logs=variables.LAZY_TEXT_LOGS, streams=streams,
+                                 failure_factor=variables.IMPORTANCE_FAILURE_FACTOR,
+                                 repair_factor=variables.IMPORTANCE_REPAIR_FACTOR, variables=variables)
+
+        # Moving from output A&B to input C
+        output_containers = list()
+        output_containers.append(self.output_A)
+        output_containers.append(self.output_B)
+
+        self.transference_from_A_B_to_C = TransferenceSystem(env, "from A and B to C", output_containers, self.input_C,
+                                                             fast_forward=variables.FAST_FORWARD)
+
+        self.machine_C = Machine(env, "Machine C", log_path, variables.MEAN_PROCESS_TIME_C,
+                                 variables.SIGMA_PROCESS_TIME_C, variables.MTTF_C, variables.MTTR_C, self.input_C,
+                                 self.output_C, fast_forward=variables.FAST_FORWARD, seed=seed,
+                                 random_breakdowns=random_breakdowns, history_size=variables.HISTORY_SIZE,
+                                 lazy_text_logs=variables.LAZY_TEXT_LOGS, streams=streams,
+                                 failure_factor=variables.IMPORTANCE_FAILURE_FACTOR,
+                                 repair_factor=variables.IMPORTANCE_REPAIR_FACTOR, variables=variables)
+
+        self.machines = [self.machine_A, self.machine_B, self.machine_C]
+        self.containers = [self.input_A, self.output_A, self.input_B, self.output_B, self.input_C, self.output_C]
+
+        # Online statistics of the periods closed by cut_statistics, merged into the statistics.
+        self._closed_statistics = dict()
+
+    def close_logs(self):
+        """Write the logs still open at the end of the simulation."""
+        for machine in self.machines:
+            machine.close_logs()
+
+    def kpis(self):
+        """
+        Key performance indicators of the line at the current simulation time. With importance sampling, the "weight"
+        is the likelihood ratio of the run (product of the machine ones): the means of the KPIs x weight over the
+        replications estimate the KPIs of the real failure and repair rates.
+        """
+        kpis = {'sim_time': self.env.now,
+                'delivered_pieces': self.output_C.products_delivered + self.output_C.level}
+        for machine in self.machines:
+            key = machine.name.split(" ")[1]
+            kpis['parts_made_' + key] = machine.parts_made
+            kpis['breakdowns_' + key] = machine.breakdown_num
+            kpis['breakdown_time_' + key] = machine.breakdown_time
+            kpis['starving_time_' + key] = machine.starving_time
+            kpis['blocking_time_' + key] = machine.blocking_time
+        if any(machine.importance_sampling for machine in self.machines):
+            kpis['weight'] = 1.0
+            for machine in self.machines:
+                kpis['weight'] *= machine.likelihood_ratio
+        return kpis
+
+    def statistics(self):
+        """
+        Online statistics of the run (RunningStatistics): time between failures, repair time and cycle time of each
+        machine, e.g. "repair_time_A", and time-weighted level of each container, e.g. "level input C". The statistics
+        of several replications are merged with RunningStatistics.merge_all.
+        """
+        statistics = self._period_statistics()
+        if self._closed_statistics:
+            statistics = RunningStatistics.merge_all([self._closed_statistics, statistics])
+        return statistics
+
+    def _period_statistics(self):
+        # Statistics since the last cut or reset.
+        statistics = dict()
+        for machine in self.machines:
+            key = machine.name.split(" ")[1]
+            for name, accumulator in machine.statistics.items():
+                statistics[name + '_' + key] = accumulator
+        for container in self.containers:
+            statistics['level ' + container.name] = container.level_statistics()
+        return statistics
+
+    def cut_statistics(self):
+        """
+        Close the current period of the online statistics: return the statistics since the previous cut (or the start),
+        and continue with new accumulators. The statistics of the run are unchanged, statistics() merges the periods.
+        """
+        period = self._period_statistics()
+        self._closed_statistics = RunningStatistics.merge_all([self._closed_statistics, period])
+        self._reset_accumulators()
+        return period
+
+    def reset_statistics(self, statistics=None):
+        """
+        Restart the online statistics of the machines and containers from now (e.g. at the end of the warm-up), or from
+        the given statistics (e.g. the merged periods since the warm-up end, see cut_statistics).
+        """
+        self._closed_statistics = dict(statistics or dict())
+        self._reset_accumulators()
+
+    def _reset_accumulators(self):
+        for machine in self.machines:
+            machine.reset_statistics()
+        for container in self.containers:
+            container.reset_statistics()
+
+    @staticmethod
+    def print_statistics(statistics):
+        for name, accumulator in statistics.items():
+            if accumulator.count:
+                print('{0}: mean {1:.1f}, std {2:.1f}, min {3}, max {4} ({5} values)'.format(
+                    name, accumulator.mean, accumulator.std, accumulator.min, accumulator.max, accumulator.count))
+            else:
+                print('{0}: no values'.format(name))
+
+    def print_summary(self):
+        print(f'----------------------------------')
+        print('Node A raw container has {0} pieces ready to be processed'.format(self.input_A.level))
+        print('Node A raw pieces picked: {0}\n'.format(self.input_A.products_picked))
+
+        print('Node A finished container has {0} pieces processed'.format(self.output_A.level))
+        print('Node A finished container pieces stored: {0}\n'.format(self.output_A.products_stored))
+
+        print('Node B raw container has {0} pieces ready to be processed'.format(self.input_B.level))
+        print('Node B raw pieces picked: {0}\n'.format(self.input_B.products_picked))
+
+        print('Node B finished container has {0} pieces processed'.format(self.output_B.level))
+        print('Node B finished container pieces stored: {0}\n'.format(self.output_B.products_stored))
+
+        print('Node C raw container has {0} pieces ready to be processed'.format(self.input_C.level))
+        print('Node C raw pieces picked: {0}\n'.format(self.input_C.products_picked))
+
+        print('Node C finished container has {0} pieces processed'.format(self.output_C.level))
+        print('Node C finished container pieces stored: {0}\n'.format(self.output_C.products_stored))
+
+        print(f'Dispatch C has %d pieces ready to go!' % self.output_C.level)
+        print(f'----------------------------------')
+        print('total pieces delivered: {0}'.format(self.output_C.products_delivered + self.output_C.level))
+        print('total pieces assembled: {0}'.format(self.machine_C.parts_made))
+        print(f'----------------------------------')
+        self.print_statistics(self.statistics())
+        print(f'----------------------------------')
@@ -0,0 +1,67 @@
+"""
+random_streams.py file: RandomStreams and RandomStream classes
+
+The class responsibility is to give each random purpose of each model entity its own random stream, for the variance
+reduction of the scenario comparisons.
+
+By default the machines draw all their numbers from the single global "random" generator, so a change of a scenario
+(e.g. a larger buffer) shifts all the following draws of all the machines, and the difference between two scenarios is
+lost in the noise. With RandomStreams:
+    - common random numbers: the stream of an entity and a purpose (e.g. the failures of Machine A) only depends on the
+      seed, the entity name and the purpose. Two scenarios run with the same seed use the same n-th time to failure,
+      n-th repair time and n-th processing time of each machine, whatever the rest of the model does;
+    - antithetic variates: an antithetic stream returns 1 - u for each uniform u of the normal stream. All the draws are
+      made by inversion of the distribution function, so a run and its antithetic run are negatively correlated, and
+      their average has a lower variance.
+"""
+
+import hashlib
+import math
+import random
+import statistics
+
+
+class RandomStream(random.Random):
+    """Random generator drawing by inversion, optionally antithetic."""
+    def __init__(self, seed, antithetic=False):
+        self.antithetic = antithetic
+        super().__init__(seed)
+
+    def random(self):
+        u = super().random()
+        return 1.0 - u if self.antithetic else u
+
+    def uniform_open(self):
+        """Uniform draw in (0, 1): the bounds are excluded for the inversions."""
+        u = self.random()
+        while u <= 0.0 or u >= 1.0:
+            u = self.random()
+        return u
+
+    def exponential(self, rate):
+        """Exponential draw of mean 1 / rate, by inversion."""
+        return - math.log(1.0 - self.uniform_open()) / rate
+
+    def normal(self, mean, sigma):
+        """Normal draw, by inversion."""
+        return statistics.NormalDist(mean, sigma).inv_cdf(self.uniform_open())
+
+
+class RandomStreams(object):
+    # Purposes of the machine draws.
+    FAILURES = 'failures'
+    REPAIRS = 'repairs'
+    PROCESS_TIMES = 'process times'
+
+    def __init__(self, seed=0, antithetic=False):
+        self.seed = seed
+        self.antithetic = antithetic
+
+    def stream(self, entity, purpose):
+        """New stream of an entity (e.g. "Machine A") and a purpose, depending only on the seed, entity and purpose."""
+        key = '{0}/{1}/{2}'.format(self.seed, entity, purpose).encode('utf-8')
+        return RandomStream(int.from_bytes(hashlib.sha256(key).digest()[:8], 'big'), self.antithetic)
+
+    def antithetic_pair(self):
+        """Streams of the antithetic run of this one."""
+        return RandomStreams(self.seed, not self.antithetic)
@@ -0,0 +1,214 @@
+"""
+replication_runner.py file: ReplicationRunner class
+
+The class responsibility is to run the model just as long as needed for a target precision of the KPIs, instead of a
+fixed guessed budget (number of replications or WORKING_WEEKS).
+
+Two sequential stopping procedures are available:
+    - replications: independent SimPy runs (seeds 1, 2, ...) are launched by batches. After each batch, the confidence
+      interval half-width of the mean of each chosen KPI is computed (Student t), and the runner stops as soon as all
+      the half-widths are within the target precision, or at the maximum number of replications;
+    - batch means: one long run is split into batches of "batch_steps" steps. The KPI increments of each batch are the
+      observations (the first batches are discarded as warm-up), and the run is extended batch by batch until the
+      half-widths are within the target precision, or up to the maximum horizon.
+
+With importance sampling (IMPORTANCE_ variables), each replication is weighted by its likelihood ratio, so the means
+estimate the KPIs of the real failure and repair rates.
+
+The precision is relative to the KPI mean by default ("relative_precision", e.g. 0.02 for +-2%), or absolute for the
+KPIs given in "absolute_precision". The report gives the compute saved with respect to the fixed budget.
+
+The scenario comparisons (compare_scenarios) estimate the KPI differences between two scenarios with common random
+numbers and, optionally, antithetic pairs (see RandomStreams): the differences reach the same precision with far fewer
+replications than with independent runs.
+"""
+
+import contextlib
+import math
+import os
+import statistics
+import tempfile
+import time
+import simpy
+from production_line import ProductionLine
+from running_statistics import RunningStatistics
+from random_streams import RandomStreams
+from validation_harness import ValidationHarness
+from global_variables import GlobalVariables
+
+
+# REPLICATION RUNNER CLASS ---------------------------------------------------------------------------------------------
+class ReplicationRunner(object):
+    def __init__(self, variables=GlobalVariables, kpis=('parts_made_C', 'delivered_pieces'), relative_precision=0.02,
+                 absolute_precision=None, confidence=0.95):
+        self._variables = variables
+        self._kpis = list(kpis)
+        self._relative_precision = relative_precision
+        self._absolute_precision = dict(absolute_precision or dict())
+        self._confidence = confidence
+
+    # CONFIDENCE INTERVALS ---------------------------------------------------------------------------------------------
+    @staticmethod
+    def t_quantile(p, df):
+        """Quantile p of the Student t distribution with df degrees of freedom (Cornish-Fisher expansion)."""
+        z = statistics.NormalDist().inv_cdf(p)
+        if df <= 0:
+            return float('inf')
+        return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2) + \
+            (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3) + \
+            (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * df ** 4)
+
+    def half_width(self, accumulator):
+        """Confidence interval half-width of the mean of the observations of a RunningStatistics."""
+        if accumulator.count < 2:
+            return float('inf')
+        quantile = self.t_quantile(0.5 + self._confidence / 2, accumulator.count - 1)
+        return quantile * accumulator.std / math.sqrt(accumulator.count)
+
+    def _converged(self, accumulators):
+        for kpi in self._kpis:
+            target = self._absolute_precision.get(kpi, self._relative_precision * abs(accumulators[kpi].mean))
+            if self.half_width(accumulators[kpi]) > target:
+                return False
+        return True
+
+    def _intervals(self, accumulators):
+        return {kpi: {'mean': accumulators[kpi].mean, 'half_width': self.half_width(accumulators[kpi]),
+                      'observations': accumulators[kpi].count} for kpi in self._kpis}
+
+    # REPLICATIONS -----------------------------------------------------------------------------------------------------
+    def run_replications(self, batch_size=5, min_replications=10, max_replications=100, first_seed=1):
+        """
+        Launch replications by batches, until the confidence intervals converge or "max_replications" (the fixed
+        budget) is reached. The online statistics of the runs (see ProductionLine.statistics) are merged too.
+        """
+        start_time = time.time()
+        accumulators = {kpi: RunningStatistics() for kpi in self._kpis}
+        run_statistics = list()
+        replications = 0
+        converged = False
+        while replications < max_replications:
+            for seed in range(first_seed + replications, first_seed + min(replications + batch_size, max_replications)):
+                kpis = ValidationHarness.run_simpy(self._variables, seed=seed)
+                for kpi in self._kpis:
+                    # Importance sampled runs: the observation is the KPI x the likelihood ratio weight.
+                    accumulators[kpi].add(kpis[kpi] * kpis.get('weight', 1.0))
+                run_statistics.append(kpis['statistics'])
+                replications += 1
+            if replications >= min_replications and self._converged(accumulators):
+                converged = True
+                break
+
+        wall_time = time.time() - start_time
+        return {'mode': 'replications', 'converged': converged, 'replications': replications,
+                'budget': max_replications, 'compute_saved': 1 - replications / max_replications,
+                'wall_time': wall_time, 'budget_wall_time': wall_time / replications * max_replications,
+                'intervals': self._intervals(accumulators),
+                'statistics': RunningStatistics.merge_all(run_statistics)}
+
+    # BATCH MEANS ------------------------------------------------------------------------------------------------------
+    def run_batch_means(self, batch_steps=None, warmup_batches=1, min_batches=10, max_steps=None, seed=0):
+        """
+        Extend one run batch by batch, until the confidence intervals of the batch means converge or the horizon
+        "max_steps" (default: the SIM_TIME of the variables, the fixed budget) is reached.
+        """
+        variables = self._variables
+        # One working week per batch by default.
+        batch_steps = int(batch_steps or variables.SIM_TIME // variables.WORKING_WEEKS)
+        max_steps = int(max_steps or variables.SIM_TIME)
+
+        start_time = time.time()
+        accumulators = {kpi: RunningStatistics() for kpi in self._kpis}
+        converged = False
+        batches = 0
+        with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull):
+                env = simpy.Environment()
+                line = ProductionLine(env, log_dir, variables, seed=seed)
+                previous = line.kpis()
+                while env.now + batch_steps <= max_steps:
+                    env.run(until=env.now + batch_steps)
+                    current = line.kpis()
+                    batches += 1
+                    if batches > warmup_batches:
+                        for kpi in self._kpis:
+                            accumulators[kpi].add(current[kpi] - previous[kpi])
+                    previous = current
+                    if batches - warmup_batches >= min_batches and self._converged(accumulators):
+                        converged = True
+                        break
+                line.close_logs()
+                steps = env.now
+
+        wall_time = time.time() - start_time
+        return {'mode': 'batch means', 'converged': converged, 'batches': batches, 'batch_steps': batch_steps,
+                'steps': steps, 'budget': max_steps, 'compute_saved': 1 - steps / max_steps, 'wall_time': wall_time,
+                'budget_wall_time': wall_time / steps * max_steps, 'intervals': self._intervals(accumulators)}
+
+    # SCENARIO COMPARISON ----------------------------------------------------------------------------------------------
+    def compare_scenarios(self, variables_a, variables_b, replications=10, common_random_numbers=True,
+                          antithetic=False, first_seed=1):
+        """
+        Confidence intervals of the KPI differences B - A over the replications. With common random numbers, both
+        scenarios of a replication run with the same random streams, otherwise with independent ones. With
+        "antithetic", each replication is the average of a run and of its antithetic run (twice the runs).
+        """
+        start_time = time.time()
+        accumulators = {kpi: RunningStatistics() for kpi in self._kpis}
+        runs = 0
+        for seed in range(first_seed, first_seed + replications):
+            streams_a = RandomStreams(seed)
+            # Independent streams: seeds out of the range of the A ones.
+            streams_b = RandomStreams(seed if common_random_numbers else seed + 1000000)
+            pairs = [(streams_a, streams_b)]
+            if antithetic:
+                pairs.append((streams_a.antithetic_pair(), streams_b.antithetic_pair()))
+
+            differences = {kpi: 0.0 for kpi in self._kpis}
+            for a, b in pairs:
+                kpis_a = ValidationHarness.run_simpy(variables_a, streams=a)
+                kpis_b = ValidationHarness.run_simpy(variables_b, streams=b)
+                runs += 2
+                for kpi in self._kpis:
+                    differences[kpi] += (kpis_b[kpi] * kpis_b.get('weight', 1.0) -
+                                         kpis_a[kpi] * kpis_a.get('weight', 1.0)) / len(pairs)
+            for kpi in self._kpis:
+                accumulators[kpi].add(differences[kpi])
+
+        return {'mode': 'comparison', 'common_random_numbers': common_random_numbers, 'antithetic': antithetic,
+                'replications': replications, 'runs': runs, 'wall_time': time.time() - start_time,
+                'intervals': self._intervals(accumulators)}
+
+    @staticmethod
+    def print_report(report):
+        if report['mode'] == 'comparison':
+            print('comparison (common random numbers {0}, antithetic {1}): {2} runs in {3:.1f} secs'.format(
+                report['common_random_numbers'], report['antithetic'], report['runs'], report['wall_time']))
+            for kpi, interval in report['intervals'].items():
+                print('    difference {0}: {1:.2f} +- {2:.2f}'.format(kpi, interval['mean'], interval['half_width']))
+            return
+        runs = report['replications'] if report['mode'] == 'replications' else report['steps']
+        print('{0}: {1} after {2} of {3} ({4:.0%} of the budget saved, {5:.1f} secs instead of {6:.1f})'.format(
+            report['mode'], 'converged' if report['converged'] else 'NOT converged', runs, report['budget'],
+            report['compute_saved'], report['wall_time'], report['budget_wall_time']))
+        for kpi, interval in report['intervals'].items():
+            print('    {0}: {1:.2f} +- {2:.2f} ({3} observations)'.format(kpi, interval['mean'], interval['half_width'],
+                                                                      interval['observations']))
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    runner = ReplicationRunner(GlobalVariables.derive(WORKING_WEEKS=4, FAST_FORWARD=True), relative_precision=0.05)
+    ReplicationRunner.print_report(runner.run_replications(max_replications=100))
+
+    # Batch means of one working week within a run of up to 36 weeks.
+    runner = ReplicationRunner(GlobalVariables.derive(FAST_FORWARD=True), relative_precision=0.15)
+    ReplicationRunner.print_report(runner.run_batch_means())
+
+    # Effect of a 50% longer repair time of Machine A: independent runs, common random numbers, and antithetic pairs.
+    variables_a = GlobalVariables.derive(WORKING_WEEKS=4, FAST_FORWARD=True)
+    variables_b = GlobalVariables.derive(WORKING_WEEKS=4, FAST_FORWARD=True, MTTR_A=int(GlobalVariables.MTTR_A * 1.5))
+    runner = ReplicationRunner(kpis=('parts_made_C', 'breakdown_time_A'))
+    for common_random_numbers, antithetic in ((False, False), (True, False), (True, True)):
+        ReplicationRunner.print_report(runner.compare_scenarios(variables_a, variables_b, 10, common_random_numbers,
+                                                                antithetic))
@@ -0,0 +1,84 @@
+"""
+running_statistics.py file: RunningStatistics class
+
+The class responsibility is to keep the summary statistics of a KPI (count, mean, variance, min, max) while the
+simulation runs, without storing the values: each value updates the accumulator in O(1) with the Welford algorithm,
+numerically stable also on long runs.
+
+A time-weighted accumulator (e.g. the level of a buffer, each level weighted by the steps it lasted) gives the time
+average and the time variance of the KPI.
+
+The accumulators of independent replications are merged with the parallel formula of Chan et al.: the merge of the
+replicas is the accumulator of all their values, so the statistics of a replication study never need the logs.
+"""
+
+import math
+
+
+class RunningStatistics(object):
+    def __init__(self, time_weighted=False):
+        self.time_weighted = time_weighted
+        self.count = 0              # Number of values
+        self.weight = 0.0           # Sum of the weights (the count, or the time for a time-weighted accumulator)
+        self.mean = 0.0
+        self._m2 = 0.0              # Weighted sum of the squared differences from the mean
+        self.min = None
+        self.max = None
+
+    def add(self, value, weight=1.0):
+        """Add a value (with its weight, e.g. the steps a level lasted). Values with no weight are ignored."""
+        if weight <= 0:
+            return
+        self.count += 1
+        self.weight += weight
+        delta = value - self.mean
+        self.mean += delta * weight / self.weight
+        self._m2 += weight * delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def variance(self):
+        """Sample variance of the values, or time variance of a time-weighted accumulator."""
+        if self.time_weighted:
+            return self._m2 / self.weight if self.weight else 0.0
+        return self._m2 / (self.weight - 1) if self.weight > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    # MERGE ------------------------------------------------------------------------------------------------------------
+    def merge(self, other):
+        """Accumulator of the values of both accumulators (e.g. two replications). The accumulators are not modified."""
+        merged = RunningStatistics(self.time_weighted)
+        merged.count = self.count + other.count
+        merged.weight = self.weight + other.weight
+        if merged.weight:
+            delta = other.mean - self.mean
+            merged.mean = self.mean + delta * other.weight / merged.weight
+            merged._m2 = self._m2 + other._m2 + delta * delta * self.weight * other.weight / merged.weight
+        values = [v for v in (self.min, other.min) if v is not None]
+        merged.min = min(values) if values else None
+        values = [v for v in (self.max, other.max) if v is not None]
+        merged.max = max(values) if values else None
+        return merged
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    @staticmethod
+    def merge_all(statistics):
+        """Merge a list of dicts name -> RunningStatistics (e.g. one per replication) into one dict."""
+        merged = dict()
+        for run in statistics:
+            for name, accumulator in run.items():
+                merged[name] = merged[name].merge(accumulator) if name in merged else accumulator
+        return merged
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.mean, 'std': self.std, 'min': self.min, 'max': self.max}
+
+    def __repr__(self):
+        return 'RunningStatistics(count={0}, mean={1:.2f}, std={2:.2f}, min={3}, max={4})'.format(
+            self.count, self.mean, self.std, self.min, self.max)
@@ -0,0 +1,434 @@
+"""
+sharded_simulation.py file: CellModel and ShardedSimulation classes
+
+Parallel simulation of a large plant partitioned into cells. A cell is a serial chain of machines in its own SimPy
+environment; the cells are connected only through buffers, as the output A/B -> input C link of the ProductionLine:
+    - a cell without upstream cells takes its raw pieces from a supplier controlled container;
+    - a cell with upstream cells has one staging container per upstream cell, and a TransferenceSystem assembling one
+      piece of each staging container into the input of its first machine (as the A and B pieces into input C);
+    - the last container of a cell is either emptied by a dispatcher, or sent to its downstream cell.
+
+The cells are grouped into shards, each one run by its own process. The material flow between the cells is
+synchronized with a conservative time-window protocol:
+    - moving a piece from a cell to the next one takes "link_delay" steps. It is the lookahead of the protocol: all the
+      shards run the same window of "link_delay" steps without any communication, since a piece sent during the window
+      can only arrive after its end;
+    - at the end of each window, the coordinator collects the pieces sent by each cell and delivers them to their
+      downstream cell, at their arrival step, before the next window;
+    - the staging containers never overflow: a cell sends a piece only with a credit of its downstream cell. The credits
+      start at the staging container capacity, and the slots freed during a window are given back at its end.
+
+No window is ever rolled back, and the results do not depend on the number of shards: each cell has its own random
+streams (RandomStreams of the cell seed, one stream per machine and purpose), so the plant can be run in a single
+process (processes=0) to check the sharded results.
+"""
+
+import contextlib
+import multiprocessing
+import os
+import time
+import simpy
+from machine_model import Machine
+from input_container import InputContainer
+from output_container import OutputContainer
+from transference_system import TransferenceSystem
+from random_streams import RandomStreams
+from async_log_writer import AsyncLogWriter
+from global_variables import GlobalVariables
+
+
+# CELL MODEL CLASS -----------------------------------------------------------------------------------------------------
+class CellModel(object):
+    """
+    One cell of the plant, in its own SimPy environment.
+
+    machines: list of (machine name, parameters letter), e.g. ("Machine A7", "A") for a machine with the
+    MEAN_PROCESS_TIME_A, SIGMA_PROCESS_TIME_A, MTTF_A and MTTR_A parameters (ValueError for a letter without them).
+    The machine names must be unique in the plant. The raw container of a cell without upstream cells has the
+    parameters of the letter of its first machine, or the A ones if there are none (e.g. CONTAINER_C_RAW_CAPACITY).
+    upstream: names of the cells sending their pieces to this one.
+    downstream: True if the pieces of the cell are sent to another cell, instead of being dispatched.
+    """
+    def __init__(self, name, machines, log_path, variables=GlobalVariables, upstream=(), downstream=False, seed=0,
+                 link_capacity=None):
+        self.name = name
+        self.env = simpy.Environment()
+        self._fast_forward = variables.FAST_FORWARD
+        os.mkdir(log_path)
+
+        # The machines of the cell draw from their own streams, never from the global random generator.
+        self.streams = RandomStreams(seed)
+
+        # Containers and machines of the chain, from the cell input to the cell output.
+        raw = machines[0][1]
+        buffer_capacity = variables.CONTAINER_C_FINISHED_CAPACITY
+        self.containers = list()
+        if upstream:
+            first_input = InputContainer(self.env, name="input " + name, log_path=log_path,
+                                         max_capacity=buffer_capacity, init_capacity=0, input_control=False,
+                                         fast_forward=self._fast_forward)
+        else:
+            first_input = InputContainer(self.env, name="input " + name, log_path=log_path,
+                                         max_capacity=self._parameter(
+                                             variables, 'CONTAINER_{0}_RAW_CAPACITY', raw, 'A'),
+                                         init_capacity=self._parameter(variables, 'INITIAL_{0}_RAW', raw, 'A'),
+                                         input_control=True,
+                                         critical_level_input_container=self._parameter(
+                                             variables, 'CRITICAL_STOCK_{0}_RAW', raw, 'A'),
+                                         supplier_lead_time=self._parameter(
+                                             variables, 'SUPPLIER_LEAD_TIME_{0}_RAW', raw, 'A'),
+                                         supplier_std_supply=self._parameter(
+                                             variables, 'SUPPLIER_STD_SUPPLY_{0}_RAW', raw, 'A'),
+                                         input_refilled_check_time=self._parameter(
+                                             variables, 'AFTER_REFILLING_CHECK_TIME_{0}_RAW', raw, 'A'),
+                                         input_std_check_time=self._parameter(
+                                             variables, 'STANDARD_{0}_CHECK_TIME', raw, 'A'),
+                                         fast_forward=self._fast_forward)
+        self.containers.append(first_input)
+
+        # Staging containers of the pieces coming from the upstream cells.
+        self.staging = dict()
+        self._arrived = dict()
+        self._freed = dict()
+        for upstream_name in upstream:
+            staging = OutputContainer(self.env, name="from " + upstream_name, log_path=log_path,
+                                      max_capacity=link_capacity or buffer_capacity, init_capacity=0,
+                                      output_control=False, fast_forward=self._fast_forward)
+            self.staging[upstream_name] = staging
+            self._arrived[upstream_name] = 0
+            self._freed[upstream_name] = 0
+            self.containers.append(staging)
+        if upstream:
+            TransferenceSystem(self.env, "to " + name, list(self.staging.values()), first_input,
+                               fast_forward=self._fast_forward)
+
+        self.machines = list()
+        machine_input = first_input
+        for i, (machine_name, letter) in enumerate(machines):
+            last = i == len(machines) - 1
+            if last and not downstream:
+                machine_output = OutputContainer(self.env, name="output " + name, log_path=log_path,
+                                                 max_capacity=buffer_capacity, init_capacity=0, output_control=True,
+                                                 critical_level_output_container=variables.CRITICAL_STOCK_C_FINISHED,
+                                                 dispatcher_lead_time=variables.DISPATCHER_LEAD_TIME_C_FINISHED,
+                                                 dispatcher_retrieved_check_time=variables
+                                                 .DISPATCHER_RETRIEVED_CHECK_TIME_C_FINISHED,
+                                                 dispatcher_std_check_time=variables
+                                                 .DISPATCHER_STD_CHECK_TIME_C_FINISHED,
+                                                 fast_forward=self._fast_forward)
+            else:
+                machine_output = OutputContainer(self.env, name="output " + machine_name, log_path=log_path,
+                                                 max_capacity=buffer_capacity, init_capacity=0, output_control=False,
+                                                 fast_forward=self._fast_forward)
+            self.containers.append(machine_output)
+
+            self.machines.append(Machine(self.env, machine_name, log_path,
+                                         self._parameter(variables, 'MEAN_PROCESS_TIME_{0}', letter),
+                                         self._parameter(variables, 'SIGMA_PROCESS_TIME_{0}', letter),
+                                         self._parameter(variables, 'MTTF_{0}', letter),
+                                         self._parameter(variables, 'MTTR_{0}', letter),
+                                         machine_input, machine_output, fast_forward=self._fast_forward, seed=seed,
+                                         lazy_text_logs=variables.LAZY_TEXT_LOGS, streams=self.streams,
+                                         variables=variables))
+
+            if not last:
+                # Moving from the output of a machine to the input of the next one.
+                machine_input = InputContainer(self.env, name="input " + machines[i + 1][0], log_path=log_path,
+                                               max_capacity=buffer_capacity, init_capacity=0, input_control=False,
+                                               fast_forward=self._fast_forward)
+                self.containers.append(machine_input)
+                TransferenceSystem(self.env, "to " + machines[i + 1][0], [machine_output], machine_input,
+                                   fast_forward=self._fast_forward)
+        self.output = machine_output
+
+        # Pieces sent to the downstream cell: credits left and steps of the pieces sent during the window.
+        self._downstream = downstream
+        self.credits = 0
+        self._credit_event = None
+        self._sent = list()
+        self.pieces_sent = 0
+        if downstream:
+            self.env.process(self._sending())
+
+    @staticmethod
+    def _parameter(variables, template, letter, fallback_letter=None):
+        # Parameter of the letter, e.g. MTTF_A, or of the fallback letter if the letter has none.
+        name = template.format(letter)
+        if not hasattr(variables, name) and fallback_letter is not None:
+            name = template.format(fallback_letter)
+        if not hasattr(variables, name):
+            raise ValueError('Unknown parameter {0}: the machine letter "{1}" has no parameters.'.format(name, letter))
+        return getattr(variables, name)
+
+    # WINDOW -----------------------------------------------------------------------------------------------------------
+    def advance(self, until, arrivals=None, credits=0):
+        """
+        Run the cell up to the step "until" (excluded), after scheduling the pieces arriving from the upstream cells
+        (dict upstream cell name -> list of arrival steps) and adding the credits of the downstream cell.
+        Returns the steps of the pieces sent, and the dict upstream cell name -> staging slots freed.
+        """
+        for upstream_name, steps in (arrivals or dict()).items():
+            for step in steps:
+                arrival = self.env.timeout(step - self.env.now)
+                arrival.callbacks.append(lambda _, name=upstream_name: self._arrival(name))
+        self._add_credits(credits)
+
+        self.env.run(until=until)
+
+        sent, self._sent = self._sent, list()
+        freed = dict()
+        for upstream_name, staging in self.staging.items():
+            # Pieces taken from the staging container since the last window.
+            freed[upstream_name] = self._arrived[upstream_name] - staging.level - self._freed[upstream_name]
+            self._freed[upstream_name] += freed[upstream_name]
+        return sent, freed
+
+    def _arrival(self, upstream_name):
+        # A piece of the upstream cell arrives: the credits guarantee the room in its staging container.
+        self._arrived[upstream_name] += 1
+        self.staging[upstream_name].put(1)
+
+    def _add_credits(self, credits):
+        self.credits += credits
+        if credits and self._credit_event is not None:
+            event, self._credit_event = self._credit_event, None
+            event.succeed()
+
+    def _sending(self):
+        # Moving the pieces of the cell output to the downstream cell, while it has room for them.
+        while True:
+            if self.output.level > 0 and self.credits > 0:
+                self.output.get(1)
+                self.credits -= 1
+                self.pieces_sent += 1
+                self._sent.append(self.env.now)
+            elif self._fast_forward:
+                # Nothing to send until the output gets a piece, or the downstream cell gives credits.
+                if self.credits == 0:
+                    self._credit_event = self.env.event()
+                    yield self._credit_event
+                else:
+                    yield self.output.level_change()
+                continue
+            yield self.env.timeout(1)
+
+    # RESULTS ----------------------------------------------------------------------------------------------------------
+    def close_logs(self):
+        for machine in self.machines:
+            machine.close_logs()
+
+    def kpis(self):
+        kpis = {'sim_time': self.env.now}
+        if self._downstream:
+            kpis['sent_pieces_' + self.name] = self.pieces_sent
+        else:
+            kpis['delivered_pieces_' + self.name] = self.output.products_delivered + self.output.level
+        for machine in self.machines:
+            key = machine.name.split(" ")[1]
+            kpis['parts_made_' + key] = machine.parts_made
+            kpis['breakdowns_' + key] = machine.breakdown_num
+            kpis['breakdown_time_' + key] = machine.breakdown_time
+            kpis['starving_time_' + key] = machine.starving_time
+            kpis['blocking_time_' + key] = machine.blocking_time
+        return kpis
+
+
+# SHARD CLASS ----------------------------------------------------------------------------------------------------------
+class _Shard(object):
+    # Cells run by one process. The console output and the logs are written by an AsyncLogWriter thread.
+    def __init__(self, cell_arguments, log_path):
+        self._writer = AsyncLogWriter()
+        self._console = self._writer.stream(os.path.join(log_path, 'console log.txt'))
+        try:
+            with contextlib.redirect_stdout(self._console):
+                self.cells = {arguments['name']: CellModel(**arguments) for arguments in cell_arguments}
+        except BaseException:
+            self._writer.close()
+            raise
+        # The writer only gets the writes of the shard loggers (the shards of processes=0 share the process).
+        self._writer.attach([entity for cell in self.cells.values() for entity in cell.machines + cell.containers])
+
+    def advance(self, until, arrivals, credits):
+        results = dict()
+        with contextlib.redirect_stdout(self._console):
+            for name, cell in self.cells.items():
+                results[name] = cell.advance(until, arrivals.get(name), credits.get(name, 0))
+        return results
+
+    def close(self):
+        with contextlib.redirect_stdout(self._console):
+            for cell in self.cells.values():
+                cell.close_logs()
+        self._writer.close()
+        return {name: cell.kpis() for name, cell in self.cells.items()}
+
+
+def _shard_worker(connection, cell_arguments, log_path):
+    # Process of a shard: runs the windows asked by the coordinator, until the "close" message.
+    shard = _Shard(cell_arguments, log_path)
+    connection.send('ready')
+    while True:
+        message = connection.recv()
+        if message[0] == 'advance':
+            connection.send(shard.advance(*message[1:]))
+        else:
+            connection.send(shard.close())
+            connection.close()
+            return
+
+
+# SHARDED SIMULATION CLASS ---------------------------------------------------------------------------------------------
+class ShardedSimulation(object):
+    """
+    cells: dict cell name -> list of (machine name, parameters letter), see CellModel.
+    links: list of (upstream cell name, downstream cell name). A cell sends its pieces to one downstream cell at most.
+    processes: number of shard processes (default: one per CPU, at most one per cell). With 0, the cells run in the
+    current process, with the same protocol.
+    """
+    def __init__(self, cells, links, log_path, variables=GlobalVariables, processes=None, link_delay=60, seed=0,
+                 link_capacity=None):
+        if link_delay < 1:
+            raise ValueError('The link delay is the lookahead of the protocol: it must be at least 1 step.')
+        self._links = dict()
+        upstream = {name: list() for name in cells}
+        for source, destination in links:
+            if source in self._links:
+                raise ValueError('Cell "{0}" already sends its pieces to "{1}".'.format(source, self._links[source]))
+            self._links[source] = destination
+            upstream[destination].append(source)
+
+        self._log_path = log_path
+        self._link_delay = link_delay
+        self.now = 0
+        self.windows = 0
+
+        cell_arguments = list()
+        for i, (name, machines) in enumerate(cells.items()):
+            cell_arguments.append({'name': name, 'machines': machines, 'log_path': os.path.join(log_path, name),
+                                   'variables': variables, 'upstream': upstream[name],
+                                   'downstream': name in self._links, 'seed': seed + i,
+                                   'link_capacity': link_capacity})
+
+        # Balancing the shards by number of machines, biggest cells first.
+        if processes is None:
+            processes = os.cpu_count() or 1
+        shards = [list() for _ in range(max(min(processes, len(cell_arguments)), 1))]
+        for arguments in sorted(cell_arguments, key=lambda a: -len(a['machines'])):
+            min(shards, key=lambda s: sum(len(a['machines']) for a in s)).append(arguments)
+        self._shard_of = {arguments['name']: i for i, shard in enumerate(shards) for arguments in shard}
+
+        # Each cell starts with the credits of the staging container of its downstream cell.
+        self._credits = {name: link_capacity or variables.CONTAINER_C_FINISHED_CAPACITY for name in self._links}
+        self._arrivals = {name: dict() for name in cells}
+
+        self._local = None
+        self._connections = list()
+        self._processes = list()
+        if processes == 0:
+            self._local = [_Shard(shard, log_path) for shard in shards]
+        else:
+            for i, shard in enumerate(shards):
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_shard_worker, args=(child, shard, log_path),
+                                                  name='Shard {0}'.format(i), daemon=True)
+                process.start()
+                self._connections.append(parent)
+                self._processes.append(process)
+            for connection in self._connections:
+                connection.recv()
+
+    @property
+    def shards(self):
+        return len(self._local) if self._local is not None else len(self._processes)
+
+    def run(self, until):
+        """Run all the cells up to the step "until", one window of "link_delay" steps at a time."""
+        while self.now < until:
+            end = min(self.now + self._link_delay, until)
+            results = self._advance(end)
+
+            self._arrivals = {name: dict() for name in self._arrivals}
+            self._credits = {name: 0 for name in self._credits}
+            for name, (sent, freed) in results.items():
+                if sent:
+                    self._arrivals[self._links[name]][name] = [step + self._link_delay for step in sent]
+                for upstream_name, slots in freed.items():
+                    self._credits[upstream_name] += slots
+            self.now = end
+            self.windows += 1
+
+    def _advance(self, end):
+        arguments = list()
+        for i in range(self.shards):
+            names = [name for name, shard in self._shard_of.items() if shard == i]
+            arguments.append(({name: self._arrivals[name] for name in names if self._arrivals[name]},
+                              {name: self._credits[name] for name in names if self._credits.get(name)}))
+
+        results = dict()
+        if self._local is not None:
+            for shard, (arrivals, credits) in zip(self._local, arguments):
+                results.update(shard.advance(end, arrivals, credits))
+            return results
+
+        for connection, (arrivals, credits) in zip(self._connections, arguments):
+            connection.send(('advance', end, arrivals, credits))
+        for connection in self._connections:
+            results.update(connection.recv())
+        return results
+
+    def close(self):
+        """Write the logs, stop the shard processes and return the KPIs of the plant."""
+        cells = dict()
+        if self._local is not None:
+            for shard in self._local:
+                cells.update(shard.close())
+        else:
+            for connection in self._connections:
+                connection.send(('close',))
+            for connection in self._connections:
+                cells.update(connection.recv())
+            for process in self._processes:
+                process.join()
+
+        kpis = {'sim_time': self.now, 'windows': self.windows, 'shards': self.shards, 'delivered_pieces': 0}
+        for cell_kpis in cells.values():
+            for key, value in cell_kpis.items():
+                if key.startswith('delivered_pieces_'):
+                    kpis['delivered_pieces'] += value
+                if key != 'sim_time':
+                    kpis[key] = value
+        return kpis
+
+    @staticmethod
+    def replicated_lines(lines):
+        """Cells and links of a plant made of copies of the A/B -> C line: cells A i and B i feed the cell C i."""
+        cells = dict()
+        links = list()
+        for i in range(1, lines + 1):
+            for letter in 'ABC':
+                cells['cell {0}{1}'.format(letter, i)] = [('Machine {0}{1}'.format(letter, i), letter)]
+            links.append(('cell A{0}'.format(i), 'cell C{0}'.format(i)))
+            links.append(('cell B{0}'.format(i), 'cell C{0}'.format(i)))
+        return cells, links
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    import sys
+    import tempfile
+
+    # Plant of "lines" copies of the A/B -> C line (3 machines each), simulated in one process and sharded.
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    variables = GlobalVariables.derive(FAST_FORWARD=True)
+    cells, links = ShardedSimulation.replicated_lines(lines)
+    until = variables.WORKING_SECS * variables.WORKING_MINS * variables.WORKING_HOURS * \
+        variables.SHIFTS_IN_A_WORKING_DAY * variables.BUSINESS_DAYS
+
+    for processes in (0, None):
+        with tempfile.TemporaryDirectory() as log_dir:
+            start_time = time.time()
+            simulation = ShardedSimulation(cells, links, log_dir, variables, processes=processes)
+            simulation.run(until)
+            kpis = simulation.close()
+            print('{0} machines, {1} shards: {2} windows in {3:.2f} secs, {4} pieces delivered'.format(
+                3 * lines, kpis['shards'], kpis['windows'], time.time() - start_time, kpis['delivered_pieces']))
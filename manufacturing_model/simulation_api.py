@@ -0,0 +1,120 @@
+"""
+simulation_api.py file: simulate function
+
+The function responsibility is to run the model from a program, e.g. an optimizer evaluating thousands of parameter
+sets in the same process, without the side effects of the running_model.py entry point:
+    - no filesystem work: without "log_path", no log folder nor file is created, the machines keep their CSV logs in
+      memory and nothing is printed. With a "log_path", the usual log files are written into it;
+    - no global state: the parameters are a dict of overrides of GlobalVariables (GlobalVariables.derive, the class is
+      not modified), and the machines draw from their own RandomStreams of the seed instead of the global random
+      generator;
+    - in memory results: the KPIs, the online statistics, the machine logs and the merged dataset (same rows and columns
+      of merged_logs.csv) are returned as Python objects and dataframes. pandas is only imported for the dataframes.
+
+Usage:
+    from simulation_api import simulate
+    result = simulate({'MTTF_A': 50000, 'WORKING_WEEKS': 4, 'FAST_FORWARD': True}, seed=3, outputs=('kpis', 'dataset'))
+    result['kpis']['parts_made_C'], result['dataset']
+"""
+
+import io
+import os
+import time
+import simpy
+from production_line import ProductionLine
+from random_streams import RandomStreams
+from warmup_detector import WarmupDetector
+from log_segmenter import LogSegmenter
+from global_variables import GlobalVariables
+
+# Outputs of simulate.
+OUTPUTS = ('kpis', 'statistics', 'machine_logs', 'dataset')
+
+
+def simulate(config=None, seed=0, outputs=('kpis',), log_path=None, streams=None, until=None):
+    """
+    Run the model once and return a dict with the requested outputs:
+        - "kpis": dict of ProductionLine.kpis (after the warm-up end, with WARMUP_DETECTION);
+        - "statistics": dict of RunningStatistics, see ProductionLine.statistics;
+        - "machine_logs": dict machine name -> dataframe of its log merged with its expected product flag;
+        - "dataset": merged dataframe of all the machines, as merged_logs.csv (from the warm-up end, if detected).
+
+    config: dict of GlobalVariables overrides (e.g. {"MTTR_C": 1920}), or a GlobalVariables class.
+    streams: RandomStreams or Trace of the draws (default: RandomStreams(seed)).
+    until: last step (default: SIM_TIME of the variables).
+    """
+    unknown = set(outputs) - set(OUTPUTS)
+    if unknown:
+        raise ValueError('Unknown outputs {0}, the outputs are {1}.'.format(sorted(unknown), OUTPUTS))
+    variables = config if isinstance(config, type) else GlobalVariables.derive(**(config or dict()))
+    if log_path is not None:
+        os.makedirs(log_path, exist_ok=True)
+
+    env = simpy.Environment()
+    # Segmented log files, if enabled (LOG_SEGMENT_DAYS, LOG_SEGMENT_MB) and written.
+    segmenter = LogSegmenter.from_variables(env, variables) if log_path is not None else None
+    if segmenter is not None:
+        segmenter.install()
+    try:
+        line = ProductionLine(env, log_path, variables, seed=seed,
+                              streams=streams if streams is not None else RandomStreams(seed))
+        detector = WarmupDetector(line, log_path) if variables.WARMUP_DETECTION else None
+        env.run(until=int(until or variables.SIM_TIME))
+        line.close_logs()
+    finally:
+        if segmenter is not None:
+            segmenter.close()
+
+    result = dict()
+    if 'kpis' in outputs:
+        result['kpis'] = line.kpis() if detector is None else detector.steady_state_kpis()
+    if 'statistics' in outputs:
+        result['statistics'] = line.statistics()
+    if 'machine_logs' in outputs or 'dataset' in outputs:
+        machine_logs = _machine_logs(line, log_path)
+        if 'machine_logs' in outputs:
+            result['machine_logs'] = machine_logs
+        if 'dataset' in outputs:
+            result['dataset'] = _dataset(machine_logs, None if detector is None else detector.warmup_end)
+    return result
+
+
+def _machine_logs(line, log_path):
+    # Logs of each machine merged with its expected product flag, from the memory or from the log files.
+    from merge_logs import MergeLogs
+    machine_logs = dict()
+    for machine in line.machines:
+        if log_path is None:
+            sources = [io.StringIO(machine.csv_logger.csv_text()),
+                       io.StringIO(machine.expected_products_logger.csv_text())]
+        else:
+            folder = os.path.join(log_path, 'Machine_' + machine.name.split(' ')[1])
+            sources = [os.path.join(folder, machine.name + ' log.csv'),
+                       os.path.join(folder, machine.name + ' exp_prod_flag.csv')]
+        machine_logs[machine.name] = MergeLogs.merge_frames([MergeLogs.read_log(source) for source in sources])
+    return machine_logs
+
+
+def _dataset(machine_logs, start_step=None):
+    # Merged dataset of the machines, from the warm-up end if given.
+    from merge_logs import MergeLogs
+    dataset = MergeLogs.merge_frames(list(machine_logs.values()))
+    if start_step is not None:
+        dataset = dataset[dataset['step'] >= start_step].reset_index(drop=True)
+    return dataset
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    # An optimizer-like loop: the mean time to repair of A against the assembled parts, 4 weeks, 5 seeds per value.
+    start_time = time.time()
+    evaluations = 0
+    for mttr in (3600, 7200, 10800, 14400):
+        config = {'MTTR_A': mttr, 'WORKING_WEEKS': 4, 'FAST_FORWARD': True}
+        parts = [simulate(config, seed)['kpis']['parts_made_C'] for seed in range(1, 6)]
+        evaluations += len(parts)
+        print('MTTR A {0}: {1:.1f} parts made by C on average'.format(mttr, sum(parts) / len(parts)))
+    print('{0} evaluations in {1:.2f} secs, no file written'.format(evaluations, time.time() - start_time))
+
+    result = simulate({'WORKING_WEEKS': 2}, seed=1, outputs=('kpis', 'dataset'))
+    print('dataset of {0} rows and {1} columns'.format(*result['dataset'].shape))
@@ -0,0 +1,81 @@
+"""
+state_history.py file: StateHistory class
+
+The class responsibility is to keep the recent state records of a model entity (machine or container) in memory, for
+the live queries of a digital twin, without reading the log files.
+
+The records are stored into a fixed-size NumPy structured array used as a ring buffer: the memory is constant however
+long the run is, the oldest records are overwritten. The records must be appended in non decreasing step order (as the
+model logs are), so the time-range queries are binary searches.
+"""
+
+import numpy
+
+
+class StateHistory(object):
+    def __init__(self, capacity, fields):
+        """
+        capacity: number of records kept.
+        fields: list of (name, NumPy dtype) of the record values, after the step.
+        """
+        self._capacity = max(int(capacity), 1)
+        self._data = numpy.zeros(self._capacity, dtype=[('step', numpy.int64)] + list(fields))
+        self._appended = 0
+
+    def append(self, record):
+        """Append a record: tuple (step, values...)."""
+        self._data[self._appended % self._capacity] = record
+        self._appended += 1
+
+    def __len__(self):
+        return min(self._appended, self._capacity)
+
+    @property
+    def dropped(self):
+        """Number of records overwritten."""
+        return max(self._appended - self._capacity, 0)
+
+    # QUERIES ----------------------------------------------------------------------------------------------------------
+    def last(self, n=1):
+        """The last n records, oldest first."""
+        n = min(n, len(self))
+        return self._logical(len(self) - n, len(self))
+
+    def between(self, t1, t2):
+        """The records with t1 <= step <= t2, oldest first. Only the records still in the buffer are returned."""
+        return self._logical(self._search(t1, 'left'), self._search(t2, 'right'))
+
+    def at(self, t):
+        """The last record with step <= t (the state at the step t), None if not in the buffer."""
+        i = self._search(t, 'right')
+        if i == 0:
+            return None
+        return self._logical(i - 1, i)[0]
+
+    def records(self):
+        """All the records in the buffer, oldest first."""
+        return self._logical(0, len(self))
+
+    # INTERNAL FUNCTIONS -----------------------------------------------------------------------------------------------
+    def _segments(self):
+        # The buffer in chronological order is data[head:] followed by data[:head].
+        if self._appended <= self._capacity:
+            return self._data[:self._appended], self._data[:0]
+        head = self._appended % self._capacity
+        return self._data[head:], self._data[:head]
+
+    def _search(self, t, side):
+        # Logical index of t in the chronological order.
+        older, newer = self._segments()
+        if older.size and (t <= older['step'][-1] if side == 'left' else t < older['step'][-1]):
+            return int(numpy.searchsorted(older['step'], t, side))
+        return older.size + int(numpy.searchsorted(newer['step'], t, side))
+
+    def _logical(self, start, stop):
+        # Copy of the records between the logical indexes start and stop.
+        older, newer = self._segments()
+        if stop <= older.size:
+            return older[start:stop].copy()
+        if start >= older.size:
+            return newer[start - older.size:stop - older.size].copy()
+        return numpy.concatenate([older[start:], newer[:stop - older.size]])
@@ -0,0 +1,157 @@
+"""
+surrogate_model.py file: SurrogateModel class
+
+Fast surrogate of the A/B -> C production line. It answers throughput what-if questions (MTTF, MTTR, buffer sizes,
+processing times) in milliseconds, instead of a full SimPy run.
+
+The surrogate is built in two steps:
+    1. each machine is described analytically: a part keeps the machine busy (exposed to failures) for the handling-in,
+       processing and handling-out time, then the machine waits 1 time step before the next cycle. Failures arrive with
+       rate 1/MTTF while the machine is busy and stop it for MTTR on average;
+    2. the line is approximated as a two-stage line with a finite buffer, solved as a continuous-time Markov chain:
+        - the upstream stage U merges the machines A and B (assembly needs both parts): it is the machine with the lower
+          isolated throughput, the failures of the other one are absorbed by its finished container;
+        - the buffer is the finished container of A/B (the smaller) plus the raw container of C;
+        - the downstream stage is the machine C, that is never blocked (its finished container is dispatched).
+       The state is (buffer level, U up/down, C up/down); the chain is a finite quasi-birth-death process, solved by
+       linear level reduction in O(levels) time. Large buffers are aggregated in units of several parts.
+
+The raw containers of A and B are refilled by the supplier, so A and B are never starved.
+Processing times are modelled as exponential in the Markov chain: the approximation is good when the buffers are large
+with respect to the processing time variability, which is the case of the standard settings. Use the ValidationHarness
+to check the accuracy over a parameter grid.
+"""
+
+import math
+import numpy
+from global_variables import GlobalVariables
+
+
+# SURROGATE MODEL CLASS ------------------------------------------------------------------------------------------------
+class SurrogateModel(object):
+    def __init__(self, variables=GlobalVariables, max_levels=200):
+        self._variables = variables
+        self._max_levels = max_levels
+
+    def machine_parameters(self, key):
+        """Analytic description of the machine "key" ("A", "B" or "C")."""
+        variables = self._variables
+        # int() truncation of the normal and exponential draws lowers the means by half a time step.
+        process_time = getattr(variables, 'MEAN_PROCESS_TIME_' + key) - 0.5
+        busy_time = process_time + variables.GET_STD_DELAY + variables.PUT_STD_DELAY
+        cycle_time = busy_time + 1
+        mttf = getattr(variables, 'MTTF_' + key)
+        mttr = max(getattr(variables, 'MTTR_' + key) - 0.5, 0)
+
+        # Isolated machine: time per part including the expected repairs.
+        time_per_part = cycle_time + busy_time / mttf * mttr
+        return {'busy_time': busy_time, 'cycle_time': cycle_time, 'MTTF': mttf, 'MTTR': mttr,
+                'isolated_rate': 1 / time_per_part,
+                # Failure rate per unit of time while the machine is up and not waiting on the buffers.
+                'failure_rate': busy_time / cycle_time / mttf}
+
+    def evaluate(self, horizon=None):
+        """KPIs of the line over the horizon (default: SIM_TIME), with the same keys of ProductionLine.kpis()."""
+        variables = self._variables
+        horizon = horizon if horizon is not None else variables.SIM_TIME
+        machine = {key: self.machine_parameters(key) for key in ('A', 'B', 'C')}
+
+        # Upstream merged stage: the assembly pace is set by the slower of A and B, the other one is decoupled by its
+        # finished container.
+        u = min(machine['A'], machine['B'], key=lambda m: m['isolated_rate'])
+        failure_u, mttr_u, speed_u = u['failure_rate'], u['MTTR'], 1 / u['cycle_time']
+
+        # Buffer between the stages, aggregated in units of "unit" parts.
+        buffer_size = min(variables.CONTAINER_A_FINISHED_CAPACITY, variables.CONTAINER_B_FINISHED_CAPACITY) + \
+            variables.CONTAINER_C_FINISHED_CAPACITY
+        unit = max(1, int(math.ceil(buffer_size / self._max_levels)))
+        levels = buffer_size // unit
+
+        c = machine['C']
+        probabilities = self._solve(levels, speed_u / unit, failure_u, 1 / mttr_u if mttr_u else math.inf,
+                                    1 / c['cycle_time'] / unit, c['failure_rate'],
+                                    1 / c['MTTR'] if c['MTTR'] else math.inf)
+
+        # Phases: 0 = U up C up, 1 = U up C down, 2 = U down C up, 3 = U down C down.
+        p_c_working = probabilities[1:, [0, 2]].sum()
+        p_starving = probabilities[0, [0, 2]].sum()
+        p_blocking = probabilities[levels, [0, 1]].sum()
+        throughput = p_c_working / c['cycle_time']
+
+        kpis = {'sim_time': horizon, 'throughput': throughput,
+                'parts_made_C': throughput * horizon,
+                'delivered_pieces': throughput * horizon,
+                'starving_time_C': p_starving * horizon,
+                'blocking_time_C': 0}
+        exposure_c = p_c_working * horizon * c['busy_time'] / c['cycle_time']
+        kpis['breakdowns_C'] = exposure_c / c['MTTF']
+        kpis['breakdown_time_C'] = kpis['breakdowns_C'] * c['MTTR']
+        kpis['availability_C'] = 1 - kpis['breakdown_time_C'] / horizon
+
+        for key in ('A', 'B'):
+            m = machine[key]
+            capacity = getattr(variables, 'CONTAINER_' + key + '_FINISHED_CAPACITY')
+            if m['isolated_rate'] > throughput:
+                # The faster machine fills its finished container, then it is blocked by the assembly.
+                fill_time = min(horizon, capacity / (m['isolated_rate'] - throughput))
+                parts = m['isolated_rate'] * fill_time + throughput * (horizon - fill_time)
+                blocking = (horizon - fill_time) * (1 - throughput / m['isolated_rate'])
+            else:
+                parts = m['isolated_rate'] * horizon
+                blocking = p_blocking * horizon
+            kpis['parts_made_' + key] = parts
+            kpis['starving_time_' + key] = 0
+            kpis['blocking_time_' + key] = blocking
+            kpis['breakdowns_' + key] = parts * m['busy_time'] / m['MTTF']
+            kpis['breakdown_time_' + key] = kpis['breakdowns_' + key] * m['MTTR']
+            kpis['availability_' + key] = 1 - kpis['breakdown_time_' + key] / horizon
+
+        return kpis
+
+    @staticmethod
+    def _solve(levels, speed_u, failure_u, repair_u, speed_c, failure_c, repair_c):
+        """Stationary distribution of the two-stage line, as an array (levels + 1, 4 phases)."""
+        u_up = numpy.array([1, 1, 0, 0], dtype=bool)
+        c_up = numpy.array([1, 0, 1, 0], dtype=bool)
+        repair_u = min(repair_u, 1e9)
+        repair_c = min(repair_c, 1e9)
+
+        def blocks(n):
+            # Generator blocks of the level n: up (n -> n + 1), local, down (n -> n - 1).
+            up = numpy.diag(numpy.where(u_up & (n < levels), speed_u, 0.0))
+            down = numpy.diag(numpy.where(c_up & (n > 0), speed_c, 0.0))
+            local = numpy.zeros((4, 4))
+            for phase in range(4):
+                # U fails only while working (not blocked), C only while working (not starved).
+                if u_up[phase] and n < levels:
+                    local[phase, phase + 2] += failure_u
+                if not u_up[phase]:
+                    local[phase, phase - 2] += repair_u
+                if c_up[phase] and n > 0:
+                    local[phase, phase + 1] += failure_c
+                if not c_up[phase]:
+                    local[phase, phase - 1] += repair_c
+            numpy.fill_diagonal(local, - (local.sum(axis=1) + up.sum(axis=1) + down.sum(axis=1)))
+            return up, local, down
+
+        # Linear level reduction: pi(n) = pi(n - 1) R(n), from the top level down to the level 1.
+        r_matrices = [None] * (levels + 1)
+        correction = numpy.zeros((4, 4))
+        for n in range(levels, 0, -1):
+            local = blocks(n)[1]
+            up_previous = blocks(n - 1)[0]
+            r_matrices[n] = - up_previous @ numpy.linalg.inv(local + correction)
+            correction = r_matrices[n] @ blocks(n)[2]
+
+        # Level 0: pi(0) (local(0) + R(1) down(1)) = 0, normalised afterwards.
+        matrix = (blocks(0)[1] + correction).T
+        matrix[-1, :] = 1
+        rhs = numpy.zeros(4)
+        rhs[-1] = 1
+        probabilities = numpy.zeros((levels + 1, 4))
+        probabilities[0] = numpy.linalg.solve(matrix, rhs)
+        for n in range(1, levels + 1):
+            probabilities[n] = probabilities[n - 1] @ r_matrices[n]
+
+        probabilities = numpy.clip(probabilities, 0, None)
+        return probabilities / probabilities.sum()
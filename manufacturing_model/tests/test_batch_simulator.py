@@ -0,0 +1,26 @@
+"""
+test_batch_simulator.py file: tests of the statistical equivalence of the BatchSimulator and the SimPy model
+"""
+
+from batch_simulator import BatchSimulator
+from validation_harness import ValidationHarness
+from global_variables import GlobalVariables
+
+
+def test_kpis_equivalent_to_the_simpy_model():
+    # Short horizon and few runs: the SimPy runs and the lockstep steps are the slow part of the check.
+    harness = ValidationHarness(GlobalVariables.derive(SIM_TIME=14400, FAST_FORWARD=True))
+    rows = harness.validate_batch(simpy_runs=30, replications=300, z_threshold=3.0)
+    assert [row['kpi'] for row in rows] == ValidationHarness.KPIS
+    for row in rows:
+        assert row['equivalent'], row
+
+
+def test_recorded_series_of_a_replication():
+    simulator = BatchSimulator(4, GlobalVariables.derive(SIM_TIME=2000), seed=0, record=2)
+    kpis = simulator.run()
+    series = simulator.series(1)
+    assert list(series.index) == list(range(2000))
+    assert series['produced Machine C'].iloc[-1] == kpis['parts_made_C'][1]
+    summary = BatchSimulator.summary(kpis)
+    assert summary.loc['parts_made_C', 'mean'] == kpis['parts_made_C'].mean()
@@ -0,0 +1,42 @@
+"""
+test_fast_forward.py file: tests of the fast-forward mode against the step by step mode, on the same inputs (Trace)
+"""
+
+import numpy
+import simpy
+from input_trace import TraceRecorder
+from production_line import ProductionLine
+from random_streams import RandomStreams
+from simulation_api import simulate
+from global_variables import GlobalVariables
+
+STEPS = 12000
+
+
+def _replays(seed):
+    # Draws of a run, replayed by both modes.
+    env = simpy.Environment()
+    line = ProductionLine(env, None, GlobalVariables.derive(FAST_FORWARD=True), streams=RandomStreams(seed))
+    recorder = TraceRecorder(line)
+    env.run(until=STEPS)
+    return [simulate({'FAST_FORWARD': fast_forward}, streams=recorder.trace(), outputs=('kpis', 'dataset'),
+                     until=STEPS) for fast_forward in (True, False)]
+
+
+def test_same_kpis_on_the_same_trace():
+    for seed in (0, 3):
+        fast_forward, step_by_step = _replays(seed)
+        # Including the starving and blocking times of the waits still in progress at the end.
+        assert fast_forward['kpis'] == step_by_step['kpis']
+
+
+def test_merged_logs_differ_by_the_wake_up_steps_only():
+    fast_forward, step_by_step = [result['dataset'] for result in _replays(0)]
+    assert list(fast_forward.columns) == list(step_by_step.columns)
+    steps = [numpy.floor(dataset['step']) for dataset in (fast_forward, step_by_step)]
+    assert set(steps[0]) == set(steps[1]) == set(range(STEPS))
+    # A process noticing a buffer change one step apart shifts a part by one step at most.
+    for machine in ('A', 'B', 'C'):
+        produced = [dataset.groupby(step)['produced Machine ' + machine].last()
+                    for dataset, step in zip((fast_forward, step_by_step), steps)]
+        assert (produced[0] - produced[1]).abs().max() <= 1
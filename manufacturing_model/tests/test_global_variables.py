@@ -0,0 +1,20 @@
+"""
+test_global_variables.py file: tests of the derived copies of the global variables
+"""
+
+from global_variables import GlobalVariables
+
+
+def test_derive_recomputes_the_sim_time():
+    variables = GlobalVariables.derive(WORKING_WEEKS=2).derive(MTTF_A=5)
+    assert variables.SIM_TIME == GlobalVariables.SIM_TIME // GlobalVariables.WORKING_WEEKS * 2
+    assert variables.MTTF_A == 5 and GlobalVariables.MTTF_A != 5
+
+
+def test_derive_keeps_an_overridden_sim_time():
+    variables = GlobalVariables.derive(SIM_TIME=1000)
+    assert variables.derive(MTTF_A=5).SIM_TIME == 1000
+    assert variables.derive(WORKING_WEEKS=2).derive(FAST_FORWARD=True).SIM_TIME == 1000
+    assert variables.derive(SIM_TIME=2000).SIM_TIME == 2000
+    # The copies of the original variables still recompute it.
+    assert GlobalVariables.derive(MTTF_A=5).SIM_TIME == GlobalVariables.SIM_TIME
@@ -0,0 +1,76 @@
+"""
+test_importance_sampling.py file: tests of the likelihood ratio weights of the importance sampled breakdowns
+"""
+
+import math
+import numpy
+import pytest
+import simpy
+from production_line import ProductionLine
+from random_streams import RandomStreams
+from simulation_api import simulate
+from global_variables import GlobalVariables
+
+FACTORS = {'IMPORTANCE_FAILURE_FACTOR': 3, 'IMPORTANCE_REPAIR_FACTOR': 2}
+
+
+class _DrawRecorder(object):
+    """RandomStreams that keeps the step and the exact value of each time to failure and repair time drawn."""
+    FAILURES = RandomStreams.FAILURES
+    REPAIRS = RandomStreams.REPAIRS
+    PROCESS_TIMES = RandomStreams.PROCESS_TIMES
+
+    def __init__(self, env, seed):
+        self._env = env
+        self._streams = RandomStreams(seed)
+        self.draws = dict()
+
+    def stream(self, entity, purpose):
+        stream = self._streams.stream(entity, purpose)
+        draws = self.draws.setdefault((entity, purpose), list())
+        exponential = stream.exponential
+
+        def recorded(rate):
+            value = exponential(rate)
+            draws.append((self._env.now, value))
+            return value
+        stream.exponential = recorded
+        return stream
+
+
+def test_weight_is_the_density_ratio_of_the_draws():
+    variables = GlobalVariables.derive(WORKING_WEEKS=2, FAST_FORWARD=True, **FACTORS)
+    env = simpy.Environment()
+    streams = _DrawRecorder(env, 5)
+    line = ProductionLine(env, None, variables, streams=streams)
+    env.run(until=int(variables.SIM_TIME))
+
+    log_weight = 0.0
+    for machine in line.machines:
+        failure_rate = 1 / getattr(variables, 'MTTF_' + machine.name[-1])
+        repair_rate = 1 / getattr(variables, 'MTTR_' + machine.name[-1])
+        biased_failure_rate = failure_rate * FACTORS['IMPORTANCE_FAILURE_FACTOR']
+        biased_repair_rate = repair_rate / FACTORS['IMPORTANCE_REPAIR_FACTOR']
+        failures = streams.draws[(machine.name, RandomStreams.FAILURES)]
+        assert failures
+        # Elapsed times to failure and repair times: density ratios; time to failure in progress: survival ratio.
+        for _, value in failures[:-1]:
+            log_weight += math.log(failure_rate / biased_failure_rate) - (failure_rate - biased_failure_rate) * value
+        log_weight -= (failure_rate - biased_failure_rate) * (env.now - failures[-1][0])
+        for _, value in streams.draws.get((machine.name, RandomStreams.REPAIRS), []):
+            log_weight += math.log(repair_rate / biased_repair_rate) - (repair_rate - biased_repair_rate) * value
+    assert line.kpis()['weight'] == pytest.approx(math.exp(log_weight), rel=1e-9)
+
+
+def test_weights_have_unit_mean():
+    # The mean of the weights over the replications estimates 1; the weights correct the oversampled breakdowns.
+    config = dict(WORKING_WEEKS=1, FAST_FORWARD=True, **FACTORS)
+    kpis = [simulate(config, streams=RandomStreams(seed))['kpis'] for seed in range(60)]
+    weights = numpy.array([run['weight'] for run in kpis])
+    assert abs(weights.mean() - 1) < 4 * weights.std() / math.sqrt(len(weights))
+    assert numpy.mean([run['breakdowns_C'] for run in kpis]) > numpy.mean(
+        [run['breakdowns_C'] * weight for run, weight in zip(kpis, weights)])
+
+
+def test_no_weight_without_importance_sampling():
+    assert 'weight' not in simulate({'WORKING_WEEKS': 1, 'FAST_FORWARD': True}, until=1000)['kpis']
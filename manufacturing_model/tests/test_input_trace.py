@@ -0,0 +1,45 @@
+"""
+test_input_trace.py file: tests of the replay of a recorded run (Trace, TraceRecorder)
+"""
+
+import filecmp
+import os
+import simpy
+from input_trace import TraceRecorder
+from merge_logs import MergeLogs
+from production_line import ProductionLine
+from random_streams import RandomStreams
+from simulation_api import simulate
+from global_variables import GlobalVariables
+
+STEPS = 6000
+MACHINES = ['Machine_A', 'Machine_B', 'Machine_C']
+
+
+def _merged_logs(log_path):
+    merged_path = os.path.join(log_path, 'merged_logs')
+    os.mkdir(merged_path)
+    MergeLogs.merge_all(log_path, merged_path, MACHINES, processes=1)
+    return os.path.join(merged_path, 'merged_logs.csv')
+
+
+def _record_and_replay(tmp_path, config):
+    recorded_path, replayed_path = str(tmp_path / 'recorded'), str(tmp_path / 'replayed')
+    os.mkdir(recorded_path)
+    env = simpy.Environment()
+    line = ProductionLine(env, recorded_path, GlobalVariables.derive(**config), streams=RandomStreams(2))
+    recorder = TraceRecorder(line)
+    env.run(until=STEPS)
+    line.close_logs()
+    simulate(config, streams=recorder.trace(), log_path=replayed_path, until=STEPS)
+    return _merged_logs(recorded_path), _merged_logs(replayed_path)
+
+
+def test_step_by_step_replay_gives_the_recorded_merged_logs(tmp_path):
+    recorded, replayed = _record_and_replay(tmp_path, {'LAZY_TEXT_LOGS': True})
+    assert filecmp.cmp(recorded, replayed, shallow=False)
+
+
+def test_fast_forward_replay_gives_the_recorded_merged_logs(tmp_path):
+    recorded, replayed = _record_and_replay(tmp_path, {'LAZY_TEXT_LOGS': True, 'FAST_FORWARD': True})
+    assert filecmp.cmp(recorded, replayed, shallow=False)
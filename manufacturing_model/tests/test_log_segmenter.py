@@ -0,0 +1,92 @@
+"""
+test_log_segmenter.py file: tests of the segmented logs and of their manifests against the logs of an unsegmented run
+"""
+
+import csv
+import filecmp
+import os
+from log_segmenter import LogSegmenter
+from merge_logs import MergeLogs
+from simulation_api import simulate
+from global_variables import GlobalVariables
+
+STEPS = 9000
+MACHINES = ['Machine_A', 'Machine_B', 'Machine_C']
+
+
+def _run(log_path, config):
+    simulate(dict(config, LAZY_TEXT_LOGS=True), seed=3, log_path=log_path, until=STEPS)
+    merged_path = os.path.join(log_path, 'merged_logs')
+    os.mkdir(merged_path)
+    MergeLogs.merge_all(log_path, merged_path, MACHINES, processes=1)
+    return os.path.join(merged_path, 'merged_logs.csv')
+
+
+def _segmented_runs(tmp_path, fast_forward):
+    # Segments of a tenth of a working day (2880 steps) and of 40 kB at most.
+    config = {'FAST_FORWARD': fast_forward}
+    whole, segmented = str(tmp_path / 'whole'), str(tmp_path / 'segmented')
+    merged = [_run(whole, config), _run(segmented, dict(config, LOG_SEGMENT_DAYS=0.1, LOG_SEGMENT_MB=0.04))]
+    return whole, segmented, merged
+
+
+def _steps(head, line):
+    # Time step of a CSV row ("step.moment" or step), and the last one of a fast-forward interval ("until").
+    values = dict(zip(head.strip().split(','), line.strip().split(',')))
+    step = int(float(values['step']))
+    return step, int(float(values['until'])) if values.get('until') else step
+
+
+def test_segments_have_the_rows_of_the_unsegmented_logs(tmp_path):
+    for fast_forward in (False, True):
+        whole, segmented, merged = _segmented_runs(tmp_path / str(fast_forward), fast_forward)
+        assert filecmp.cmp(*merged, shallow=False)
+
+        for machine in MACHINES:
+            for name in os.listdir(os.path.join(whole, machine)):
+                with open(os.path.join(whole, machine, name)) as f:
+                    lines = f.readlines()
+                segment_paths = LogSegmenter.segment_paths(os.path.join(segmented, machine, name))
+                manifest = [segment for segment in LogSegmenter.manifest(os.path.join(segmented, machine))
+                            if segment['file'] == name]
+                assert [os.path.basename(path) for path in segment_paths] == \
+                    [segment['segment_file'] for segment in manifest]
+                if not name.endswith('.csv'):
+                    assert ''.join(open(path).read() for path in segment_paths) == ''.join(lines)
+                    continue
+
+                # Each CSV segment is the header and the next rows, with their step range in the manifest.
+                rows = list()
+                for path, segment in zip(segment_paths, manifest):
+                    with open(path) as f:
+                        segment_lines = f.readlines()
+                    assert segment_lines[0] == lines[0]
+                    assert segment['bytes'] == os.path.getsize(path)
+                    if len(segment_lines) > 1:
+                        steps = [_steps(lines[0], line) for line in segment_lines[1:]]
+                        assert segment['first_step'] == steps[0][0]
+                        assert segment['last_step'] == max(step[1] for step in steps)
+                    rows.extend(segment_lines[1:])
+                assert rows == lines[1:]
+                # The fast-forward intervals can last longer than a segment period.
+                assert len(manifest) > 1 or fast_forward
+
+
+def test_segment_paths_of_a_time_range(tmp_path):
+    whole, segmented, _ = _segmented_runs(tmp_path, False)
+    path = os.path.join(segmented, 'Machine_A', 'Machine A log.csv')
+    manifest = [segment for segment in LogSegmenter.manifest(os.path.dirname(path))
+                if segment['file'] == 'Machine A log.csv']
+    for start, end in [(0, 10), (3000, 3100), (2000, 6000), (STEPS, STEPS + 100)]:
+        expected = [segment['segment_file'] for segment in manifest
+                    if segment['last_step'] >= start and segment['first_step'] <= end]
+        assert [os.path.basename(name) for name in LogSegmenter.segment_paths(path, start, end)] == expected
+        # The rows of the range are all in these segments.
+        with open(os.path.join(whole, 'Machine_A', 'Machine A log.csv'), newline='') as f:
+            in_range = sum(1 for row in csv.DictReader(f) if start <= float(row['step']) <= end)
+        in_segments = 0
+        for name in expected:
+            with open(os.path.join(os.path.dirname(path), name), newline='') as f:
+                in_segments += sum(1 for row in csv.DictReader(f) if start <= float(row['step']) <= end)
+        assert in_segments == in_range
+    assert GlobalVariables.LOG_MANIFEST_FILENAME in os.listdir(os.path.dirname(path))
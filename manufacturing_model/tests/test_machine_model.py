@@ -0,0 +1,52 @@
+"""
+test_machine_model.py file: tests of the breakdowns reported by the real machine (Machine.breakdown)
+"""
+
+import simpy
+from production_line import ProductionLine
+from global_variables import GlobalVariables
+
+
+def _line():
+    # Line without log files nor random breakdowns, as in the StreamingTwin.
+    env = simpy.Environment()
+    return ProductionLine(env, None, GlobalVariables.derive(WORKING_WEEKS=1), random_breakdowns=False)
+
+
+def test_second_breakdown_in_the_same_step_is_ignored():
+    line = _line()
+    line.env.run(until=100)
+    machine = line.machine_A
+    assert machine.breakdown(300)
+    assert not machine.breakdown(300)
+    assert not machine.complete_part()
+    # The only interruption sent is processed: no unhandled simpy.Interrupt.
+    line.env.run(until=1000)
+    assert machine.breakdown_num == 1
+    assert machine.breakdown_time == 300
+
+
+def test_breakdown_while_waiting_for_the_buffers_is_ignored():
+    line = _line()
+    line.env.run(until=100)
+    # The raw container C is empty at the start: the machine C is starving.
+    machine = line.machine_C
+    assert line.input_C.level == 0
+    assert not machine.breakdown(300)
+    line.env.run(until=101)
+    assert not machine._broken
+    assert machine.breakdown_num == 0
+
+
+def test_breakdown_after_repair():
+    line = _line()
+    line.env.run(until=100)
+    machine = line.machine_A
+    assert machine.breakdown()
+    line.env.run(until=200)
+    assert not machine.breakdown()
+    assert machine.repair()
+    line.env.run(until=201)
+    assert machine.breakdown(50)
+    line.env.run(until=1000)
+    assert machine.breakdown_num == 2
@@ -0,0 +1,55 @@
+"""
+test_merge_logs.py file: tests of the streamed merge (MergeLogs.stream_merge) against the pandas outer join, and of the
+time-range reads of LogQuery
+"""
+
+import filecmp
+import os
+import pandas
+from log_query import LogQuery
+from merge_logs import MergeLogs
+from simulation_api import simulate
+
+STEPS = 6000
+MACHINES = ['Machine_A', 'Machine_B', 'Machine_C']
+
+
+def _merged_path(tmp_path):
+    # Logs of a short run, merged per machine and streamed into merged_logs.csv.
+    log_path = str(tmp_path / 'logs')
+    simulate({'LAZY_TEXT_LOGS': True}, log_path=log_path, until=STEPS)
+    merged_path = os.path.join(log_path, 'merged_logs')
+    os.mkdir(merged_path)
+    MergeLogs.merge_all(log_path, merged_path, MACHINES, processes=1)
+    return merged_path
+
+
+def test_stream_merge_gives_the_pandas_merge(tmp_path):
+    merged_path = _merged_path(tmp_path)
+    MergeLogs.merge_logs(merged_path, merged_path, 'pandas_logs.csv', *[name + '.csv' for name in MACHINES])
+    for suffix in ('', MergeLogs.INDEX_SUFFIX):
+        assert filecmp.cmp(os.path.join(merged_path, 'merged_logs.csv' + suffix),
+                           os.path.join(merged_path, 'pandas_logs.csv' + suffix), shallow=False)
+
+    # From a start step, the rows before it still fill the values of the following ones.
+    file_paths = [os.path.join(merged_path, name + '.csv') for name in MACHINES]
+    MergeLogs.stream_merge(file_paths, os.path.join(merged_path, 'late_logs.csv'), start_step=1000)
+    merged = pandas.read_csv(os.path.join(merged_path, 'merged_logs.csv'))
+    late = pandas.read_csv(os.path.join(merged_path, 'late_logs.csv'))
+    pandas.testing.assert_frame_equal(late, merged[merged['step'] >= 1000].reset_index(drop=True))
+
+
+def test_window_reads_the_rows_of_the_time_range(tmp_path):
+    file_path = os.path.join(_merged_path(tmp_path), 'merged_logs.csv')
+    merged = pandas.read_csv(file_path)
+    index = open(file_path + MergeLogs.INDEX_SUFFIX).read()
+    # The index built from the file is the one written by the merge.
+    os.remove(file_path + MergeLogs.INDEX_SUFFIX)
+    query = LogQuery(file_path)
+    assert open(file_path + MergeLogs.INDEX_SUFFIX).read() == index
+
+    columns = ['step', 'Machine C flag']
+    for start, end in [(0, 0), (0, 100), (1234, 4321), (4095, 4097), (5990, STEPS + 10), (STEPS + 1, STEPS + 5)]:
+        expected = merged[(merged['step'] >= start) & (merged['step'] < end + 1)].reset_index(drop=True)
+        pandas.testing.assert_frame_equal(query.window(start, end), expected, check_dtype=False)
+        pandas.testing.assert_frame_equal(query.window(start, end, columns), expected[columns], check_dtype=False)
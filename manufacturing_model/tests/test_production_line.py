@@ -0,0 +1,25 @@
+"""
+test_production_line.py file: tests of the line parameters overridden with GlobalVariables.derive
+"""
+
+from validation_harness import ValidationHarness
+from global_variables import GlobalVariables
+
+
+def test_derived_handling_delays_reach_the_machines():
+    # Longer handling delays of the derived variables lengthen the cycle of every machine, so fewer parts are made.
+    variables = GlobalVariables.derive(WORKING_WEEKS=1, FAST_FORWARD=True)
+    slow_variables = variables.derive(GET_STD_DELAY=120, PUT_STD_DELAY=120)
+    kpis = ValidationHarness.run_simpy(variables, seed=1)
+    slow_kpis = ValidationHarness.run_simpy(slow_variables, seed=1)
+    for machine in ('A', 'B', 'C'):
+        assert slow_kpis['parts_made_' + machine] < kpis['parts_made_' + machine]
+
+
+def test_derived_process_times_reach_the_machines():
+    variables = GlobalVariables.derive(WORKING_WEEKS=1, FAST_FORWARD=True)
+    slow_variables = variables.derive(MEAN_PROCESS_TIME_A=500, MEAN_PROCESS_TIME_B=500, MEAN_PROCESS_TIME_C=460)
+    assert ValidationHarness.run_simpy(slow_variables, seed=1)['parts_made_C'] < \
+        ValidationHarness.run_simpy(variables, seed=1)['parts_made_C']
+    # The class itself is not modified.
+    assert GlobalVariables.GET_STD_DELAY == 1 and GlobalVariables.MEAN_PROCESS_TIME_A == 250
@@ -0,0 +1,46 @@
+"""
+test_running_statistics.py file: tests of the Welford accumulators and of their merge against the pooled statistics
+"""
+
+import numpy
+import pytest
+from running_statistics import RunningStatistics
+
+
+def _accumulator(values, weights=None, time_weighted=False):
+    accumulator = RunningStatistics(time_weighted)
+    for value, weight in zip(values, weights if weights is not None else [1.0] * len(values)):
+        accumulator.add(value, weight)
+    return accumulator
+
+
+def test_merge_gives_the_pooled_statistics():
+    random = numpy.random.RandomState(0)
+    # Replications of different sizes and means, an empty one included.
+    replications = [random.normal(loc, 3, size) + 1e6 for loc, size in [(0, 1), (5, 40), (-2, 1000), (1, 0), (0, 7)]]
+    merged = RunningStatistics.merge_all([{'x': _accumulator(values)} for values in replications])['x']
+    pooled = numpy.concatenate(replications)
+    assert merged.count == len(pooled)
+    assert merged.mean == pytest.approx(pooled.mean(), rel=1e-12)
+    assert merged.variance == pytest.approx(pooled.var(ddof=1), rel=1e-9)
+    assert (merged.min, merged.max) == (pooled.min(), pooled.max())
+    # Same statistics of a single accumulator of all the values.
+    assert merged.summary() == pytest.approx(_accumulator(pooled).summary(), rel=1e-9)
+
+
+def test_merge_of_time_weighted_accumulators():
+    random = numpy.random.RandomState(1)
+    levels, steps = random.randint(0, 200, 500), random.randint(0, 50, 500)
+    merged = _accumulator(levels[:123], steps[:123], True) + _accumulator(levels[123:], steps[123:], True)
+    # The levels lasting no step are ignored.
+    assert merged.count == numpy.count_nonzero(steps)
+    assert merged.mean == pytest.approx(numpy.average(levels, weights=steps))
+    assert merged.variance == pytest.approx(numpy.average((levels - merged.mean) ** 2, weights=steps))
+    assert merged.min == levels[steps > 0].min()
+
+
+def test_merge_with_an_empty_accumulator():
+    accumulator = _accumulator([3, 4, 8])
+    for merged in (accumulator + RunningStatistics(), RunningStatistics() + accumulator):
+        assert merged.summary() == accumulator.summary()
+    assert (RunningStatistics() + RunningStatistics()).summary()['min'] is None
@@ -0,0 +1,34 @@
+"""
+test_sharded_simulation.py file: tests of the sharded plant against its single process run
+"""
+
+import random
+from sharded_simulation import ShardedSimulation
+from global_variables import GlobalVariables
+
+STEPS = 28800
+
+
+def _kpis(tmp_path, processes, seed=0):
+    cells, links = ShardedSimulation.replicated_lines(2)
+    # A cell of two machines with the same parameters.
+    cells['cell A1'] = [('Machine A1', 'A'), ('Machine A1b', 'A')]
+    log_path = tmp_path / str(processes)
+    log_path.mkdir()
+    simulation = ShardedSimulation(cells, links, str(log_path),
+                                   GlobalVariables.derive(FAST_FORWARD=True, MTTF_A=7776), processes=processes,
+                                   seed=seed)
+    simulation.run(STEPS)
+    kpis = simulation.close()
+    kpis.pop('shards')
+    return kpis
+
+
+def test_results_do_not_depend_on_the_shards(tmp_path):
+    # The cells draw from their own streams only: the global random generator is not used.
+    random.seed(1)
+    state = random.getstate()
+    local = _kpis(tmp_path, 0)
+    assert random.getstate() == state
+    assert _kpis(tmp_path, 2) == local
+    assert local['breakdown_time_A1'] != local['breakdown_time_A1b']
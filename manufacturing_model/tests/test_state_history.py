@@ -0,0 +1,41 @@
+"""
+test_state_history.py file: tests of the ring buffer queries of StateHistory against the list of all the records
+"""
+
+import numpy
+from state_history import StateHistory
+
+
+def _histories(capacity, appended):
+    # History and list of all the records appended, with several records at the same step.
+    history = StateHistory(capacity, [('level', numpy.int32)])
+    records = list()
+    for i in range(appended):
+        record = (i // 3 * 10, i)
+        history.append(record)
+        records.append(record)
+    return history, records
+
+
+def _rows(array):
+    return [tuple(int(value) for value in row) for row in array]
+
+
+def test_queries_after_the_buffer_wraps_around():
+    capacity = 7
+    for appended in range(0, 3 * capacity + 2):
+        history, records = _histories(capacity, appended)
+        kept = records[-capacity:] if appended else []
+        assert len(history) == len(kept)
+        assert history.dropped == appended - len(kept)
+        assert _rows(history.records()) == kept
+        for n in range(1, capacity + 2):
+            assert _rows(history.last(n)) == kept[-n:]
+
+        for t1 in range(-5, appended // 3 * 10 + 15, 5):
+            for t2 in range(t1, appended // 3 * 10 + 15, 5):
+                assert _rows(history.between(t1, t2)) == [record for record in kept if t1 <= record[0] <= t2]
+            # A step before the oldest record kept has no known state.
+            before = [record for record in kept if record[0] <= t1]
+            state = history.at(t1)
+            assert (None if state is None else tuple(int(value) for value in state)) == (before[-1] if before else None)
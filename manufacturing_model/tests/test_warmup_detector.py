@@ -0,0 +1,36 @@
+"""
+test_warmup_detector.py file: tests of the MSER-5 rule and of the warm-up end detection
+"""
+
+import numpy
+import simpy
+from production_line import ProductionLine
+from warmup_detector import WarmupDetector
+from global_variables import GlobalVariables
+
+
+def test_mser_finds_a_known_transient():
+    # 20 observations decreasing from 10 to the steady state mean 0, then noise around it.
+    random = numpy.random.RandomState(0)
+    observations = numpy.concatenate([numpy.linspace(10, 0, 20, endpoint=False), random.normal(0, 1, 80)])
+    assert 15 <= WarmupDetector.mser(observations) <= 25
+
+
+def test_mser_keeps_a_steady_series():
+    assert WarmupDetector.mser([14] * 50) == 0
+
+
+def test_mser_waits_for_a_transient_in_progress():
+    # Still decreasing at the end: the statistic still decreases at the middle, the transient is not over.
+    assert WarmupDetector.mser(numpy.linspace(10, 0, 50)) is None
+
+
+def test_warmup_end_found_with_the_default_settings():
+    variables = GlobalVariables.derive(WORKING_WEEKS=12, FAST_FORWARD=True)
+    for seed in range(4):
+        env = simpy.Environment()
+        line = ProductionLine(env, None, variables, seed=seed)
+        detector = WarmupDetector(line)
+        env.run(until=int(variables.SIM_TIME))
+        assert detector.warmup_end is not None
+        assert detector.steady_state_kpis()['sim_time'] == variables.SIM_TIME - detector.warmup_end
@@ -3,6 +3,9 @@ transference_system.py file: TransferenceSystem class
 
 Class that has the responsibility to move material from the raw container A and B to the container C.
 Written in the most generic way, still a class taylor made to solve a singular problem.
+
+In fast-forward mode, while the transfer is not possible the system does not check the containers at every time step:
+it waits for the next level change of any of them.
 """
 
 
@@ -11,11 +14,12 @@ class TransferenceSystem(object):
     """
     Takes as input one (more in the future) input containers and one output container.
     """
-    def __init__(self, env, process_name, input_containers, output_container):
+    def __init__(self, env, process_name, input_containers, output_container, fast_forward=False):
         self.env = env
         self._process_name = process_name
         self._input_containers = input_containers    # This is passed as a list
         self._output_container = output_container
+        self._fast_forward = fast_forward
 
         env.process(self._material_transfer(self.env))
 
@@ -49,6 +53,11 @@ class TransferenceSystem(object):
                     self._input_containers[element].get(1)
                 # ... and put the material into the output container
                 self._output_container.put(1)
+            elif self._fast_forward:
+                # Nothing can be transferred until a container level changes: jump to the next change.
+                containers = self._input_containers + [self._output_container]
+                yield env.any_of([container.level_change() for container in containers])
+                continue
 
             # Then wait one time-step and re-do the buffer checking.
             yield env.timeout(1)
@@ -3,18 +3,34 @@ txt_logger.py file: TxtLogger class
 
 the class responsibility is to enable the log capabilities for the instantiated model objects and to save them as a .txt
 file.
+
+While an AsyncLogWriter is installed (class attribute "writer") or attached to the logger ("writer" of the instance),
+the log texts are queued into it instead of written.
+While a LogSegmenter is installed (class attribute "segmenter") when the logger is created, the texts are written into
+segments of the file.
+
+Without log path (None), no file is created and the texts are discarded.
 """
 
 import os
 
 
 class TxtLogger(object):
+    # AsyncLogWriter receiving the writes, if any.
+    writer = None
+    # LogSegmenter splitting the files, if any.
+    segmenter = None
+
     def __init__(self, txt_log_path, txt_log_filename):
         self.txt_log_path = txt_log_path
         self.txt_log_filename = txt_log_filename
-        self.complete_txt_filename = os.path.join(self.txt_log_path + "/" + self.txt_log_filename)
-
-        self._initialise_txt_log_file()
+        self.complete_txt_filename = None
+        self._segmenter = self.segmenter if txt_log_path is not None else None
+        if txt_log_path is not None:
+            self.complete_txt_filename = os.path.join(self.txt_log_path + "/" + self.txt_log_filename)
+            # The segments are created by the segmenter at the first write.
+            if self._segmenter is None:
+                self._initialise_txt_log_file()
 
     def _initialise_txt_log_file(self):
         try:
@@ -25,6 +41,15 @@ class TxtLogger(object):
                 f.close()
 
     def write_txt_log_file(self, text):
+        if self.complete_txt_filename is None:
+            return
+        if self._segmenter is not None:
+            self._segmenter.write(self.complete_txt_filename, text)
+            return
+        if self.writer is not None:
+            self.writer.write(self.complete_txt_filename, text)
+            return
+
         with open(self.complete_txt_filename, "a") as f:
             f.write(text)
             f.close()
@@ -0,0 +1,167 @@
+"""
+validation_harness.py file: ValidationHarness class
+
+The class responsibility is to compare the fast models of the line against the SimPy model, so it is known where the
+fast models can be trusted.
+
+The SimPy runs are silent: the console output is discarded and the logs are written into a temporary directory that is
+deleted at the end of each run.
+
+The BatchSimulator is validated statistically: the KPI distributions of its replications are compared with the ones of
+independent SimPy runs (different seeds), with a two-sample test on the means and the ratio of the standard deviations.
+
+Main entry point: compares the SurrogateModel against the SimPy model over a grid of parameters and saves the result
+into "surrogate_validation.csv", then checks the BatchSimulator equivalence.
+"""
+
+import contextlib
+import csv
+import itertools
+import math
+import os
+import tempfile
+import time
+import simpy
+from production_line import ProductionLine
+from surrogate_model import SurrogateModel
+from batch_simulator import BatchSimulator
+from warmup_detector import WarmupDetector
+from global_variables import GlobalVariables
+
+
+# VALIDATION HARNESS CLASS ---------------------------------------------------------------------------------------------
+class ValidationHarness(object):
+    # KPIs compared between the models
+    KPIS = ['parts_made_A', 'parts_made_B', 'parts_made_C', 'delivered_pieces', 'breakdown_time_A',
+            'breakdown_time_B', 'breakdown_time_C', 'starving_time_C', 'blocking_time_A', 'blocking_time_B']
+
+    def __init__(self, variables=GlobalVariables, output_path=None):
+        self._variables = variables
+        self._output_path = output_path
+
+    @staticmethod
+    def run_simpy(variables, seed=0, streams=None):
+        """
+        Run the SimPy model silently, returning its KPIs and the wall time. See ProductionLine for the streams. With
+        WARMUP_DETECTION in the variables, the KPIs and the statistics are the ones after the warm-up end.
+        """
+        start_time = time.time()
+        with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull):
+                env = simpy.Environment()
+                line = ProductionLine(env, log_dir, variables, seed=seed, streams=streams)
+                detector = WarmupDetector(line) if variables.WARMUP_DETECTION else None
+                env.run(until=int(variables.SIM_TIME))
+        kpis = line.kpis() if detector is None else detector.steady_state_kpis()
+        kpis['wall_time'] = time.time() - start_time
+        # Online statistics of the run, mergeable across the replications (RunningStatistics.merge_all).
+        kpis['statistics'] = line.statistics()
+        return kpis
+
+    @staticmethod
+    def run_surrogate(variables):
+        start_time = time.time()
+        kpis = SurrogateModel(variables).evaluate()
+        kpis['wall_time'] = time.time() - start_time
+        return kpis
+
+    def validate_surrogate(self, grid):
+        """
+        Compare the surrogate against the SimPy model for each combination of the grid.
+
+        grid: dict variable name -> list of values, e.g. {"MTTF_A": [50000, 77760], "MTTR_C": [1920, 9600]}.
+        Returns one row per combination with the values of both models and the relative errors.
+        """
+        rows = list()
+        names = list(grid.keys())
+        for values in itertools.product(*[grid[name] for name in names]):
+            parameters = dict(zip(names, values))
+            variables = self._variables.derive(**parameters)
+
+            simpy_kpis = self.run_simpy(variables)
+            surrogate_kpis = self.run_surrogate(variables)
+
+            row = dict(parameters)
+            for kpi in self.KPIS:
+                row['simpy ' + kpi] = simpy_kpis[kpi]
+                row['surrogate ' + kpi] = round(surrogate_kpis[kpi], 2)
+                # Relative error with respect to the horizon for time KPIs, to the SimPy value for the counts.
+                reference = variables.SIM_TIME if 'time' in kpi else max(simpy_kpis[kpi], 1)
+                row['error ' + kpi] = round((surrogate_kpis[kpi] - simpy_kpis[kpi]) / reference, 4)
+            row['simpy wall time'] = round(simpy_kpis['wall_time'], 3)
+            row['surrogate wall time'] = round(surrogate_kpis['wall_time'], 5)
+            rows.append(row)
+
+            print('{0}: parts made C simpy {1}, surrogate {2:.1f} (error {3:+.2%})'.format(
+                parameters, simpy_kpis['parts_made_C'], surrogate_kpis['parts_made_C'], row['error parts_made_C']))
+
+        if self._output_path is not None:
+            self._save(rows, self._output_path)
+        return rows
+
+    def validate_batch(self, simpy_runs=30, replications=1000, seed=0, z_threshold=3.0):
+        """
+        Check the statistical equivalence of the BatchSimulator and the SimPy model.
+
+        For each KPI, the means of "simpy_runs" SimPy runs (seeds 1 to simpy_runs) and of "replications" batch
+        replications are compared with a two-sample z statistic: the KPI is equivalent if |z| < z_threshold.
+        Returns one row per KPI and saves them, with the "batch_" prefix, next to the output path.
+        """
+        variables = self._variables
+        start_time = time.time()
+        simpy_kpis = [self.run_simpy(variables, seed=s) for s in range(1, simpy_runs + 1)]
+        simpy_wall_time = time.time() - start_time
+
+        start_time = time.time()
+        batch_kpis = BatchSimulator(replications, variables, seed=seed).run()
+        batch_wall_time = time.time() - start_time
+
+        rows = list()
+        for kpi in self.KPIS:
+            simpy_values = [k[kpi] for k in simpy_kpis]
+            batch_values = batch_kpis[kpi]
+            simpy_mean, simpy_std = self._mean_std(simpy_values)
+            batch_mean, batch_std = self._mean_std(batch_values)
+            standard_error = math.sqrt(simpy_std ** 2 / len(simpy_values) + batch_std ** 2 / len(batch_values))
+            z = (batch_mean - simpy_mean) / standard_error if standard_error else 0.0
+            rows.append({'kpi': kpi, 'simpy mean': round(simpy_mean, 2), 'batch mean': round(batch_mean, 2),
+                         'simpy std': round(simpy_std, 2), 'batch std': round(batch_std, 2), 'z': round(z, 3),
+                         'equivalent': abs(z) < z_threshold})
+            print('{0}: simpy {1:.1f} +- {2:.1f}, batch {3:.1f} +- {4:.1f}, z {5:+.2f}'.format(
+                kpi, simpy_mean, simpy_std, batch_mean, batch_std, z))
+
+        print('SimPy: {0} runs in {1:.1f} secs, batch: {2} replications in {3:.1f} secs'.format(
+            simpy_runs, simpy_wall_time, replications, batch_wall_time))
+        if self._output_path is not None:
+            directory, filename = os.path.split(self._output_path)
+            self._save(rows, os.path.join(directory, 'batch_' + filename))
+        return rows
+
+    @staticmethod
+    def _mean_std(values):
+        values = [float(value) for value in values]
+        average = sum(values) / len(values)
+        variance = sum((value - average) ** 2 for value in values) / max(len(values) - 1, 1)
+        return average, math.sqrt(variance)
+
+    @staticmethod
+    def _save(rows, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+            f.close()
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    harness = ValidationHarness(GlobalVariables.derive(WORKING_WEEKS=12), output_path='surrogate_validation.csv')
+    harness.validate_surrogate({
+        'MTTF_A': [GlobalVariables.MTTF_A // 2, GlobalVariables.MTTF_A],
+        'MTTR_C': [GlobalVariables.MTTR_C, GlobalVariables.MTTR_C * 5],
+        'CONTAINER_C_FINISHED_CAPACITY': [50, GlobalVariables.CONTAINER_C_FINISHED_CAPACITY],
+    })
+
+    # Short horizon: the SimPy runs are the slow part of the check.
+    ValidationHarness(GlobalVariables.derive(WORKING_WEEKS=4, FAST_FORWARD=True),
+                      output_path='surrogate_validation.csv').validate_batch()
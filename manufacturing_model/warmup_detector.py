@@ -0,0 +1,175 @@
+"""
+warmup_detector.py file: WarmupDetector class
+
+The class responsibility is to find where the initial transient of a run ends, so the KPIs, the online statistics and
+the causal dataset only contain the steady state of the line.
+
+Each run starts from an unusual state (200 raw pieces in A and B, empty finished containers), that biases the first
+part of the observations. The detector observes the run by windows of "window_steps" steps: the throughput of the line
+(parts made by Machine C in the window) and the time-average level in the window of the work in process buffer before
+the assembly ("input C"). The other containers are not observed by default: the raw and finished ones follow the
+sawtooth of their refill and dispatch controls, and the output buffers of A and B fill up for weeks while the other
+machine is broken, which the rule would take for a transient never ending. Other containers can be observed with
+"containers". After each window, the MSER-5 rule is applied to each series: the observations are grouped into batches
+of 5, and the truncation point is the number of batches d minimizing
+
+    MSER(d) = sum over the batches after d of (batch mean - mean after d)^2 / (batches after d)^2
+
+The minimum is searched in the first half of the series only, the statistic of the last batches alone being too noisy.
+The rule is applied from "min_windows" windows (4 batches by default), and trusted only when the minimum is before the
+middle of the series, otherwise the run is still in its transient and the observation continues. The warm-up end is the
+latest truncation point of all the series.
+
+At the warm-up end detection:
+    - the online statistics of the line (ProductionLine.statistics) restart from the warm-up end: the detector cuts
+      them at the end of each window (ProductionLine.cut_statistics), and keeps the windows after the warm-up end;
+    - the KPIs at the warm-up end are kept, steady_state_kpis gives the KPIs of the steady state only;
+    - the warm-up end step is written into the log folder (GlobalVariables.WARMUP_FILENAME), and merge_logs.py starts
+      the merged dataset from it.
+"""
+
+import os
+import numpy
+from running_statistics import RunningStatistics
+from global_variables import GlobalVariables
+
+
+# WARM-UP DETECTOR CLASS -----------------------------------------------------------------------------------------------
+class WarmupDetector(object):
+    def __init__(self, line, log_path=None, window_steps=None, min_windows=20, batch_size=5, containers=('input C',)):
+        self.line = line
+        self._log_path = log_path
+        self._window_steps = int(window_steps or line.variables.WARMUP_WINDOW)
+        self._min_windows = min_windows
+        self._batch_size = batch_size
+        unknown = set(containers) - set(container.name for container in line.containers)
+        if unknown:
+            raise ValueError('Unknown containers {0}.'.format(sorted(unknown)))
+        self._containers = [container for container in line.containers if container.name in containers]
+
+        # Observations of each window, per series.
+        self.series = {'throughput': list()}
+        for container in self._containers:
+            self.series['level ' + container.name] = list()
+        # Cumulative KPIs at the start of each window, and online statistics of each window.
+        self._snapshots = [line.kpis()]
+        self._window_statistics = list()
+
+        # Level area (level x steps) of each container in the current window.
+        self._areas = {container.name: 0 for container in self._containers}
+        self._levels = {container.name: container.level for container in self._containers}
+        self._since = {container.name: line.env.now for container in self._containers}
+        for container in self._containers:
+            container.listeners.append(self)
+
+        self._start = line.env.now
+        self.warmup_end = None
+        self.kpis_at_warmup = None
+        line.env.process(self._observing())
+
+    # MSER RULE --------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def mser(observations, batch_size=5):
+        """
+        MSER truncation point of the observations (number of observations to delete), with batches of "batch_size"
+        observations, or None if the minimum over the first half of the series is at its middle.
+        """
+        batches = len(observations) // batch_size
+        if batches < 2:
+            return None
+        means = numpy.asarray(observations[:batches * batch_size], dtype=float).reshape(batches, batch_size).mean(1)
+
+        # Sums of the batch means and of their squares after each truncation point d.
+        sums = numpy.cumsum(means[::-1])[::-1]
+        squares = numpy.cumsum((means * means)[::-1])[::-1]
+        kept = numpy.arange(batches, 0, -1, dtype=float)
+        statistic = (squares - sums * sums / kept) / (kept * kept)
+
+        # The minimum is searched among the truncation points keeping half of the batches at least, since the statistic
+        # of the last batches alone is too noisy. Still decreasing at the middle, the transient is not over.
+        truncation = int(numpy.argmin(statistic[:batches // 2 + 1]))
+        if truncation == batches // 2:
+            return None
+        return truncation * batch_size
+
+    # LISTENER FUNCTIONS -----------------------------------------------------------------------------------------------
+    def on_level_change(self, container):
+        now = self.line.env.now
+        self._areas[container.name] += self._levels[container.name] * (now - self._since[container.name])
+        self._levels[container.name] = container.level
+        self._since[container.name] = now
+
+    # OBSERVATION ------------------------------------------------------------------------------------------------------
+    def _observing(self):
+        env = self.line.env
+        while self.warmup_end is None:
+            yield env.timeout(self._window_steps)
+            kpis = self.line.kpis()
+            self.series['throughput'].append(kpis['parts_made_C'] - self._snapshots[-1]['parts_made_C'])
+            for container in self._containers:
+                name = container.name
+                self._areas[name] += self._levels[name] * (env.now - self._since[name])
+                self._since[name] = env.now
+                self.series['level ' + name].append(self._areas[name] / self._window_steps)
+                self._areas[name] = 0
+            self._snapshots.append(kpis)
+            self._window_statistics.append(self.line.cut_statistics())
+
+            if len(self.series['throughput']) >= self._min_windows:
+                self._check()
+
+    def _check(self):
+        truncations = [self.mser(observations, self._batch_size) for observations in self.series.values()]
+        if None in truncations:
+            return
+        windows = max(truncations)
+        self.warmup_end = self._start + windows * self._window_steps
+        self.kpis_at_warmup = self._snapshots[windows]
+        self._snapshots = None
+
+        # The statistics restart from the warm-up end, with the windows after it.
+        self.line.reset_statistics(RunningStatistics.merge_all(self._window_statistics[windows:]))
+        self._window_statistics = None
+        for container in self._containers:
+            container.listeners.remove(self)
+        if self._log_path is not None:
+            with open(os.path.join(self._log_path, GlobalVariables.WARMUP_FILENAME), 'w') as f:
+                f.write('{0}\n'.format(self.warmup_end))
+            print('Warm-up end detected at step {0} (step {1})'.format(self.warmup_end, self.line.env.now))
+
+    def steady_state_kpis(self):
+        """
+        KPIs of the line from the warm-up end up to now (see ProductionLine.kpis), with the "warmup_end" step. Without
+        a detected warm-up end, the KPIs from the start, with "warmup_end" None.
+        """
+        kpis = self.line.kpis()
+        if self.warmup_end is not None:
+            for name, value in self.kpis_at_warmup.items():
+                # The likelihood ratio weight stays the one of the whole run.
+                if name != 'weight':
+                    kpis[name] -= value
+        kpis['warmup_end'] = self.warmup_end
+        return kpis
+
+
+# File Main entry point.
+if __name__ == '__main__':
+    import contextlib
+    import tempfile
+    import simpy
+    from production_line import ProductionLine
+
+    variables = GlobalVariables.derive(WORKING_WEEKS=8, FAST_FORWARD=True)
+    with tempfile.TemporaryDirectory() as log_dir:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            env = simpy.Environment()
+            line = ProductionLine(env, log_dir, variables)
+            detector = WarmupDetector(line, log_dir)
+            env.run(until=int(variables.SIM_TIME))
+            line.close_logs()
+
+    print('warm-up end: step {0} of {1}'.format(detector.warmup_end, int(variables.SIM_TIME)))
+    for name, observations in detector.series.items():
+        print('{0}: first windows {1}, truncation {2}'.format(
+            name, [round(value, 1) for value in observations[:5]], WarmupDetector.mser(observations)))
+    print('steady state KPIs: {0}'.format(detector.steady_state_kpis()))